@@ -0,0 +1,159 @@
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Define payment analytics settings from environment variables
+ANALYTICS_MONTHS = int(os.getenv("ANALYTICS_MONTHS", "12"))
+
+###############################################################################
+# Bulk Load
+###############################################################################
+
+# One round trip per customer: every subscription with its payments (NULLs when there are none)
+ANALYTICS_QUERY = """
+SELECT s.subscription_id, s.product_name, s.subscription_start_date, s.subscription_end_date,
+       p.payment_date, p.amount_paid
+FROM customer_subscriptions s
+LEFT JOIN subscription_payments p ON p.subscription_id = s.subscription_id
+WHERE s.customer_id = :customer_id
+"""
+
+SUBSCRIPTION_COLUMNS = ["subscription_id", "product_name", "subscription_start_date", "subscription_end_date"]
+
+def to_datetime(values):
+    return pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+
+def load_payment_frames(customer_id, db):
+    """Subscriptions and payments of a customer as two columnar frames."""
+    with db._engine.connect() as conn:
+        result = conn.execute(text(ANALYTICS_QUERY), {"customer_id": customer_id})
+        frame = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    subscriptions = frame[SUBSCRIPTION_COLUMNS].drop_duplicates("subscription_id").reset_index(drop=True)
+    subscriptions["subscription_start_date"] = to_datetime(subscriptions["subscription_start_date"])
+    subscriptions["subscription_end_date"] = to_datetime(subscriptions["subscription_end_date"])
+
+    payments = frame.loc[frame["payment_date"].notna(), ["subscription_id", "payment_date", "amount_paid"]].copy()
+    payments["payment_date"] = to_datetime(payments["payment_date"])
+    payments["amount_paid"] = pd.to_numeric(payments["amount_paid"], errors="coerce").fillna(0.0)
+    return subscriptions, payments.reset_index(drop=True)
+
+###############################################################################
+# Analytics
+###############################################################################
+
+def month_index(dates):
+    """Months since year 0, so month differences are plain integer subtraction."""
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+def payment_analytics(subscriptions, payments, now=None, months=ANALYTICS_MONTHS):
+    """
+    Totals, a per-month payment series, arrears and renewal dates.
+
+    Billing is taken to be monthly at the subscription's median payment, due
+    on the day of the month the subscription started: every calendar month
+    from the start date to the last billing day passed (or the end date) is
+    expected to hold a payment, and months without one count as arrears.
+    Without any payment the monthly amount is unknown and arrears are only
+    counted in months.
+    """
+    now = pd.Timestamp(now or datetime.now(tz=timezone.utc))
+    now = now.tz_localize("UTC") if now.tzinfo is None else now.tz_convert("UTC")
+    current_month = now.year * 12 + now.month - 1
+
+    # Per-subscription aggregates
+    grouped = payments.groupby("subscription_id")
+    per_subscription = pd.DataFrame({
+        "total_paid": grouped["amount_paid"].sum(),
+        "n_payments": grouped.size(),
+        "last_payment": grouped["payment_date"].max(),
+        "monthly_amount": grouped["amount_paid"].median(),
+    })
+    subs = subscriptions.set_index("subscription_id").join(per_subscription)
+    subs[["total_paid", "n_payments"]] = subs[["total_paid", "n_payments"]].fillna(0)
+
+    # Arrears: billed months so far minus months with a payment
+    start = month_index(subs["subscription_start_date"])
+    # The current month is billed once its billing day (the start day, capped at the month's length) has passed
+    billing_day = subs["subscription_start_date"].dt.day.clip(upper=now.days_in_month)
+    last_billed_month = current_month - (billing_day >= now.day).astype(int)
+    # The end date is exclusive: a subscription ending on 2025-01-01 is last billed in December
+    last_day = subs["subscription_end_date"] - pd.Timedelta(days=1)
+    billed_until = np.minimum(month_index(last_day).fillna(current_month), last_billed_month)
+    months_billed = (billed_until - start + 1).clip(lower=0).fillna(0)
+    payment_months = month_index(payments["payment_date"])
+    billed = payment_months <= payments["subscription_id"].map(billed_until)
+    months_paid = payment_months[billed].groupby(payments.loc[billed, "subscription_id"]).nunique()
+    subs["months_paid"] = months_paid.reindex(subs.index).fillna(0)
+    subs["arrears_months"] = (months_billed - subs["months_paid"]).clip(lower=0).astype(int)
+    subs["arrears_amount"] = subs["arrears_months"] * subs["monthly_amount"]
+
+    # Renewal
+    subs["active"] = subs["subscription_end_date"].isna() | (subs["subscription_end_date"] >= now)
+    subs["days_to_renewal"] = (subs["subscription_end_date"] - now).dt.days
+
+    # Per-month series over the last `months` months, zero-filled
+    first_month = current_month - months + 1
+    recent = (payment_months >= first_month) & (payment_months <= current_month)
+    series = np.bincount(
+        (payment_months[recent] - first_month).astype(int),
+        weights=payments.loc[recent, "amount_paid"],
+        minlength=months,
+    )
+    labels = [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in range(first_month, current_month + 1)]
+
+    this_year = payments["payment_date"].dt.year == now.year
+    return {
+        "as_of": now.date().isoformat(),
+        "total_paid": float(payments["amount_paid"].sum()),
+        "paid_this_year": float(payments.loc[this_year, "amount_paid"].sum()),
+        "n_payments": int(len(payments)),
+        "monthly": dict(zip(labels, series.round(2).tolist())),
+        "arrears_amount": float(subs["arrears_amount"].sum()),
+        "arrears_unpriced_months": int(subs.loc[subs["monthly_amount"].isna(), "arrears_months"].sum()),
+        "subscriptions": subs.reset_index().to_dict("records"),
+    }
+
+def format_date(value):
+    return value.date().isoformat() if not pd.isna(value) else "unknown"
+
+def format_analytics(analytics):
+    """Compact summary the agent can quote directly."""
+    if not analytics["subscriptions"]:
+        return "No subscriptions found for this customer."
+
+    lines = [
+        f"Payment summary as of {analytics['as_of']}:",
+        f"- Total paid: {analytics['total_paid']:.2f} over {analytics['n_payments']} payments "
+        f"({analytics['paid_this_year']:.2f} this year)",
+        f"- Outstanding (estimated): {analytics['arrears_amount']:.2f}",
+        "Subscriptions:",
+    ]
+    if analytics["arrears_unpriced_months"]:
+        lines[2] += f", plus {analytics['arrears_unpriced_months']} unpaid month(s) at an unknown amount"
+    for s in analytics["subscriptions"]:
+        if s["active"]:
+            renewal = f"renews/ends {format_date(s['subscription_end_date'])}"
+            if not pd.isna(s["days_to_renewal"]):
+                renewal += f" (in {int(s['days_to_renewal'])} days)"
+        else:
+            renewal = f"ended {format_date(s['subscription_end_date'])}"
+        line = (
+            f"- {s['subscription_id']} ({s['product_name']}): started {format_date(s['subscription_start_date'])}, "
+            f"{renewal}; paid {s['total_paid']:.2f} in {int(s['n_payments'])} payments, "
+            f"last on {format_date(s['last_payment'])}"
+        )
+        if s["arrears_months"]:
+            line += f"; {s['arrears_months']} unpaid month(s)"
+            if not pd.isna(s["monthly_amount"]):
+                line += f", about {s['arrears_amount']:.2f}"
+        lines.append(line)
+    lines.append("Paid per month:")
+    lines.append(", ".join(f"{month}: {amount:.2f}" for month, amount in analytics["monthly"].items()))
+    return "\n".join(lines)
+
+def customer_payment_summary(customer_id, db, now=None):
+    subscriptions, payments = load_payment_frames(customer_id, db)
+    return format_analytics(payment_analytics(subscriptions, payments, now=now))
@@ -0,0 +1,157 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import text
+
+# Define availability settings from environment variables
+# Bookings per appointment type and half-hour slot; unset means no capacity limit
+APPOINTMENT_SLOT_CAPACITY = int(os.getenv("APPOINTMENT_SLOT_CAPACITY")) if os.getenv("APPOINTMENT_SLOT_CAPACITY") else None
+SLOT_MINUTES = 30
+MIN_NOTICE = timedelta(hours=24)
+BOOKING_HORIZON = timedelta(days=30)
+SLOT_SECONDS = SLOT_MINUTES * 60
+# One extra day so the window still covers the horizon until the next shift
+WINDOW_SLOTS = int((BOOKING_HORIZON + timedelta(days=1)).total_seconds()) // SLOT_SECONDS
+
+def parse_datetime(value):
+    """Parse an ISO date; naive values are taken as UTC."""
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def slot_number(value):
+    """Absolute half-hour slot number of a datetime."""
+    return int(parse_datetime(value).timestamp()) // SLOT_SECONDS
+
+def slot_datetime(number):
+    return datetime.fromtimestamp(number * SLOT_SECONDS, tz=timezone.utc)
+
+def type_key(appointment_type):
+    return " ".join(str(appointment_type).lower().split())
+
+###############################################################################
+# Availability Index
+###############################################################################
+
+class AvailabilityIndex:
+    """
+    Booked-appointment counts per appointment type over the half-hour grid
+    of the booking window, one uint16 array per type.
+
+    Loaded once from customer_appointments and updated incrementally by the
+    booking writes, so free-slot queries are a vectorized scan of at most
+    ~1.5k integers. The window slides forward as time passes.
+    """
+
+    def __init__(self, capacity=APPOINTMENT_SLOT_CAPACITY):
+        self.capacity = capacity
+        self.loaded = False
+        self._base = None
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _counts_for(self, appointment_type):
+        key = type_key(appointment_type)
+        if key not in self._counts:
+            self._counts[key] = np.zeros(WINDOW_SLOTS, dtype=np.uint16)
+        return self._counts[key]
+
+    def _slide(self, now):
+        """Move the window start to the current slot, dropping past slots."""
+        base = slot_number(now)
+        if self._base is None:
+            self._base = base
+            return
+        shift = base - self._base
+        if shift <= 0:
+            return
+        for counts in self._counts.values():
+            if shift >= WINDOW_SLOTS:
+                counts[:] = 0
+            else:
+                counts[:-shift] = counts[shift:]
+                counts[-shift:] = 0
+        self._base = base
+
+    def _position(self, appointment_date):
+        position = slot_number(appointment_date) - self._base
+        return position if 0 <= position < WINDOW_SLOTS else None
+
+    def _add(self, appointment_date, appointment_type, delta):
+        position = self._position(appointment_date)
+        if position is None:
+            return
+        counts = self._counts_for(appointment_type)
+        counts[position] = max(0, int(counts[position]) + delta)
+
+    def load(self, db, now=None):
+        """Rebuild from the appointments in the booking window."""
+        now = parse_datetime(now or datetime.now(tz=timezone.utc))
+        with db._engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT appointment_date, appointment_type FROM customer_appointments "
+                    "WHERE appointment_status = 'active' AND appointment_date >= :start"
+                ),
+                {"start": (now - timedelta(days=1)).date().isoformat()},
+            ).fetchall()
+        with self._lock:
+            self._base = None
+            self._counts = {}
+            self._slide(now)
+            for appointment_date, appointment_type in rows:
+                try:
+                    self._add(appointment_date, appointment_type, 1)
+                except (TypeError, ValueError):
+                    continue
+            self.loaded = True
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            self.load(db)
+
+    # Incremental updates ------------------------------------------------------
+
+    def book(self, appointment_date, appointment_type):
+        with self._lock:
+            self._slide(datetime.now(tz=timezone.utc))
+            self._add(appointment_date, appointment_type, 1)
+
+    def release(self, appointment_date, appointment_type):
+        with self._lock:
+            self._slide(datetime.now(tz=timezone.utc))
+            self._add(appointment_date, appointment_type, -1)
+
+    # Queries -----------------------------------------------------------------
+
+    def is_free(self, appointment_date, appointment_type):
+        with self._lock:
+            self._slide(datetime.now(tz=timezone.utc))
+            position = self._position(appointment_date)
+            if position is None or self.capacity is None:
+                return True
+            return int(self._counts_for(appointment_type)[position]) < self.capacity
+
+    def free_slots(self, appointment_type, after=None, n=5, now=None):
+        """The next `n` bookable slots (24h notice, within 30 days, below capacity) as datetimes."""
+        now = parse_datetime(now or datetime.now(tz=timezone.utc))
+        earliest = now + MIN_NOTICE
+        if after is not None:
+            earliest = max(earliest, parse_datetime(after))
+        # Round up to the next slot boundary
+        first = -(-int(earliest.timestamp()) // SLOT_SECONDS)
+        last = int((now + BOOKING_HORIZON).timestamp()) // SLOT_SECONDS
+
+        with self._lock:
+            self._slide(now)
+            start, stop = first - self._base, min(last - self._base + 1, WINDOW_SLOTS)
+            if start >= stop:
+                return []
+            counts = self._counts.get(type_key(appointment_type))
+            if counts is None or self.capacity is None:
+                free = np.arange(start, min(start + n, stop))
+            else:
+                free = np.flatnonzero(counts[start:stop] < self.capacity)[:n] + start
+            return [slot_datetime(self._base + int(position)) for position in free]
+
+availability = AvailabilityIndex()
@@ -1,12 +1,18 @@
 from datetime import datetime, timedelta, timezone
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from agents.schema_catalog import create_sql_tools
 from langgraph.prebuilt import create_react_agent
 from models.llm import llm
-from config.settings import db
+from config.settings import db, connections
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
+from typing import Optional
 from langchain_core.messages import HumanMessage
+from agents.customer_profile import profile_cache
+from agents.query_cache import query_cache
+from agents.availability import availability, APPOINTMENT_SLOT_CAPACITY
+from agents import booking_store
+from agents.booking_store import BookingError
 
 ###############################################################################
 # Current DateTime Manager
@@ -51,6 +57,11 @@ class ModifyAppointmentInput(BaseModel):
 class CancelAppointmentInput(BaseModel):
     subscription_id: str = Field(..., description="Subscription ID associated with the appointment")
 
+class CheckAvailabilityInput(BaseModel):
+    appointment_type: str = Field(..., description="Type of appointment (e.g., general physician, specialist)")
+    after: Optional[str] = Field(None, description="Only return slots at or after this ISO date (defaults to the earliest bookable time)")
+    n: int = Field(5, description="Number of free slots to return")
+
 # Validation for appointment date
 def validate_appointment_date(appointment_date):
     try:
@@ -74,27 +85,26 @@ def validate_cancellation_date(appointment_date):
     except ValueError as e:
         return False, f"Invalid date format: {str(e)}"
 
-def check_active_appointments(subscription_id, db):
-    try:
-        query = f"""
-        SELECT appointment_date FROM customer_appointments
-        WHERE subscription_id = '{subscription_id}' AND appointment_date >= '{DateTimeManager.iso_now()}'
-        """
-        result = db.run(query)
-        if result:
-            return False, "User already has an active appointment and cannot book another."
-        return True, ""
-    except Exception as e:
-        return False, f"An error occurred: {str(e)}"
-
 def check_appointments(subscription_id, db):
     """Retrieve appointments from the database."""
     try:
-        query = f"""
-        SELECT * FROM customer_appointments
-        WHERE subscription_id = '{subscription_id}'
+        # Only 'active' rows are bookings; past ones count as completed until a booking write marks them.
+        # `now` is bound to the minute, so cached results age out of their 'completed' labels within a minute.
+        query = """
+        SELECT id, appointment_date, appointment_type,
+            CASE WHEN appointment_status = 'active' AND appointment_date < :now
+                THEN 'completed' ELSE appointment_status END AS appointment_status
+        FROM customer_appointments
+        WHERE subscription_id = :subscription_id
+        ORDER BY appointment_date
         """
-        result = db.run(query)
+        parameters = {
+            "subscription_id": subscription_id,
+            "now": datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:00"),
+        }
+        result = query_cache.get_or_run(
+            subscription_id, query, lambda: db.run(query, parameters=parameters), parameters=parameters,
+        )
 
         # Handle no results found
         if not result:
@@ -113,18 +123,19 @@ def create_appointment(subscription_id, appointment_date, appointment_type, db):
         if not is_valid:
             return {"status": "error", "message": message}
 
-        is_valid, message = check_active_appointments(subscription_id, db)
-        if not is_valid:
-            return {"status": "error", "message": message}
+        availability.ensure_loaded(db)
+        if not availability.is_free(appointment_date, appointment_type):
+            return {"status": "error", "message": "This slot is already booked. Use CheckAvailabilityTool to find a free slot."}
 
-        query = f"""
-        INSERT INTO customer_appointments (subscription_id, appointment_created_date, appointment_date, appointment_type)
-        VALUES ('{subscription_id}', '{DateTimeManager.iso_now()}', '{appointment_date}', '{appointment_type}')
-        """
-        db.run(query)
+        booking_store.create_appointment(connections, subscription_id, appointment_date, appointment_type, DateTimeManager.now())
+        availability.book(appointment_date, appointment_type)
+        profile_cache.invalidate_subscription(subscription_id)
+        query_cache.invalidate_tables(["customer_appointments"])
         metadata = {"subscription_id": subscription_id, "appointment_date": appointment_date, "appointment_type": appointment_type}
         return {"status": "success", "message": "Appointment created successfully.", "metadata": metadata}
 
+    except BookingError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {str(e)}"}
 
@@ -135,45 +146,53 @@ def modify_appointment(subscription_id, new_appointment_date, new_appointment_ty
         if not is_valid:
             return {"status": "error", "message": message}
 
-        query = f"""
-        UPDATE customer_appointments
-        SET appointment_date = '{new_appointment_date}', appointment_type = '{new_appointment_type}'
-        WHERE subscription_id = {subscription_id} and appointment_date >= '{DateTimeManager.iso_now()}'
-        """
-        db.run(query)
+        availability.ensure_loaded(db)
+        if not availability.is_free(new_appointment_date, new_appointment_type):
+            return {"status": "error", "message": "This slot is already booked. Use CheckAvailabilityTool to find a free slot."}
+
+        appointment_date, appointment_type = booking_store.modify_appointment(
+            connections, subscription_id, new_appointment_date, new_appointment_type, DateTimeManager.now()
+        )
+        availability.release(appointment_date, appointment_type)
+        availability.book(new_appointment_date, new_appointment_type)
+        profile_cache.invalidate_subscription(subscription_id)
+        query_cache.invalidate_tables(["customer_appointments"])
         metadata = {"subscription_id": subscription_id, "new_appointment_date": new_appointment_date, "new_appointment_type": new_appointment_type}
         return {"status": "success", "message": "Appointment modified successfully.", "metadata": metadata}
 
+    except BookingError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {str(e)}"}
 
 def cancel_appointment(subsription_id, db):
     """Cancel an existing appointment."""
     try:
-        # Fetch appointment details
-        query_fetch = f"""
-        SELECT appointment_date FROM customer_appointments WHERE subscription_id = '{subsription_id}' and appointment_date >= '{DateTimeManager.iso_now()}'
-        """
-        result = db.run(query_fetch)
-        if not result:
-            return {"status": "error", "message": f"No appointment found with subscription_id {subsription_id}."}
-
-        appointment_date = result[0]["appointment_date"]
-        is_valid, message = validate_cancellation_date(appointment_date)
-        if not is_valid:
-            return {"status": "error", "message": message}
-
-        # Perform cancellation
-        query_cancel = f"""
-        DELETE FROM customer_appointments WHERE subscription_id = '{subsription_id}' and appointment_date >= '{DateTimeManager.iso_now()}'
-        """
-        db.run(query_cancel)
+        appointment_date, appointment_type = booking_store.cancel_appointment(
+            connections, subsription_id, DateTimeManager.now(), validate=validate_cancellation_date
+        )
+        availability.release(appointment_date, appointment_type)
+        profile_cache.invalidate_subscription(subsription_id)
+        query_cache.invalidate_tables(["customer_appointments"])
         metadata = {"subsription_id": subsription_id}
         return {"status": "success", "message": "Appointment cancelled successfully.", "metadata": metadata}
 
+    except BookingError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {str(e)}"}
 
+def check_availability(appointment_type, after=None, n=5, db=db):
+    """Next free slots for an appointment type."""
+    try:
+        availability.ensure_loaded(db)
+        slots = availability.free_slots(appointment_type, after=after, n=n)
+        if not slots:
+            return "No free slots in the booking window."
+        return [slot.isoformat() for slot in slots]
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+
 ###############################################################################
 # Agent Tools
 ###############################################################################
@@ -182,7 +201,7 @@ def create_check_appointments_tool(db):
     return StructuredTool.from_function(
         func=lambda subscription_id: check_appointments(subscription_id, db),
         name="CheckAppointmentsTool",
-        description="Retrieve all appointments for a given subscription ID.",
+        description="Retrieve all appointments for a given subscription ID with their status: only 'active' appointments are current bookings; 'cancelled' and 'completed' ones are history.",
         args_schema=CheckAppointmentsInput,
     )
 
@@ -206,6 +225,14 @@ def create_modify_appointment_tool(db):
         args_schema=ModifyAppointmentInput,
     )
 
+def create_check_availability_tool(db):
+    return StructuredTool.from_function(
+        func=lambda appointment_type, after=None, n=5: check_availability(appointment_type, after, n, db),
+        name="CheckAvailabilityTool",
+        description="List the next free appointment slots (ISO datetimes) for an appointment type. Use it before creating or modifying an appointment.",
+        args_schema=CheckAvailabilityInput,
+    )
+
 def create_cancel_appointment_tool(db):
     return StructuredTool.from_function(
         func=lambda subscription_id: cancel_appointment(subscription_id, db),
@@ -223,13 +250,17 @@ def create_appointment_agent(db=db, llm=llm, checkpointer=MemorySaver()):
     system_message = f"""
     You are an agent managing customer appointments in a SQL database. The current system date is {DateTimeManager.now().isoformat()}.
     You can check, create, modify, or cancel appointments. Ensure that new or modified appointments.
+    Before creating or modifying an appointment, use CheckAvailabilityTool to find free slots and offer those to the customer instead of guessing dates.
     Only interact with the database through the provided tools.
     """
+    if APPOINTMENT_SLOT_CAPACITY is not None:
+        system_message += f"    Each appointment type can be booked at most {APPOINTMENT_SLOT_CAPACITY} time(s) per half-hour slot.\n"
 
     # Tools
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm).get_tools()
+    toolkit = create_sql_tools(db, llm)
     toolkit += [
         create_check_appointments_tool(db),
+        create_check_availability_tool(db),
         create_create_appointment_tool(db),
         create_modify_appointment_tool(db),
         create_cancel_appointment_tool(db),
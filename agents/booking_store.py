@@ -0,0 +1,108 @@
+import sqlite3
+from datetime import timezone
+from agents.availability import APPOINTMENT_SLOT_CAPACITY, parse_datetime
+
+# This module is imported by the booking stress benchmark, so it must stay free of import-time side effects
+
+class BookingError(Exception):
+    """A booking rule was violated; the message is safe to show to the customer."""
+
+def canonical_date(appointment_date):
+    """Stored form of appointment dates: UTC ISO 8601, so string comparisons order correctly."""
+    return parse_datetime(appointment_date).astimezone(timezone.utc).isoformat(timespec="seconds")
+
+###############################################################################
+# Statements
+###############################################################################
+
+# The `appointment_status = 'active'` predicates let SQLite use the partial indexes from migration 2
+ACTIVE_APPOINTMENT = """
+SELECT id, appointment_date, appointment_type FROM customer_appointments
+WHERE subscription_id = ? AND appointment_status = 'active' AND appointment_date >= ?
+"""
+
+COMPLETE_PAST = """
+UPDATE customer_appointments SET appointment_status = 'completed'
+WHERE subscription_id = ? AND appointment_status = 'active' AND appointment_date < ?
+"""
+
+SLOT_BOOKINGS = """
+SELECT COUNT(*) FROM customer_appointments
+WHERE appointment_type = ? AND appointment_date = ? AND appointment_status = 'active' AND id != ?
+"""
+
+INSERT_APPOINTMENT = """
+INSERT INTO customer_appointments (subscription_id, appointment_created_date, appointment_date, appointment_type, appointment_status)
+VALUES (?, ?, ?, ?, 'active')
+"""
+
+UPDATE_APPOINTMENT = "UPDATE customer_appointments SET appointment_date = ?, appointment_type = ? WHERE id = ?"
+
+CANCEL_APPOINTMENT = "UPDATE customer_appointments SET appointment_status = 'cancelled' WHERE id = ?"
+
+def _check_slot(conn, appointment_date, appointment_type, capacity, exclude_id=-1):
+    if capacity is None:
+        return
+    booked = conn.execute(SLOT_BOOKINGS, (appointment_type, appointment_date, exclude_id)).fetchone()[0]
+    if booked >= capacity:
+        raise BookingError("This slot is already booked. Use CheckAvailabilityTool to find a free slot.")
+
+###############################################################################
+# Transactional Writes
+###############################################################################
+
+# Each function runs as one BEGIN IMMEDIATE transaction through ConnectionManager.run_write,
+# which also retries on SQLITE_BUSY. The partial unique index is the final guard against double booking.
+
+def create_appointment(connections, subscription_id, appointment_date, appointment_type, now,
+                       capacity=APPOINTMENT_SLOT_CAPACITY):
+    """Insert an appointment; returns its id."""
+    appointment_date, now = canonical_date(appointment_date), canonical_date(now)
+
+    def create(conn):
+        conn.execute(COMPLETE_PAST, (subscription_id, now))
+        if conn.execute(ACTIVE_APPOINTMENT, (subscription_id, now)).fetchone():
+            raise BookingError("User already has an active appointment and cannot book another.")
+        _check_slot(conn, appointment_date, appointment_type, capacity)
+        try:
+            return conn.execute(INSERT_APPOINTMENT, (subscription_id, now, appointment_date, appointment_type)).lastrowid
+        except sqlite3.IntegrityError as e:
+            raise BookingError("User already has an active appointment and cannot book another.") from e
+
+    return connections.run_write(create)
+
+def modify_appointment(connections, subscription_id, new_appointment_date, new_appointment_type, now,
+                       capacity=APPOINTMENT_SLOT_CAPACITY):
+    """Move the active appointment; returns its previous (appointment_date, appointment_type)."""
+    new_appointment_date, now = canonical_date(new_appointment_date), canonical_date(now)
+
+    def modify(conn):
+        current = conn.execute(ACTIVE_APPOINTMENT, (subscription_id, now)).fetchone()
+        if current is None:
+            raise BookingError(f"No active appointment found with subscription_id {subscription_id}.")
+        _id, appointment_date, appointment_type = current
+        _check_slot(conn, new_appointment_date, new_appointment_type, capacity, exclude_id=_id)
+        conn.execute(UPDATE_APPOINTMENT, (new_appointment_date, new_appointment_type, _id))
+        return appointment_date, appointment_type
+
+    return connections.run_write(modify)
+
+def cancel_appointment(connections, subscription_id, now, validate=lambda appointment_date: (True, "")):
+    """
+    Cancel the active appointment if `validate(appointment_date)` allows it;
+    returns the cancelled (appointment_date, appointment_type).
+    """
+    now = canonical_date(now)
+
+    def cancel(conn):
+        current = conn.execute(ACTIVE_APPOINTMENT, (subscription_id, now)).fetchone()
+        if current is None:
+            raise BookingError(f"No appointment found with subscription_id {subscription_id}.")
+        _id, appointment_date, appointment_type = current
+        is_valid, message = validate(canonical_date(appointment_date))
+        if not is_valid:
+            raise BookingError(message)
+        conn.execute(CANCEL_APPOINTMENT, (_id,))
+        return appointment_date, appointment_type
+
+    return connections.run_write(cancel)
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+# Define customer profile settings from environment variables
+CUSTOMER_PROFILE_TTL = float(os.getenv("CUSTOMER_PROFILE_TTL", "900"))
+CUSTOMER_PROFILE_PAYMENTS = int(os.getenv("CUSTOMER_PROFILE_PAYMENTS", "5"))
+
+###############################################################################
+# Profile Queries
+###############################################################################
+
+# Every query is parameterized and filtered on customer_id, directly or through customer_subscriptions
+CUSTOMER_QUERY = """
+SELECT customer_id, customer_name, customer_last_name, customer_created_date
+FROM customers WHERE customer_id = :customer_id
+"""
+
+SUBSCRIPTIONS_QUERY = """
+SELECT subscription_id, product_name, subscription_start_date, subscription_end_date
+FROM customer_subscriptions WHERE customer_id = :customer_id
+ORDER BY subscription_start_date DESC
+"""
+
+PAYMENTS_QUERY = """
+SELECT p.subscription_id, p.payment_date, p.amount_paid
+FROM subscription_payments p
+JOIN customer_subscriptions s ON s.subscription_id = p.subscription_id
+WHERE s.customer_id = :customer_id
+ORDER BY p.payment_date DESC
+LIMIT :limit
+"""
+
+APPOINTMENTS_QUERY = """
+SELECT a.subscription_id, a.appointment_date, a.appointment_type
+FROM customer_appointments a
+JOIN customer_subscriptions s ON s.subscription_id = a.subscription_id
+WHERE s.customer_id = :customer_id AND a.appointment_status = 'active' AND a.appointment_date >= :now
+ORDER BY a.appointment_date
+"""
+
+def load_customer_profile(customer_id, db, now=None):
+    """Fetch the customer row, subscriptions, recent payments and upcoming appointments in one connection."""
+    now = now or datetime.now(tz=timezone.utc).isoformat()
+    params = {"customer_id": customer_id, "limit": CUSTOMER_PROFILE_PAYMENTS, "now": now}
+    with db._engine.connect() as conn:
+        def rows(query):
+            return [dict(row) for row in conn.execute(text(query), params).mappings()]
+
+        customer = rows(CUSTOMER_QUERY)
+        return {
+            "customer": customer[0] if customer else None,
+            "subscriptions": rows(SUBSCRIPTIONS_QUERY),
+            "recent_payments": rows(PAYMENTS_QUERY),
+            "upcoming_appointments": rows(APPOINTMENTS_QUERY),
+        }
+
+def format_profile(profile):
+    """Compact, prompt-friendly rendering of a customer profile."""
+    customer = profile["customer"]
+    if customer is None:
+        return "No customer found for this customer_id."
+
+    lines = [
+        f"Customer {customer['customer_id']}: {customer['customer_name']} {customer['customer_last_name']} "
+        f"(customer since {customer['customer_created_date']})"
+    ]
+    lines.append("Subscriptions:" if profile["subscriptions"] else "Subscriptions: none")
+    lines += [
+        f"- {s['subscription_id']}: {s['product_name']}, {s['subscription_start_date']} to {s['subscription_end_date']}"
+        for s in profile["subscriptions"]
+    ]
+    lines.append("Recent payments:" if profile["recent_payments"] else "Recent payments: none")
+    lines += [
+        f"- {p['payment_date']}: {p['amount_paid']} (subscription {p['subscription_id']})"
+        for p in profile["recent_payments"]
+    ]
+    lines.append("Upcoming appointments:" if profile["upcoming_appointments"] else "Upcoming appointments: none")
+    lines += [
+        f"- {a['appointment_date']}: {a['appointment_type']} (subscription {a['subscription_id']})"
+        for a in profile["upcoming_appointments"]
+    ]
+    return "\n".join(lines)
+
+###############################################################################
+# Profile Cache
+###############################################################################
+
+class CustomerProfileCache:
+    """
+    Formatted profiles per customer_id.
+
+    Entries expire after `ttl` seconds and are dropped as soon as a booking
+    write touches one of the customer's subscriptions.
+    """
+
+    def __init__(self, ttl=CUSTOMER_PROFILE_TTL):
+        self.ttl = ttl
+        self._profiles = {}
+        self._subscription_owner = {}
+        self._lock = threading.Lock()
+
+    def get(self, customer_id, db):
+        customer_id = str(customer_id)
+        with self._lock:
+            entry = self._profiles.get(customer_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+
+        profile = load_customer_profile(customer_id, db)
+        formatted = format_profile(profile)
+        with self._lock:
+            self._profiles[customer_id] = (formatted, time.monotonic())
+            for subscription in profile["subscriptions"]:
+                self._subscription_owner[str(subscription["subscription_id"])] = customer_id
+        return formatted
+
+    def invalidate(self, customer_id=None):
+        """Drop one customer's profile, or all profiles."""
+        with self._lock:
+            if customer_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(str(customer_id), None)
+
+    def invalidate_subscription(self, subscription_id):
+        """Drop the profile of the customer owning a subscription (called after booking writes)."""
+        with self._lock:
+            customer_id = self._subscription_owner.get(str(subscription_id))
+            if customer_id is not None:
+                self._profiles.pop(customer_id, None)
+
+profile_cache = CustomerProfileCache()
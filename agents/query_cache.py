@@ -0,0 +1,109 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from agents.query_guard import table_aliases
+
+# Define query cache settings from environment variables
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+def normalize_sql(sql):
+    """Case- and whitespace-insensitive form of a statement; string literals are kept as written."""
+    parts = STRING_LITERAL.split(sql.strip().rstrip(";"))
+    return "".join(
+        part if index % 2 else re.sub(r"\s+", " ", part.lower())
+        for index, part in enumerate(parts)
+    )
+
+def tables_of(sql):
+    return {table.lower() for table in table_aliases(sql).values()}
+
+###############################################################################
+# Query Result Cache
+###############################################################################
+
+class QueryCache:
+    """
+    LRU cache of read-query results keyed by (scope, normalized SQL, parameters).
+
+    The scope is usually a customer or subscription id. Entries expire after
+    `ttl` seconds and are dropped as soon as a write touches one of the
+    tables the query reads. Each invalidation bumps a per-table generation,
+    so a result read before a write that lands while it runs is not stored.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, tables):
+        return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def _key(self, scope, sql, parameters):
+        return (str(scope), normalize_sql(sql), tuple(sorted((parameters or {}).items())))
+
+    def get_or_run(self, scope, sql, run, parameters=None, cacheable=lambda result: True):
+        """Cached result of `sql`, or run() when missing, expired or invalidated."""
+        key = self._key(scope, sql, parameters)
+        tables = tables_of(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[2]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation(tables)
+
+        result = run()
+        if cacheable(result):
+            with self._lock:
+                # A write invalidated these tables while run() was reading them
+                if self._generation(tables) != generation:
+                    return result
+                self._entries[key] = (result, tables, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that reads one of `tables`."""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, (_, read_tables, _) in self._entries.items() if read_tables & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+query_cache = QueryCache()
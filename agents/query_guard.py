@@ -0,0 +1,139 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+
+# Define query guard settings from environment variables
+QUERY_SCAN_ROW_LIMIT = int(os.getenv("QUERY_SCAN_ROW_LIMIT", "5000"))
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "2.0"))
+QUERY_ROW_BUDGET = int(os.getenv("QUERY_ROW_BUDGET", "200"))
+QUERY_STEP_BUDGET = int(os.getenv("QUERY_STEP_BUDGET", "50000000"))
+QUERY_PROGRESS_INTERVAL = 10_000
+TABLE_SIZE_TTL = 60.0
+
+READ_STATEMENT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+[\"`\[]?(\w+)[\"`\]]?(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SCAN_DETAIL = re.compile(r"^SCAN (\w+)")
+AUTOMATIC_INDEX_DETAIL = re.compile(r"^SEARCH (\w+) USING AUTOMATIC")
+SQL_KEYWORDS = {"where", "join", "left", "right", "inner", "outer", "cross", "on", "group", "order", "limit", "union", "natural"}
+
+def is_single_statement(sql):
+    """False when a statement ends before the end of `sql`; semicolons inside literals and comments do not count."""
+    return not any(char == ";" and sqlite3.complete_statement(sql[:i + 1]) for i, char in enumerate(sql))
+
+class QueryRejected(Exception):
+    """Raised when a statement is not allowed to run."""
+
+def table_aliases(sql):
+    """Map of alias (or table name) -> table name for the FROM/JOIN clauses of a statement."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table
+    return aliases
+
+###############################################################################
+# Query Guard
+###############################################################################
+
+class QueryGuard:
+    """
+    Runs agent-written SQL under a plan check and resource budgets.
+
+    Before execution the statement's EXPLAIN QUERY PLAN is inspected: full
+    scans (or automatic-index builds) of tables larger than `scan_row_limit`
+    are rejected with a hint to filter on indexed columns. The statement is
+    wrapped in a LIMIT of `row_budget + 1`, and SQLite's progress handler
+    aborts it once it exceeds `timeout` seconds or `step_budget` VM steps.
+    """
+
+    def __init__(self, db, scan_row_limit=QUERY_SCAN_ROW_LIMIT, timeout=QUERY_TIMEOUT_SECONDS,
+                 row_budget=QUERY_ROW_BUDGET, step_budget=QUERY_STEP_BUDGET):
+        self.db = db
+        self.scan_row_limit = scan_row_limit
+        self.timeout = timeout
+        self.row_budget = row_budget
+        self.step_budget = step_budget
+        self._sizes = {}
+        self._sizes_at = 0.0
+        self._lock = threading.Lock()
+
+    def table_sizes(self, conn):
+        """Approximate row counts per table (MAX(rowid) is an index lookup, not a scan)."""
+        with self._lock:
+            if time.monotonic() - self._sizes_at > TABLE_SIZE_TTL:
+                sizes = {}
+                for (table,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                ).fetchall():
+                    try:
+                        sizes[table.lower()] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+                    except Exception:
+                        # WITHOUT ROWID tables
+                        sizes[table.lower()] = 0
+                self._sizes, self._sizes_at = sizes, time.monotonic()
+            return self._sizes
+
+    def check_plan(self, conn, sql):
+        """Raise QueryRejected when the plan scans a large table."""
+        sizes = self.table_sizes(conn)
+        aliases = table_aliases(sql)
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+            detail = row[-1]
+            match = SCAN_DETAIL.match(detail) or AUTOMATIC_INDEX_DETAIL.match(detail)
+            if not match:
+                continue
+            # CTEs and subqueries appear under their own names; their base tables are reported separately
+            table = aliases.get(match.group(1).lower(), match.group(1))
+            n_rows = sizes.get(table.lower())
+            if n_rows is not None and n_rows > self.scan_row_limit:
+                raise QueryRejected(
+                    f"Query rejected: it would scan all ~{n_rows} rows of table '{table}' ({detail}). "
+                    "Filter on an indexed column such as customer_id or subscription_id."
+                )
+
+    def run(self, sql):
+        """Execute a read-only statement within the budgets; returns the rows as a string, like SQLDatabase.run."""
+        sql = sql.strip().rstrip(";")
+        if not READ_STATEMENT.match(sql) or not is_single_statement(sql):
+            raise QueryRejected("Query rejected: only a single SELECT statement is allowed.")
+
+        raw = self.db._engine.raw_connection()
+        conn = raw.driver_connection
+        try:
+            self.check_plan(conn, sql)
+
+            deadline = time.monotonic() + self.timeout
+            steps = [0]
+
+            def progress():
+                steps[0] += QUERY_PROGRESS_INTERVAL
+                # A non-zero return interrupts the statement
+                return time.monotonic() > deadline or steps[0] > self.step_budget
+
+            conn.set_progress_handler(progress, QUERY_PROGRESS_INTERVAL)
+            try:
+                rows = conn.execute(f"SELECT * FROM ({sql}) LIMIT {self.row_budget + 1}").fetchall()
+            except Exception as e:
+                if "interrupted" in str(e):
+                    raise QueryRejected(
+                        f"Query aborted: it exceeded the {self.timeout:g}s time or work budget. Narrow the query."
+                    ) from e
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+        finally:
+            raw.close()
+
+        if len(rows) > self.row_budget:
+            return f"{rows[:self.row_budget]}\n(Result truncated to {self.row_budget} rows; add filters or a LIMIT.)"
+        return str(rows) if rows else ""
+
+    def run_no_throw(self, sql):
+        """Like run, but returns errors as text for the agent."""
+        try:
+            return self.run(sql)
+        except Exception as e:
+            return f"Error: {e}"
@@ -1,48 +1,109 @@
+import os
 from langgraph.prebuilt import create_react_agent
 from models.llm import llm
 from langgraph.checkpoint.memory import MemorySaver
-from models.vector_store import initialize_vector_store
-from langchain.chains import load_summarize_chain
-from langchain.tools import Tool
+from models.vector_store import initialize_vector_store, load_lexical_index
+from models.hybrid_retriever import HybridRetriever
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
+from models.summarizer import ChunkSummarizer
+
+# Default of the tool's `raw` flag: return chunks verbatim and leave summarizing to the agent
+RAG_RAW_CHUNKS = os.getenv("RAG_RAW_CHUNKS", "false").lower() == "true"
 
 ###############################################################################
 # Agent Retriever Tool
 ###############################################################################
 vector_store = initialize_vector_store()
+retriever = HybridRetriever(vector_store, load_lexical_index(vector_store.generation_dir))
+summarizer = ChunkSummarizer(llm)
+
+class RetrieveInput(BaseModel):
+    query: str = Field(..., description="Search query.")
+    k: int = Field(3, description="Number of documents to retrieve.")
+    raw: bool = Field(RAG_RAW_CHUNKS, description="Return the raw chunks instead of a summary.")
+
+class RetrieveManyInput(BaseModel):
+    queries: list[str] = Field(..., description="Independent search queries, one per fact needed.")
+    k: int = Field(3, description="Number of documents to retrieve per query.")
+    raw: bool = Field(RAG_RAW_CHUNKS, description="Return the raw chunks instead of summaries.")
+
+def serialize_documents(docs):
+    """Serialize metadata and content for detailed response."""
+    return "\n\n".join(
+        (f"Source: {doc.metadata}\nContent: {doc.page_content}")
+        for doc in docs
+    )
+
+def with_sources(summary, docs):
+    sources = ", ".join(dict.fromkeys(str(doc.metadata.get("source")) for doc in docs))
+    return f"{summary}\n\nSources: {sources}"
 
-def retrieve(query: str, k: int = 3):
+def retrieve(query: str, k: int = 3, raw: bool = RAG_RAW_CHUNKS):
     """Retrieve and summarize information related to a query."""
     try:
-        # Retrieve relevant documents
-        retrieved_docs = vector_store.similarity_search(query, k=k)
+        # Retrieve relevant documents (BM25 + dense, or BM25 alone for unambiguous keyword hits)
+        retrieved_docs, _ = retriever.search(query, k=k)
 
         # Handle no results found
         if not retrieved_docs:
-            return "No relevant information found.", "", []
+            return "No relevant information found.", []
+
+        if raw:
+            return serialize_documents(retrieved_docs), retrieved_docs
+
+        # Summarize retrieved documents (single document is returned as is)
+        return with_sources(summarizer.summarize(retrieved_docs), retrieved_docs), retrieved_docs
+
+    except Exception as e:
+        # Error handling for unexpected issues
+        return f"An error occurred: {str(e)}", []
+
+def retrieve_many(queries: list[str], k: int = 3, raw: bool = RAG_RAW_CHUNKS):
+    """Retrieve information for several queries in one batched search, grouped by query."""
+    try:
+        # One embedding request and one index search for all queries; shared chunks are returned once
+        groups = retriever.search_many(queries, k=k)
 
-        # Summarize retrieved documents if more than one is found
-        if len(retrieved_docs) > 1:
-            summarization_chain = load_summarize_chain(llm, chain_type="map_reduce")
-            summary = summarization_chain.invoke(retrieved_docs)
+        non_empty = [docs for docs in groups if docs]
+        if raw:
+            contents = [serialize_documents(docs) for docs in non_empty]
         else:
-            summary = retrieved_docs[0].page_content
+            contents = [with_sources(summary, docs) for summary, docs in zip(summarizer.summarize_many(non_empty), non_empty)]
+        contents = iter(contents)
 
-        # Serialize metadata and content for detailed response
-        serialized = "\n\n".join(
-            (f"Source: {doc.metadata}\nContent: {doc.page_content}")
-            for doc in retrieved_docs
-        )
-        return summary, serialized, retrieved_docs
+        sections = [
+            f"Query: {query}\n{next(contents) if docs else 'No additional information found.'}"
+            for query, docs in zip(queries, groups)
+        ]
+        return "\n\n---\n\n".join(sections), groups
 
     except Exception as e:
         # Error handling for unexpected issues
-        return f"An error occurred: {str(e)}", "", []
+        return f"An error occurred: {str(e)}", []
 
-retrieve_tool = Tool.from_function(
+# The model sees the summary (or raw chunks); the documents travel as the ToolMessage artifact
+retrieve_tool = StructuredTool.from_function(
     func=retrieve,
     name="Retrieve",
-    description="Retrieve and summarize relevant documents. The number of results can be adjusted with the 'k' parameter."
+    description=(
+        "Retrieve and summarize relevant documents. The number of results can be adjusted with the 'k' parameter. "
+        "Set 'raw' to get the matching chunks verbatim instead of a summary."
+    ),
+    args_schema=RetrieveInput,
+    response_format="content_and_artifact",
+)
+
+retrieve_many_tool = StructuredTool.from_function(
+    func=retrieve_many,
+    name="RetrieveMany",
+    description=(
+        "Retrieve and summarize relevant documents for several independent questions in a single call. "
+        "Prefer this over repeated 'Retrieve' calls when more than one fact is needed. Results are grouped by query."
+    ),
+    args_schema=RetrieveManyInput,
+    response_format="content_and_artifact",
 )
 
 ###############################################################################
@@ -57,7 +118,8 @@ def create_rag_agent(llm=llm, checkpointer=MemorySaver()):
     system_message = '''
     You are an intelligent agent specialized in retrieving and summarizing information. 
 
-    1. Use the `retrieve_tool` to fetch relevant records related to the user's query. 
+    1. Use the `retrieve_tool` to fetch relevant records related to the user's query. When the query needs several
+       independent facts, fetch them all at once with `RetrieveMany`, passing one query per fact.
     2. Analyze the retrieved records and extract the most important and relevant details, including key metadata.
     3. Summarize the information clearly, concisely, and accurately.
     4. Always include sources or metadata to provide context when summarizing the results.
@@ -68,7 +130,7 @@ def create_rag_agent(llm=llm, checkpointer=MemorySaver()):
     ###########################################################################
     # Tools
     ###########################################################################
-    toolkit = [retrieve_tool]
+    toolkit = [retrieve_tool, retrieve_many_tool]
     ###########################################################################
     # Agent creation
     ###########################################################################
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from sqlalchemy import text
+from langchain_community.tools.sql_database.tool import QuerySQLCheckerTool
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+from agents.query_guard import QueryGuard
+from agents.query_cache import query_cache
+
+# Seconds between schema_version checks; calls in between are served from memory without touching the database
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", "30"))
+
+###############################################################################
+# Schema Catalog
+###############################################################################
+
+class SchemaCatalog:
+    """
+    In-memory table list and table info (DDL and sample rows, or the
+    `custom_table_info` description where one is configured) for a SQLDatabase.
+
+    Everything is computed once; it is rebuilt only when SQLite's
+    `PRAGMA schema_version` changes.
+    """
+
+    def __init__(self, db, check_interval=SCHEMA_CHECK_INTERVAL):
+        self.db = db
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._schema_version = None
+        self._checked_at = 0.0
+        self._tables = []
+        self._table_info = {}
+        self._refresh(self._read_schema_version())
+
+    def _read_schema_version(self):
+        with self.db._engine.connect() as conn:
+            return conn.execute(text("PRAGMA schema_version")).scalar()
+
+    def _refresh(self, schema_version):
+        if self._schema_version is not None:
+            # Re-reflect so SQLDatabase renders the current columns
+            self.db._metadata.clear()
+            print("Database schema changed; rebuilding the schema catalog.")
+        tables = self.db.get_usable_table_names()
+        self._table_info = {table: self.db.get_table_info([table]) for table in tables}
+        self._tables = tables
+        self._schema_version = schema_version
+        self._checked_at = time.monotonic()
+
+    def _ensure_current(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            schema_version = self._read_schema_version()
+            if schema_version != self._schema_version:
+                self._refresh(schema_version)
+            self._checked_at = time.monotonic()
+
+    def list_tables(self):
+        """Comma-separated list of usable tables."""
+        self._ensure_current()
+        return ", ".join(self._tables)
+
+    def table_info(self, table_names):
+        """Table info for a comma-separated list of tables, or an error listing the unknown ones."""
+        self._ensure_current()
+        names = [name.strip() for name in table_names.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self._table_info]
+        if unknown:
+            return f"Error: table_names {set(unknown)} not found in database"
+        return "\n\n".join(self._table_info[name] for name in names)
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_schema_catalog(db):
+    """The shared catalog of a SQLDatabase, built on first use."""
+    with _catalogs_lock:
+        if id(db) not in _catalogs:
+            _catalogs[id(db)] = SchemaCatalog(db)
+        return _catalogs[id(db)]
+
+###############################################################################
+# SQL Tools
+###############################################################################
+
+class ListTablesInput(BaseModel):
+    tool_input: str = Field("", description="An empty string")
+
+class QueryInput(BaseModel):
+    query: str = Field(..., description="A detailed and correct SQL query.")
+
+class TableInfoInput(BaseModel):
+    table_names: str = Field(
+        ...,
+        description="A comma-separated list of the table names for which to return the schema. Example input: 'table1, table2, table3'",
+    )
+
+def create_sql_tools(db, llm):
+    """
+    The SQLDatabaseToolkit tools, with list-tables and schema served from the
+    shared SchemaCatalog and queries run through a QueryGuard. Tool names are
+    unchanged, so agent prompts still apply.
+    """
+    catalog = get_schema_catalog(db)
+    guard = QueryGuard(db)
+
+    def run_query(query):
+        # Successful results are cached until a write touches one of the tables read
+        return query_cache.get_or_run(
+            "sql", query, lambda: guard.run_no_throw(query), cacheable=lambda result: not result.startswith("Error:")
+        )
+
+    list_tables_tool = StructuredTool.from_function(
+        func=lambda tool_input="": catalog.list_tables(),
+        name="sql_db_list_tables",
+        description="Input is an empty string, output is a comma-separated list of tables in the database.",
+        args_schema=ListTablesInput,
+    )
+    table_info_tool = StructuredTool.from_function(
+        func=catalog.table_info,
+        name="sql_db_schema",
+        description=(
+            "Input to this tool is a comma-separated list of tables, output is the schema and sample rows for those tables. "
+            "Be sure that the tables actually exist by calling sql_db_list_tables first! "
+            "Example Input: table1, table2, table3"
+        ),
+        args_schema=TableInfoInput,
+    )
+    query_tool = StructuredTool.from_function(
+        func=run_query,
+        name="sql_db_query",
+        description=(
+            "Input to this tool is a detailed and correct SQL query, output is a result from the database. "
+            "If the query is not correct, an error message will be returned. If an error is returned, rewrite the query, "
+            "check the query, and try again. If you encounter an issue with Unknown column 'xxxx' in 'field list', "
+            "use sql_db_schema to query the correct table fields. Queries must filter large tables on indexed columns "
+            f"(customer_id, subscription_id) and return at most {guard.row_budget} rows."
+        ),
+        args_schema=QueryInput,
+    )
+    query_checker_tool = QuerySQLCheckerTool(
+        db=db,
+        llm=llm,
+        description=(
+            "Use this tool to double check if your query is correct before executing it. "
+            "Always use this tool before executing a query with sql_db_query!"
+        ),
+    )
+    return [query_tool, table_info_tool, list_tables_tool, query_checker_tool]
@@ -1,4 +1,4 @@
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from agents.schema_catalog import create_sql_tools
 from langgraph.prebuilt import create_react_agent
 from config.settings import db
 from models.llm import llm
@@ -6,6 +6,9 @@ from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.tools import StructuredTool
 from config.settings import GraphState
 from pydantic import BaseModel, Field
+from agents.query_cache import query_cache
+from agents.analytics import ANALYTICS_QUERY, customer_payment_summary
+from datetime import date
 
 ###############################################################################
 # Agent Tools
@@ -20,8 +23,9 @@ def retrieve_customer_info(customer_id: str, db):
         if db is None:
             raise ValueError("Database connection is required")
 
-        query = f"SELECT * FROM customers WHERE customer_id = {customer_id}"
-        result = db.run(query)
+        query = "SELECT * FROM customers WHERE customer_id = :customer_id"
+        parameters = {"customer_id": customer_id}
+        result = query_cache.get_or_run(customer_id, query, lambda: db.run(query, parameters=parameters), parameters=parameters)
         return {"customer_info": result}
 
     except Exception as e:
@@ -34,6 +38,29 @@ retrieve_customer_info_tool = StructuredTool.from_function(
     args_schema=CustomerInfoInput
 )
 
+def payment_analytics(customer_id: str, db):
+    """Payment totals, monthly series, arrears and renewal dates of a customer."""
+    try:
+        # Keyed on the day as well, since arrears and renewal countdowns depend on it
+        summary = query_cache.get_or_run(
+            customer_id, ANALYTICS_QUERY, lambda: customer_payment_summary(customer_id, db),
+            parameters={"customer_id": customer_id, "day": date.today().isoformat()},
+        )
+        return {"payment_summary": summary}
+
+    except Exception as e:
+        return {"error": f"An error occurred: {str(e)}"}
+
+payment_analytics_tool = StructuredTool.from_function(
+    name="PaymentAnalyticsTool",
+    description=(
+        "Summarize a customer's payments and subscriptions: total paid (overall and this year), payments per month, "
+        "estimated unpaid months and renewal/end dates. Use it instead of writing aggregate SQL over payments or subscriptions."
+    ),
+    func=lambda customer_id: payment_analytics(customer_id, db),
+    args_schema=CustomerInfoInput
+)
+
 ###############################################################################
 # Agent Creation Function with Memory
 ###############################################################################
@@ -68,6 +95,7 @@ def create_sql_agent(db=db, llm=llm, checkpointer=MemorySaver()):
     Initial Steps:
 
     Always start by running tool RetrieveCustomerInfoTool to get the customer information.
+    For questions about amounts paid, payment history, outstanding payments or subscription end and renewal dates, call PaymentAnalyticsTool once and answer from its summary.
     If you need further information, examine the tables in the database to understand what you can query.
     Query the schema of the most relevant tables based on the input question.
 
@@ -84,12 +112,9 @@ def create_sql_agent(db=db, llm=llm, checkpointer=MemorySaver()):
     # Tools
     ###########################################################################
     
-    toolkit = SQLDatabaseToolkit(
-        db=db,
-        llm=llm,
-    ).get_tools()
+    toolkit = create_sql_tools(db, llm)
 
-    toolkit += [retrieve_customer_info_tool]
+    toolkit += [retrieve_customer_info_tool, payment_analytics_tool]
 
     ###########################################################################
     # Agent creation
@@ -0,0 +1,126 @@
+"""
+Recall/latency benchmark of the vector index types in models/index_factory.py.
+
+Builds each index type on a synthetic clustered corpus, measures recall@k
+against an exact flat search and reports p50/p99 single-query latency.
+
+Run from the repository root:
+
+    python -m benchmarks.ann_benchmark --sizes 10000 100000 1000000 --dim 256
+
+A 1M x 3072 float32 corpus needs ~12 GB of RAM, so large sizes are usually
+run with a reduced --dim; relative recall and latency still carry over.
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+from models.index_factory import INDEX_TYPES, build_index, search_parameters
+
+###############################################################################
+# Synthetic Data
+###############################################################################
+
+def synthetic_corpus(n_vectors, dimension, n_clusters=256, seed=0):
+    """Gaussian clusters around random centres, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    vectors = np.empty((n_vectors, dimension), dtype=np.float32)
+    for start in range(0, n_vectors, 100_000):
+        stop = min(start + 100_000, n_vectors)
+        labels = rng.integers(0, n_clusters, stop - start)
+        vectors[start:stop] = centres[labels] + 0.5 * rng.standard_normal((stop - start, dimension), dtype=np.float32)
+    return vectors
+
+def synthetic_queries(corpus, n_queries, seed=1):
+    """Perturbed corpus vectors, so every query has meaningful neighbours."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(corpus), n_queries)
+    return corpus[picks] + 0.1 * rng.standard_normal((n_queries, corpus.shape[1]), dtype=np.float32)
+
+###############################################################################
+# Measurements
+###############################################################################
+
+def recall_at_k(found, truth):
+    """Mean fraction of the true top-k neighbours returned by the approximate search."""
+    hits = [len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth)]
+    return float(np.mean(hits)) / truth.shape[1]
+
+def query_latencies(index, queries, k, params):
+    """Per-query wall-clock latencies in milliseconds, one query at a time as in the RAG path."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def benchmark(n_vectors, dimension, n_queries, k, index_types, nprobes, ef_searches, train_size):
+    corpus = synthetic_corpus(n_vectors, dimension)
+    queries = synthetic_queries(corpus, n_queries)
+
+    flat = faiss.IndexFlatL2(dimension)
+    flat.add(corpus)
+    _, truth = flat.search(queries, k)
+
+    rows = []
+    for index_type in index_types:
+        training = corpus[np.random.default_rng(2).choice(n_vectors, min(train_size, n_vectors), replace=False)]
+        start = time.perf_counter()
+        index = build_index(index_type, dimension, training_vectors=training)
+        index.add(corpus)
+        build_seconds = time.perf_counter() - start
+
+        if index_type.startswith("ivf"):
+            settings = [("nprobe", value, search_parameters(index, nprobe=value)) for value in nprobes]
+        elif index_type == "hnsw":
+            settings = [("efSearch", value, search_parameters(index, ef_search=value)) for value in ef_searches]
+        else:
+            settings = [("-", "-", None)]
+
+        for name, value, params in settings:
+            _, found = index.search(queries, k, params=params)
+            latencies = query_latencies(index, queries, k, params)
+            rows.append({
+                "n": n_vectors,
+                "index": index_type,
+                "param": f"{name}={value}" if params is not None else "-",
+                "recall": recall_at_k(found, truth),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "build_s": build_seconds,
+            })
+        del index
+    return rows
+
+def print_rows(rows, k):
+    print(f"{'n':>9} {'index':>9} {'param':>13} {f'recall@{k}':>10} {'p50 ms':>9} {'p99 ms':>9} {'build s':>9}")
+    for row in rows:
+        print(
+            f"{row['n']:>9} {row['index']:>9} {row['param']:>13} {row['recall']:>10.3f} "
+            f"{row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['build_s']:>9.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--train-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for n_vectors in args.sizes:
+        rows = benchmark(
+            n_vectors, args.dim, args.queries, args.k, args.index_types,
+            args.nprobe, args.ef_search, args.train_size,
+        )
+        print_rows(rows, args.k)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Concurrent booking stress test: no double bookings, and bookings per second.
+
+Worker threads create and cancel appointments on random subscriptions and
+a deliberately small set of slots, so most attempts collide. Each worker
+owns its own ConnectionManager, as separate app processes would, so the
+only coordination between them is SQLite itself. Two write paths are
+compared on a synthetic database with the application's table layout:
+
+  naive   the previous tool logic: check for an active appointment and a
+          free slot with autocommit reads, then INSERT
+  store   agents.booking_store: checks and write in one BEGIN IMMEDIATE
+          transaction with busy retries, backed by the partial unique index
+
+After each run the database is checked for subscriptions with more than
+one active appointment and slots booked beyond capacity.
+
+Run from the repository root:
+
+    python -m benchmarks.booking_stress --threads 1 4 8 16 --seconds 5
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from agents import booking_store
+from agents.booking_store import BookingError, canonical_date
+from benchmarks.sqlite_concurrency import create_database
+from config.connections import ConnectionManager, is_busy_error
+from config.migrations import apply_migrations
+
+APPOINTMENT_TYPES = ["general physician", "specialist"]
+
+###############################################################################
+# Synthetic Database
+###############################################################################
+
+def create_booking_database(path, n_customers):
+    create_database(path, n_customers)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE customer_appointments (id INTEGER PRIMARY KEY, subscription_id INTEGER, "
+        "appointment_created_date TEXT, appointment_date TEXT, appointment_type TEXT)"
+    )
+    conn.commit()
+    conn.close()
+    connections = ConnectionManager(path)
+    apply_migrations(connections)
+    connections.close()
+
+###############################################################################
+# Write Paths
+###############################################################################
+
+def naive_create(conn, subscription_id, appointment_date, appointment_type, now, capacity):
+    active = conn.execute(booking_store.ACTIVE_APPOINTMENT, (subscription_id, now)).fetchone()
+    if active:
+        raise BookingError("User already has an active appointment and cannot book another.")
+    booked = conn.execute(booking_store.SLOT_BOOKINGS, (appointment_type, appointment_date, -1)).fetchone()[0]
+    if booked >= capacity:
+        raise BookingError("This slot is already booked.")
+    conn.execute(booking_store.INSERT_APPOINTMENT, (subscription_id, now, appointment_date, appointment_type))
+
+def naive_cancel(conn, subscription_id, now):
+    active = conn.execute(booking_store.ACTIVE_APPOINTMENT, (subscription_id, now)).fetchone()
+    if active is None:
+        raise BookingError("No appointment found.")
+    conn.execute(booking_store.CANCEL_APPOINTMENT, (active[0],))
+
+def naive_setup(path):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+    return (
+        lambda *args: naive_create(conn, *args),
+        lambda *args: naive_cancel(conn, *args),
+        conn.close,
+    )
+
+def store_setup(path):
+    connections = ConnectionManager(path)
+    return (
+        lambda sub, date, kind, now, capacity: booking_store.create_appointment(connections, sub, date, kind, now, capacity),
+        lambda sub, now: booking_store.cancel_appointment(connections, sub, now),
+        connections.close,
+    )
+
+SETUPS = {"naive": naive_setup, "store": store_setup}
+
+###############################################################################
+# Benchmark
+###############################################################################
+
+def worker(setup, path, subscriptions, slots, capacity, now, deadline, counts, seed):
+    rng = random.Random(seed)
+    create, cancel, close = SETUPS[setup](path)
+    booked = rejected = errors = 0
+    while time.perf_counter() < deadline:
+        subscription_id = rng.choice(subscriptions)
+        try:
+            if rng.random() < 0.7:
+                create(subscription_id, rng.choice(slots), rng.choice(APPOINTMENT_TYPES), now, capacity)
+                booked += 1
+            else:
+                cancel(subscription_id, now)
+        except (BookingError, sqlite3.IntegrityError):
+            rejected += 1
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            errors += 1
+    close()
+    counts.append((booked, rejected, errors))
+
+def violations(path, capacity):
+    """(subscriptions with several active appointments, slots booked beyond capacity)."""
+    conn = sqlite3.connect(path)
+    double_booked = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT subscription_id FROM customer_appointments "
+        "WHERE appointment_status = 'active' GROUP BY subscription_id HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+    overbooked = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM customer_appointments WHERE appointment_status = 'active' "
+        "GROUP BY appointment_type, appointment_date HAVING COUNT(*) > ?)",
+        (capacity,),
+    ).fetchone()[0]
+    conn.close()
+    return double_booked, overbooked
+
+def run(setup, path, n_threads, seconds, n_subscriptions, n_slots, capacity, unique_index):
+    if not unique_index:
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP INDEX idx_appointments_one_active")
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    subscriptions = [5000 + i for i in range(n_subscriptions)]
+    slots = [canonical_date(now + timedelta(days=2, minutes=30 * i)) for i in range(n_slots)]
+    counts = []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(setup, path, subscriptions, slots, capacity, now, deadline, counts, seed),
+        )
+        for seed in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    booked, rejected, errors = (sum(column) for column in zip(*counts))
+    return booked / seconds, rejected, errors, *violations(path, capacity)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--subscriptions", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=40)
+    parser.add_argument("--capacity", type=int, default=1)
+    parser.add_argument("--setups", nargs="+", default=list(SETUPS), choices=list(SETUPS))
+    parser.add_argument("--no-unique-index", action="store_true", help="Drop the partial unique index before each run")
+    args = parser.parse_args()
+
+    print(f"{'setup':>6} {'threads':>8} {'bookings/s':>11} {'rejected':>9} {'busy':>6} {'double':>7} {'overbooked':>11}")
+    for setup in args.setups:
+        for n_threads in args.threads:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "bench.db"
+                create_booking_database(path, args.subscriptions)
+                bookings_per_second, rejected, errors, double_booked, overbooked = run(
+                    setup, path, n_threads, args.seconds, args.subscriptions, args.slots, args.capacity,
+                    unique_index=not args.no_unique_index,
+                )
+            print(
+                f"{setup:>6} {n_threads:>8} {bookings_per_second:>11.0f} {rejected:>9} {errors:>6} "
+                f"{double_booked:>7} {overbooked:>11}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Throughput of the OpenAI clients under a burst against the rate-limited stub.
+
+Starts benchmarks/stub_openai_server.py in-process with a server-side RPM
+and concurrency limit, then fires the same burst of chat completions and
+embeddings (a share of them identical, like a popular FAQ) from many
+threads through two client setups:
+
+  sdk        OpenAI SDK defaults: no client-side limits, 2 SDK retries
+  resilient  models/llm_client.py: token buckets, AIMD concurrency,
+             Retry-After aware jittered retries and request coalescing
+
+and reports completed / failed requests, 429s returned by the server,
+upstream requests, coalesced requests, throughput and latency percentiles.
+
+Run from the repository root:
+
+    python -m benchmarks.llm_burst --requests 400 --threads 64 --rpm 1200 --concurrency 16
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import openai
+from benchmarks.stub_openai_server import start_server
+from models.llm_client import RateLimitRegistry, create_http_clients
+
+CHAT_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+def make_burst(n_requests, duplicate_share, seed=0):
+    """(kind, text) requests; `duplicate_share` of them repeat one of a few popular texts."""
+    rng = random.Random(seed)
+    popular = [f"What does the tele doctor plan include? ({i})" for i in range(3)]
+    burst = []
+    for i in range(n_requests):
+        text = rng.choice(popular) if rng.random() < duplicate_share else f"question {i} about subscription {rng.randint(1, 10 ** 6)}"
+        burst.append(("embedding" if i % 2 else "chat", text))
+    return burst
+
+def send(client, kind, text):
+    started = time.perf_counter()
+    try:
+        if kind == "chat":
+            client.chat.completions.create(model=CHAT_MODEL, messages=[{"role": "user", "content": text}], temperature=0)
+        else:
+            client.embeddings.create(model=EMBEDDING_MODEL, input=[text])
+        return True, time.perf_counter() - started
+    except openai.APIError:
+        return False, time.perf_counter() - started
+
+def run(setup, burst, threads, server_options):
+    server, base_url = start_server(**server_options)
+    registry = None
+    if setup == "sdk":
+        client = openai.OpenAI(base_url=base_url, api_key="stub")
+    else:
+        # Client-side limits split the server's request budget between the two models
+        limits = {"rpm": server_options["rpm"] // 2, "tpm": 10 ** 7}
+        registry = RateLimitRegistry(overrides={CHAT_MODEL: limits, EMBEDDING_MODEL: limits})
+        http_client, _ = create_http_clients(registry=registry)
+        client = openai.OpenAI(base_url=base_url, api_key="stub", http_client=http_client, max_retries=0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda request: send(client, *request), burst))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = np.array([latency for ok, latency in results if ok])
+    counters = server.state.counters
+    coalesced = sum(stats["coalesced"] for stats in registry.stats().values()) if registry else 0
+    return {
+        "ok": int(sum(ok for ok, _ in results)),
+        "failed": int(sum(not ok for ok, _ in results)),
+        "throttled": counters["throttled"],
+        "upstream": counters["requests"],
+        "coalesced": coalesced,
+        "rps": len(latencies) / elapsed,
+        "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        "seconds": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of requests repeating a popular text")
+    parser.add_argument("--rpm", type=int, default=1200, help="server-side requests per minute")
+    parser.add_argument("--concurrency", type=int, default=16, help="server-side concurrent requests")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--setups", nargs="+", default=["sdk", "resilient"])
+    args = parser.parse_args()
+
+    burst = make_burst(args.requests, args.duplicates)
+    server_options = {"rpm": args.rpm, "concurrency": args.concurrency, "latency": args.latency, "jitter": args.latency / 4}
+    print(f"{args.requests} requests from {args.threads} threads; server limits {args.rpm} rpm, {args.concurrency} concurrent")
+    print(f"{'setup':>10} {'ok':>5} {'failed':>6} {'429s':>6} {'upstream':>8} {'coalesced':>9} {'req/s':>7} {'p50 s':>6} {'p95 s':>6} {'total s':>7}")
+    for setup in args.setups:
+        result = run(setup, burst, args.threads, server_options)
+        print(
+            f"{setup:>10} {result['ok']:>5} {result['failed']:>6} {result['throttled']:>6} {result['upstream']:>8} "
+            f"{result['coalesced']:>9} {result['rps']:>7.1f} {result['p50']:>6.2f} {result['p95']:>6.2f} {result['seconds']:>7.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
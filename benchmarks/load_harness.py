@@ -0,0 +1,438 @@
+"""
+Offline load test of the customer service graph.
+
+Replays JSON-lines conversation traces (benchmarks/load_traces.jsonl by
+default) against the compiled graph at a configurable concurrency, with
+no OpenAI calls:
+
+  - a scripted chat model stands in for gpt-4o-mini. The reasoner calls the
+    sub-agent tools listed in the trace turn and then answers; sub-agents
+    answer directly (the RAG agent first runs its Retrieve tool). Latency is
+    drawn from a log-normal distribution, and streamed answers add a delay
+    per token.
+  - deterministic fake embeddings with their own latency distribution.
+  - a synthetic SQLite database and a small knowledge base in a scratch
+    directory, so the checkpoint DB starts empty.
+
+Each trace line is one conversation:
+
+    {"customer_id": "1003", "turns": [{"user": "When was my last payment?", "tools": ["SQLAgentTool"]}]}
+
+Turns run through graph/streaming.py like the front ends, including the
+post-turn conversation summarizer. The report covers turns per second,
+p50/p95/p99 turn latency and time to first token, LLM and embedding calls
+per turn, and checkpoint DB growth. Concurrency levels run in one process
+on fresh threads, so in-process caches (answers, queries, profiles) are
+warm after the first level; run a single level per process for cold numbers.
+
+Run from the repository root:
+
+    python -m benchmarks.load_harness --concurrency 1 4 16 --repeat 4
+    python -m benchmarks.load_harness --mode async --concurrency 32 --env ROUTER_ENABLED=false
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+import numpy as np
+from pydantic import ConfigDict
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+TRACES_PATH = Path(__file__).with_name("load_traces.jsonl")
+# Tools of the reasoner; a model bound to them plays the supervisor
+REASONER_TOOLS = {"SQLAgentTool", "RagAgentTool", "BookingAgentTool"}
+# Sub-agent tools the scripted model calls before answering, with their arguments
+SUBAGENT_TOOL_CALLS = {"Retrieve": lambda query: {"query": query}}
+
+PRODUCTS = [
+    {"name": "Family Plus Gold", "coverage": "Up to 8 family members, dental and optical", "price": "49.90 per month"},
+    {"name": "Family Plus Silver", "coverage": "Up to 5 family members, dental", "price": "34.90 per month"},
+    {"name": "Tele Doctor", "coverage": "Unlimited video consultations with a general physician", "price": "9.90 per month"},
+    {"name": "BCARE", "coverage": "Specialist consultations and second opinions", "price": "19.90 per month"},
+    {"name": "Travel Care", "coverage": "Medical assistance abroad for up to 90 days per trip", "price": "14.90 per month"},
+]
+FAQ = [
+    {"question": "What are your working hours?", "answer": "Customer service is available Monday to Saturday from 8am to 8pm."},
+    {"question": "How can I cancel my policy?", "answer": "Policies can be cancelled from the app or by phone with 30 days notice."},
+    {"question": "How do refunds work?", "answer": "Duplicate charges are refunded to the original payment method within 10 business days."},
+    {"question": "What is the emergency phone number?", "answer": "Call 0800 123 456 at any time for medical emergencies."},
+    {"question": "What documents should I bring to a consultation?", "answer": "Bring an ID and your subscription number."},
+]
+
+###############################################################################
+# Fakes
+###############################################################################
+
+class Latency:
+    """Log-normal delay with the given median (seconds) and log-space sigma; zero median disables it."""
+
+    def __init__(self, median, sigma=0.5, seed=None):
+        self.median = median
+        self.sigma = sigma
+        self._rng = random.Random(seed)
+
+    def sample(self):
+        return self.median * self._rng.lognormvariate(0.0, self.sigma) if self.median > 0 else 0.0
+
+class CallCounter:
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that follows the replayed traces. `bind_tools` returns a copy
+    that remembers the tool names, which tells the reasoner (bound to the
+    sub-agent tools) apart from sub-agents and unbound calls (summaries).
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    script: dict = {}
+    latency: Any = None
+    token_latency: float = 0.0
+    answer_tokens: int = 40
+    counter: Any = None
+    bound_tools: tuple = ()
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    @property
+    def _identifying_params(self):
+        return {"bound_tools": self.bound_tools}
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"bound_tools": tuple(convert_to_openai_tool(tool)["function"]["name"] for tool in tools)})
+
+    def _role(self):
+        if REASONER_TOOLS & set(self.bound_tools):
+            return "reasoner"
+        return "subagent" if self.bound_tools else "unbound"
+
+    def _reply(self, messages):
+        role = self._role()
+        self.counter.add(role)
+        last = messages[-1]
+        if role == "reasoner" and isinstance(last, HumanMessage):
+            tools = [name for name in self.script.get(last.content, []) if name in self.bound_tools]
+            if tools:
+                return AIMessage(content="", tool_calls=[
+                    {"name": name, "args": {"__arg1": last.content}, "id": f"call_{uuid.uuid4().hex[:12]}"} for name in tools
+                ])
+        if role == "subagent" and not isinstance(last, ToolMessage):
+            name = next((name for name in self.bound_tools if name in SUBAGENT_TOOL_CALLS), None)
+            if name is not None:
+                return AIMessage(content="", tool_calls=[
+                    {"name": name, "args": SUBAGENT_TOOL_CALLS[name](str(last.content)), "id": f"call_{uuid.uuid4().hex[:12]}"}
+                ])
+        words = ["Here", "is", "the", "answer", "to", "your", "request."]
+        return AIMessage(content=" ".join((words * (self.answer_tokens // len(words) + 1))[:self.answer_tokens]))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency.sample() + self.token_latency * len(reply.content.split()))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency.sample() + self.token_latency * len(reply.content.split()))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _chunks(self, reply):
+        if reply.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ])]
+        return [AIMessageChunk(content=word if i == 0 else f" {word}") for i, word in enumerate(reply.content.split())]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency.sample())
+        for chunk in self._chunks(reply):
+            time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency.sample())
+        for chunk in self._chunks(reply):
+            await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+class LatencyEmbeddings(Embeddings):
+    """Deterministic fake embeddings with a latency per request."""
+
+    def __init__(self, size, latency, counter):
+        self.inner = DeterministicFakeEmbedding(size=size)
+        self.latency = latency
+        self.counter = counter
+
+    def embed_documents(self, texts):
+        self.counter.add("embedding")
+        time.sleep(self.latency.sample())
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.counter.add("embedding")
+        await asyncio.sleep(self.latency.sample())
+        return self.inner.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+###############################################################################
+# Scratch Environment
+###############################################################################
+
+def load_traces(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def create_database(path, customer_ids, seed=0):
+    """Application tables as they exist before migrations, with a year of payments per subscription."""
+    rng = random.Random(seed)
+    today = datetime.now().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE customers (id INTEGER PRIMARY KEY, customer_id TEXT, customer_name TEXT, customer_last_name TEXT, customer_created_date TEXT);
+    CREATE TABLE customer_subscriptions (id INTEGER PRIMARY KEY, customer_id TEXT, subscription_id TEXT, subscription_start_date TEXT, subscription_end_date TEXT, product_name TEXT);
+    CREATE TABLE subscription_payments (id INTEGER PRIMARY KEY, subscription_id TEXT, payment_date TEXT, amount_paid REAL);
+    CREATE TABLE customer_appointments (id INTEGER PRIMARY KEY, subscription_id TEXT, appointment_created_date TEXT, appointment_date TEXT, appointment_type TEXT);
+    """)
+    for i, customer_id in enumerate(customer_ids):
+        subscription_id = str(5000 + i)
+        start = today - timedelta(days=365)
+        conn.execute("INSERT INTO customers VALUES (NULL, ?, ?, ?, ?)", (customer_id, f"Name{i}", f"Last{i}", start.date().isoformat()))
+        conn.execute(
+            "INSERT INTO customer_subscriptions VALUES (NULL, ?, ?, ?, ?, ?)",
+            (customer_id, subscription_id, start.date().isoformat(), (start + timedelta(days=730)).date().isoformat(), rng.choice(PRODUCTS)["name"]),
+        )
+        conn.executemany(
+            "INSERT INTO subscription_payments VALUES (NULL, ?, ?, ?)",
+            [(subscription_id, (start + timedelta(days=30 * month)).date().isoformat(), 19.9) for month in range(12)],
+        )
+        conn.execute(
+            "INSERT INTO customer_appointments VALUES (NULL, ?, ?, ?, 'general physician')",
+            (subscription_id, today.isoformat(), (today + timedelta(days=rng.randint(2, 20), hours=rng.randint(0, 8))).isoformat()),
+        )
+    conn.commit()
+    conn.close()
+
+def configure_environment(workdir, overrides):
+    """Point every data path at the scratch directory; must run before the application modules are imported."""
+    source_dir = workdir / "source"
+    source_dir.mkdir(parents=True)
+    (source_dir / "products.json").write_text(json.dumps(PRODUCTS), encoding="utf-8")
+    (source_dir / "faq.json").write_text(json.dumps(FAQ), encoding="utf-8")
+    os.environ.update({
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "offline",
+        # config/settings.py strips the leading slashes, so the database path stays relative to the working directory
+        "DATABASE_URI": f"sqlite:///{(workdir / 'app.db').as_posix()}",
+        "JSON_DIR": str(source_dir),
+        "PROCESSED_DIR": str(workdir / "processed"),
+        "VECTOR_STORE_PATH": str(workdir / "vector_store" / "faiss_index"),
+        "EMBEDDING_CACHE_DIR": str(workdir / "embedding_cache"),
+        "LLM_CACHE_PATH": str(workdir / "llm_cache.sqlite"),
+        "LLM_CACHE_ENABLED": "false",
+    })
+    os.environ.update(overrides)
+
+def load_application(args, counter):
+    """Import the graph with the fakes patched into models.llm; agents bind `llm` and `embeddings` at import."""
+    import models.llm as llm_module
+    from models.embedding_cache import CachedEmbeddings
+
+    script = {turn["user"]: turn.get("tools", []) for trace in args.traces for turn in trace["turns"]}
+    llm_module.embeddings = CachedEmbeddings(
+        LatencyEmbeddings(args.embedding_size, Latency(args.embed_latency, args.sigma, seed=1), counter),
+        model="fake",
+    )
+    llm_module.llm = ScriptedChatModel(
+        script=script,
+        latency=Latency(args.llm_latency, args.sigma, seed=0),
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens,
+        counter=counter,
+        cache=None if args.llm_cache else False,
+    )
+    if args.llm_cache:
+        from models.llm_cache import SQLiteLLMCache
+        llm_module.llm.cache = SQLiteLLMCache(os.environ["LLM_CACHE_PATH"])
+
+    import graph.cs_graph as cs_graph
+    from config.settings import db_path
+    return cs_graph, db_path
+
+###############################################################################
+# Replay
+###############################################################################
+
+def database_stats(db_path):
+    """Logical database size (main file plus committed WAL frames) and checkpoint row counts."""
+    conn = sqlite3.connect(db_path)
+    try:
+        size = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("checkpoints", "writes") if table in tables}
+        return size, rows
+    finally:
+        conn.close()
+
+def turn_input(turn):
+    return {"messages": [HumanMessage(content=turn["user"])]}
+
+def replay(graph, summarizer, trace, thread_id):
+    from graph.streaming import stream_turn
+    config = {"configurable": {"thread_id": thread_id, "customer_id": trace["customer_id"]}}
+    results = []
+    for turn in trace["turns"]:
+        try:
+            done = list(stream_turn(graph, turn_input(turn), config, summarizer))[-1]
+            results.append((done["latency"], done["ttft"], None))
+        except Exception as e:
+            results.append((None, None, repr(e)))
+    summarizer.wait(config)
+    return results
+
+async def areplay(graph, summarizer, trace, thread_id, semaphore):
+    from graph.streaming import astream_turn
+    config = {"configurable": {"thread_id": thread_id, "customer_id": trace["customer_id"]}}
+    results = []
+    async with semaphore:
+        for turn in trace["turns"]:
+            try:
+                events = [event async for event in astream_turn(graph, turn_input(turn), config, summarizer)]
+                results.append((events[-1]["latency"], events[-1]["ttft"], None))
+            except Exception as e:
+                results.append((None, None, repr(e)))
+        await summarizer.await_pending(config)
+    return results
+
+def run_sync(cs_graph, conversations, concurrency, run_id):
+    graph = cs_graph.initialize_cs_graph(cs_graph.checkpointer)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(replay, graph, cs_graph.conversation_summarizer, trace, f"load-{run_id}-{i}")
+            for i, trace in enumerate(conversations)
+        ]
+        return [result for future in futures for result in future.result()]
+
+async def run_async(cs_graph, conversations, concurrency, run_id):
+    graph = await cs_graph.initialize_async_cs_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        groups = await asyncio.gather(*[
+            areplay(graph, cs_graph.conversation_summarizer, trace, f"load-{run_id}-{i}", semaphore)
+            for i, trace in enumerate(conversations)
+        ])
+    finally:
+        # The aiosqlite connection thread keeps the process alive until it is closed
+        await graph.checkpointer.conn.close()
+    return [result for group in groups for result in group]
+
+def percentiles(values):
+    values = np.array([value for value in values if value is not None])
+    return np.percentile(values, [50, 95, 99]) if len(values) else np.zeros(3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", type=Path, default=TRACES_PATH)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="conversations replayed at once")
+    parser.add_argument("--repeat", type=int, default=2, help="times each trace is replayed per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="median seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds per streamed token")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="median seconds per embedding request")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal sigma of both latency distributions")
+    parser.add_argument("--embedding-size", type=int, default=64)
+    parser.add_argument("--llm-cache", action="store_true", help="serve the scripted model through models/llm_cache.py")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="setting override, e.g. ROUTER_ENABLED=false")
+    parser.add_argument("--workdir", type=Path, default=Path("data"), help="parent of the scratch directory (relative paths only)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    args.traces = load_traces(args.traces)
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix="load_harness_", dir=args.workdir))
+    try:
+        create_database(workdir / "app.db", sorted({trace["customer_id"] for trace in args.traces}))
+        configure_environment(workdir, dict(override.split("=", 1) for override in args.env))
+        counter = CallCounter()
+        cs_graph, db_path = load_application(args, counter)
+
+        n_turns = sum(len(trace["turns"]) for trace in args.traces) * args.repeat
+        print(f"{len(args.traces)} traces x {args.repeat}: {n_turns} turns per level; mode {args.mode}; "
+              f"llm median {args.llm_latency}s + {args.token_latency}s/token, embeddings median {args.embed_latency}s")
+        print(f"{'conc':>5} {'turns/s':>8} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'ttft50':>7} "
+              f"{'llm/turn':>9} {'reasoner':>9} {'subagent':>9} {'unbound':>8} {'emb/turn':>9} {'errors':>7} {'db KB/turn':>11}")
+        for concurrency in args.concurrency:
+            conversations = [trace for _ in range(args.repeat) for trace in args.traces]
+            run_id = uuid.uuid4().hex[:8]
+            size_before, rows_before = database_stats(db_path)
+            calls_before = counter.snapshot()
+            started = time.perf_counter()
+            if args.mode == "sync":
+                results = run_sync(cs_graph, conversations, concurrency, run_id)
+            else:
+                results = asyncio.run(run_async(cs_graph, conversations, concurrency, run_id))
+            elapsed = time.perf_counter() - started
+            size_after, rows_after = database_stats(db_path)
+            calls = {name: count - calls_before.get(name, 0) for name, count in counter.snapshot().items()}
+
+            turns = len(results)
+            errors = [error for _, _, error in results if error]
+            p50, p95, p99 = percentiles(latency for latency, _, _ in results)
+            ttft50 = percentiles(ttft for _, ttft, _ in results)[0]
+            llm_calls = sum(calls.get(role, 0) for role in ("reasoner", "subagent", "unbound"))
+            print(
+                f"{concurrency:>5} {turns / elapsed:>8.2f} {p50:>6.2f} {p95:>6.2f} {p99:>6.2f} {ttft50:>7.2f} "
+                f"{llm_calls / turns:>9.2f} {calls.get('reasoner', 0) / turns:>9.2f} {calls.get('subagent', 0) / turns:>9.2f} "
+                f"{calls.get('unbound', 0) / turns:>8.2f} {calls.get('embedding', 0) / turns:>9.2f} {len(errors):>7} "
+                f"{(size_after - size_before) / 1024 / turns:>11.1f}"
+            )
+            for error in dict.fromkeys(errors):
+                print(f"      error: {error}")
+        rows = ", ".join(f"{table} {count}" for table, count in rows_after.items())
+        print(f"checkpoint DB: {size_after / 1024:.0f} KB total; rows: {rows}")
+    finally:
+        if args.keep:
+            print(f"scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Routing accuracy and supervisor LLM calls saved by the local intent router.
+
+Trains graph/router.py on its labelled examples and replays a held-out
+labelled set (benchmarks/router_replay.jsonl by default). Replay turns
+may carry the assistant's `previous` reply; turns answering a question in
+it are never dispatched, as in the graph.
+
+The threshold is tuned by k-fold cross-validation on the training
+examples only: the lowest candidate whose out-of-fold precision reaches
+--target-precision. The replay set is only used for reporting. For the
+tuned threshold and each --thresholds value it reports:
+
+  accuracy     argmax label vs. the true label, ignoring the threshold
+  dispatched   share of turns routed straight to a sub-agent
+  precision    share of dispatched turns sent to the right sub-agent
+  saved        supervisor LLM calls skipped (one per correct dispatch)
+  wasted       sub-agent runs spent on wrong dispatches
+
+A correct dispatch skips the reasoner hop that only picks the tool. A wrong
+one still reaches the reasoner afterwards, but costs one extra sub-agent run.
+
+Run from the repository root:
+
+    python -m benchmarks.router_eval --folds 5 --repeats 5 --target-precision 0.9
+"""
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from graph.router import REASONER_LABEL, ROUTER_EXAMPLES_PATH, IntentRouter, awaiting_answer, load_examples, load_router
+
+REPLAY_PATH = Path(__file__).with_name("router_replay.jsonl")
+CANDIDATE_THRESHOLDS = [round(t, 2) for t in np.arange(0.5, 0.96, 0.05)]
+
+def load_replay(path):
+    """(texts, previous replies, labels) from a JSON-lines replay file."""
+    texts, previous, labels = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record["text"])
+                previous.append(record.get("previous"))
+                labels.append(record["label"])
+    return texts, previous, labels
+
+def predict(router, texts, previous):
+    """(label, probability) per turn; turns answering the assistant's question go to the reasoner."""
+    return [
+        (REASONER_LABEL, 1.0) if awaiting_answer(reply) else prediction
+        for prediction, reply in zip(router.predict(texts), previous)
+    ]
+
+def cross_validated_predictions(texts, labels, folds, repeats=1):
+    """Out-of-fold (labels, predictions), one pass over the training examples per repeat with its own shuffle."""
+    out_labels, predictions = [], []
+    for seed in range(repeats):
+        order = list(range(len(texts)))
+        random.Random(seed).shuffle(order)
+        for fold in range(folds):
+            held_out = order[fold::folds]
+            held_out_set = set(held_out)
+            train = [i for i in order if i not in held_out_set]
+            router = IntentRouter().fit([texts[i] for i in train], [labels[i] for i in train])
+            out_labels += [labels[i] for i in held_out]
+            predictions += router.predict([texts[i] for i in held_out])
+    return out_labels, predictions
+
+def tune_threshold(labels, predictions, target_precision):
+    """Lowest candidate threshold whose precision reaches the target, or the highest candidate."""
+    for threshold in CANDIDATE_THRESHOLDS:
+        if evaluate(labels, predictions, threshold)["precision"] >= target_precision:
+            return threshold
+    return CANDIDATE_THRESHOLDS[-1]
+
+def evaluate(labels, predictions, threshold):
+    correct = sum(label == predicted for label, (predicted, _) in zip(labels, predictions))
+    dispatched = [
+        (label, predicted) for label, (predicted, probability) in zip(labels, predictions)
+        if predicted != REASONER_LABEL and probability >= threshold
+    ]
+    saved = sum(label == predicted for label, predicted in dispatched)
+    return {
+        "accuracy": correct / len(labels),
+        "dispatched": len(dispatched) / len(labels),
+        "precision": saved / len(dispatched) if dispatched else 1.0,
+        "saved": saved,
+        "wasted": len(dispatched) - saved,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=Path, default=ROUTER_EXAMPLES_PATH)
+    parser.add_argument("--replay", type=Path, default=REPLAY_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="*", default=[0.5, 0.7, 0.9], help="extra thresholds to report")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5, help="cross-validation passes with different shuffles")
+    parser.add_argument("--target-precision", type=float, default=0.9, help="out-of-fold precision the tuned threshold must reach")
+    args = parser.parse_args()
+
+    example_texts, example_labels = load_examples(args.examples)
+    out_of_fold = cross_validated_predictions(example_texts, example_labels, args.folds, args.repeats)
+    tuned = tune_threshold(*out_of_fold, args.target_precision)
+    tuning = evaluate(*out_of_fold, tuned)
+    print(f"threshold {tuned:.2f} tuned by {args.repeats}x{args.folds}-fold cross-validation on {len(example_texts)} training examples: "
+          f"out-of-fold precision {tuning['precision']:.1%}, dispatched {tuning['dispatched']:.1%}")
+
+    started = time.perf_counter()
+    router = load_router(args.examples, threshold=tuned)
+    train_ms = (time.perf_counter() - started) * 1000
+    texts, previous, labels = load_replay(args.replay)
+
+    started = time.perf_counter()
+    for text, reply in zip(texts, previous):
+        router.route(text, previous_reply=reply)
+    route_us = (time.perf_counter() - started) / len(texts) * 1e6
+
+    print(f"trained in {train_ms:.0f} ms; {len(texts)} replay turns ({sum(map(awaiting_answer, previous))} answering a question); "
+          f"{route_us:.0f} us per routing decision")
+    print(f"replay labels: {dict(Counter(labels))}")
+    predictions = predict(router, texts, previous)
+    print(f"{'threshold':>9} {'accuracy':>9} {'dispatched':>11} {'precision':>10} {'saved':>6} {'wasted':>7}")
+    for threshold in sorted({tuned, *args.thresholds}):
+        result = evaluate(labels, predictions, threshold)
+        print(
+            f"{threshold:>9.2f} {result['accuracy']:>9.1%} {result['dispatched']:>11.1%} "
+            f"{result['precision']:>10.1%} {result['saved']:>6} {result['wasted']:>7}"
+            f"{'  (tuned)' if threshold == tuned else ''}"
+        )
+
+    print("\nmisclassified (argmax):")
+    for text, label, (predicted, probability) in zip(texts, labels, predictions):
+        if predicted != label:
+            print(f"  {label:>16} -> {predicted:<16} {probability:.2f}  {text}")
+
+if __name__ == "__main__":
+    main()
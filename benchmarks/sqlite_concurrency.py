@@ -0,0 +1,138 @@
+"""
+Checkpoint + query throughput of the SQLite access layers as threads grow.
+
+Each worker thread loops over one turn's worth of database work: a
+customer lookup and a subscription join (agent reads) followed by a
+LangGraph checkpoint write. Two setups are compared on a synthetic
+database with the application's table layout:
+
+  legacy   one sqlite3 connection for the SqliteSaver and a default
+           SQLAlchemy engine for reads (the previous config/settings.py)
+  managed  config.connections.ConnectionManager: WAL pragmas, pooled
+           read-only connections and a single locked writer
+
+Run from the repository root:
+
+    python -m benchmarks.sqlite_concurrency --threads 1 2 4 8 16 --seconds 5
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+from config.connections import ConnectionManager
+
+CUSTOMER_QUERY = "SELECT customer_name, customer_last_name FROM customers WHERE customer_id = :customer_id"
+SUBSCRIPTIONS_QUERY = """
+SELECT s.subscription_id, s.product_name, COUNT(p.id)
+FROM customer_subscriptions s LEFT JOIN subscription_payments p ON p.subscription_id = s.subscription_id
+WHERE s.customer_id = :customer_id GROUP BY s.subscription_id
+"""
+
+###############################################################################
+# Synthetic Database
+###############################################################################
+
+def create_database(path, n_customers, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE customers (id INTEGER PRIMARY KEY, customer_id INTEGER, customer_name TEXT, customer_last_name TEXT, customer_created_date TEXT);
+    CREATE TABLE customer_subscriptions (id INTEGER PRIMARY KEY, customer_id INTEGER, subscription_id INTEGER, subscription_start_date TEXT, subscription_end_date TEXT, product_name TEXT);
+    CREATE TABLE subscription_payments (id INTEGER PRIMARY KEY, subscription_id INTEGER, payment_date TEXT, amount_paid REAL);
+    CREATE INDEX customers_customer_id ON customers (customer_id);
+    CREATE INDEX subscriptions_customer_id ON customer_subscriptions (customer_id);
+    CREATE INDEX payments_subscription_id ON subscription_payments (subscription_id);
+    """)
+    conn.executemany(
+        "INSERT INTO customers VALUES (NULL, ?, ?, ?, '2024-01-01')",
+        [(1000 + i, f"name{i}", f"last{i}") for i in range(n_customers)],
+    )
+    conn.executemany(
+        "INSERT INTO customer_subscriptions VALUES (NULL, ?, ?, '2024-01-01', '2025-01-01', 'tele doctor')",
+        [(1000 + i, 5000 + i) for i in range(n_customers)],
+    )
+    conn.executemany(
+        "INSERT INTO subscription_payments VALUES (NULL, ?, '2024-02-01', ?)",
+        [(5000 + rng.randrange(n_customers), 10.0) for _ in range(n_customers * 6)],
+    )
+    conn.commit()
+    conn.close()
+
+###############################################################################
+# Setups
+###############################################################################
+
+def legacy_setup(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(conn), create_engine(f"sqlite:///{path}"), conn.close
+
+def managed_setup(path):
+    connections = ConnectionManager(path)
+    return connections.checkpointer(), connections.read_engine, connections.close
+
+SETUPS = {"legacy": legacy_setup, "managed": managed_setup}
+
+###############################################################################
+# Benchmark
+###############################################################################
+
+def worker(saver, engine, n_customers, deadline, counts, errors, seed):
+    rng = random.Random(seed)
+    config = {"configurable": {"thread_id": str(uuid.uuid4()), "checkpoint_ns": ""}}
+    turns = 0
+    while time.perf_counter() < deadline:
+        customer_id = 1000 + rng.randrange(n_customers)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(CUSTOMER_QUERY), {"customer_id": customer_id}).fetchall()
+                conn.execute(text(SUBSCRIPTIONS_QUERY), {"customer_id": customer_id}).fetchall()
+            config = saver.put(config, empty_checkpoint(), {"source": "loop", "step": turns}, {})
+            turns += 1
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+    counts.append(turns)
+
+def run(setup, path, n_threads, seconds, n_customers):
+    saver, engine, close = SETUPS[setup](path)
+    saver.setup()
+    counts, errors = [], []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=worker, args=(saver, engine, n_customers, deadline, counts, errors, seed))
+        for seed in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    close()
+    return sum(counts) / seconds, len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--setups", nargs="+", default=list(SETUPS), choices=list(SETUPS))
+    args = parser.parse_args()
+
+    print("turn = 2 reads + 1 checkpoint write")
+    print(f"{'setup':>8} {'threads':>8} {'turns/s':>10} {'errors':>7}")
+    for setup in args.setups:
+        for n_threads in args.threads:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "bench.db"
+                create_database(path, args.customers)
+                turns_per_second, n_errors = run(setup, path, n_threads, args.seconds, args.customers)
+            print(f"{setup:>8} {n_threads:>8} {turns_per_second:>10.0f} {n_errors:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Memory footprint versus recall of the compact vector storage modes.
+
+For each configuration (Matryoshka truncation x float32/float16/int8/PQ
+storage) this builds a flat index over a synthetic corpus, reports bytes per
+vector of the serialized index and recall@k against exact full-precision
+search, both straight from the compact index and after re-ranking the top
+k * rerank_factor candidates at full precision (as RerankingFAISS does).
+
+The synthetic vectors have a decaying per-dimension variance so that, like
+text-embedding-3 vectors, the leading dimensions carry most of the signal.
+
+Run from the repository root:
+
+    python -m benchmarks.storage_report --n 100000 --dim 3072 --truncate 0 1024 256
+"""
+import argparse
+import numpy as np
+import faiss
+from models.index_factory import STORAGE_TYPES, build_index
+from models.compact_vectors import truncate_vectors, rerank
+
+###############################################################################
+# Synthetic Data
+###############################################################################
+
+def matryoshka_corpus(n_vectors, dimension, n_clusters=256, seed=0):
+    """Clustered unit vectors whose variance decays along the dimensions."""
+    rng = np.random.default_rng(seed)
+    scale = (1.0 / np.sqrt(np.arange(1, dimension + 1))).astype(np.float32)
+    centres = rng.standard_normal((n_clusters, dimension)).astype(np.float32) * scale
+    labels = rng.integers(0, n_clusters, n_vectors)
+    vectors = centres[labels] + 0.3 * scale * rng.standard_normal((n_vectors, dimension), dtype=np.float32)
+    return truncate_vectors(vectors, dimension)
+
+def queries_from(corpus, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(corpus), n_queries)
+    noise = 0.05 * rng.standard_normal((n_queries, corpus.shape[1]), dtype=np.float32)
+    return truncate_vectors(corpus[picks] + noise, corpus.shape[1])
+
+###############################################################################
+# Report
+###############################################################################
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) for f, t in zip(found, truth)])) / truth.shape[1]
+
+def evaluate(corpus, queries, truth, k, truncate_to, storage, rerank_factor, pq_m, train_size):
+    compact_corpus = truncate_vectors(corpus, truncate_to)
+    compact_queries = truncate_vectors(queries, truncate_to)
+    dimension = compact_corpus.shape[1]
+
+    training = compact_corpus[:train_size]
+    index = build_index("flat", dimension, training_vectors=training, storage=storage, pq_m=pq_m)
+    index.add(compact_corpus)
+    bytes_per_vector = faiss.serialize_index(index).nbytes / len(corpus)
+
+    _, found = index.search(compact_queries, k)
+    _, candidates = index.search(compact_queries, k * rerank_factor)
+    reranked = []
+    for query, ids in zip(queries, candidates):
+        ids = ids[ids >= 0]
+        positions, _ = rerank(query, corpus[ids], k)
+        reranked.append(ids[positions])
+
+    return {
+        "dim": dimension,
+        "storage": storage,
+        "bytes": bytes_per_vector,
+        "recall": recall(found, truth),
+        "recall_rerank": recall(reranked, truth),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--truncate", type=int, nargs="+", default=[0, 1024, 256])
+    parser.add_argument("--storage", nargs="+", default=list(STORAGE_TYPES), choices=STORAGE_TYPES)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--train-size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    corpus = matryoshka_corpus(args.n, args.dim)
+    queries = queries_from(corpus, args.queries)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    baseline = 4 * args.dim
+    print(f"{args.n} vectors, full precision = {baseline} bytes/vector")
+    print(f"{'dim':>6} {'storage':>8} {'bytes/vec':>10} {'x smaller':>10} {f'recall@{args.k}':>10} {'+rerank':>8}")
+    for truncate_to in args.truncate:
+        for storage in args.storage:
+            row = evaluate(
+                corpus, queries, truth, args.k, truncate_to, storage,
+                args.rerank_factor, args.pq_m, args.train_size,
+            )
+            print(
+                f"{row['dim']:>6} {row['storage']:>8} {row['bytes']:>10.0f} {baseline / row['bytes']:>10.1f} "
+                f"{row['recall']:>10.3f} {row['recall_rerank']:>8.3f}"
+            )
+
+if __name__ == "__main__":
+    main()
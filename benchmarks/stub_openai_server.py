@@ -0,0 +1,177 @@
+"""
+Local OpenAI-compatible stub for load tests of the LLM client layer.
+
+Serves /v1/chat/completions (plain and streamed) and /v1/embeddings with
+injected latency, and answers 429 with a Retry-After header when its own
+limits are exceeded:
+
+  --rpm          requests per sliding minute before 429s
+  --concurrency  requests served at once before 429s
+  --error-rate   share of requests answered 429 at random
+
+GET /stats returns the served / throttled counters. Point the application
+at it with OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub.
+
+    python -m benchmarks.stub_openai_server --port 8089 --rpm 600 --concurrency 16
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSION = 8
+
+###############################################################################
+# Stub Server
+###############################################################################
+
+class StubState:
+    def __init__(self, rpm, concurrency, error_rate, latency, jitter, retry_after):
+        self.rpm = rpm
+        self.concurrency = concurrency
+        self.error_rate = error_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.window = deque()
+        self.counters = {"requests": 0, "served": 0, "throttled": 0, "max_in_flight": 0}
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """True when the request may be served; False means answer 429."""
+        with self.lock:
+            now = time.monotonic()
+            self.counters["requests"] += 1
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if (len(self.window) >= self.rpm or self.in_flight >= self.concurrency
+                    or random.random() < self.error_rate):
+                self.counters["throttled"] += 1
+                return False
+            self.window.append(now)
+            self.in_flight += 1
+            self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.in_flight)
+            return True
+
+    def finish(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.counters["served"] += 1
+
+    def delay(self):
+        return max(0.0, random.gauss(self.latency, self.jitter))
+
+def embedding(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255 for b in digest[:EMBEDDING_DIMENSION]]
+
+def chat_reply(body):
+    last = next((m.get("content") for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+    return f"stub answer to: {str(last)[:80]}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=()):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.state.lock:
+                self._json(200, dict(self.server.state.counters))
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        state = self.server.state
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith(("/chat/completions", "/embeddings")):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        if not state.admit():
+            self._json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                       headers=[("Retry-After", str(state.retry_after))])
+            return
+        try:
+            time.sleep(state.delay())
+            if self.path.endswith("/embeddings"):
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                self._json(200, {
+                    "object": "list",
+                    "model": body.get("model"),
+                    "data": [{"object": "embedding", "index": i, "embedding": embedding(str(text))} for i, text in enumerate(inputs)],
+                    "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+                })
+            elif body.get("stream"):
+                self._stream(body)
+            else:
+                self._json(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": chat_reply(body)}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                })
+        finally:
+            state.finish()
+
+    def _stream(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in chat_reply(body).split(" "):
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": word + " "}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+def start_server(port=0, rpm=600, concurrency=16, error_rate=0.0, latency=0.2, jitter=0.05, retry_after=1.0):
+    """Start the stub on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(rpm, concurrency, error_rate, latency, jitter, retry_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="latency standard deviation in seconds")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.rpm, args.concurrency, args.error_rate, args.latency, args.jitter, args.retry_after)
+    print(f"stub OpenAI server on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
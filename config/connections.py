@@ -0,0 +1,133 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+import aiosqlite
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# This module only opens connections when a ConnectionManager is created, so benchmarks can import it
+
+# Define SQLite connection settings from environment variables
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_WRITE_RETRIES = int(os.getenv("SQLITE_WRITE_RETRIES", "5"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def apply_pragmas(conn, readonly=False):
+    """Pragmas for a busy multi-threaded service; journal mode is set by the writer and persists in the file."""
+    if not readonly:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL durable against application crashes; only a power loss can drop the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def is_busy_error(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error)
+    )
+
+###############################################################################
+# Connection Manager
+###############################################################################
+
+class ConnectionManager:
+    """
+    WAL-mode access to one SQLite file: a pool of read-only connections for
+    agent queries and a single writer connection for checkpoints and bookings.
+
+    In WAL mode readers never block the writer and the writer never blocks
+    readers, so only writes are serialized, through `write_lock`. Writes that
+    still hit SQLITE_BUSY (another process holding the lock past
+    busy_timeout) are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, db_path, pool_size=SQLITE_READ_POOL_SIZE, write_retries=SQLITE_WRITE_RETRIES):
+        self.db_path = Path(db_path)
+        self.write_retries = write_retries
+        self.write_lock = threading.RLock()
+        self.writer = apply_pragmas(
+            sqlite3.connect(self.db_path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        )
+        self.read_engine = create_engine(
+            "sqlite://",
+            creator=self._new_reader,
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=0,
+            pool_pre_ping=False,
+        )
+
+    def _new_reader(self):
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        )
+        return apply_pragmas(conn, readonly=True)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a pooled read-only DB-API connection."""
+        conn = self.read_engine.raw_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def run_write(self, func, immediate=True):
+        """
+        Run func(conn) in a write transaction on the writer connection and
+        commit. BEGIN IMMEDIATE takes the write lock up front, so a
+        read-then-write inside `func` cannot be invalidated by another writer.
+        """
+        for attempt in range(self.write_retries + 1):
+            with self.write_lock:
+                try:
+                    self.writer.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+                    result = func(self.writer)
+                    self.writer.commit()
+                    return result
+                except Exception as e:
+                    if self.writer.in_transaction:
+                        self.writer.rollback()
+                    if not is_busy_error(e) or attempt == self.write_retries:
+                        raise
+            time.sleep(min(1.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def execute_write(self, query, parameters=()):
+        """Execute one parameterized write statement; returns the number of affected rows."""
+        return self.run_write(lambda conn: conn.execute(query, parameters).rowcount)
+
+    def checkpointer(self):
+        """SqliteSaver on the writer connection, sharing the write lock with bookings."""
+        saver = SqliteSaver(self.writer)
+        saver.lock = self.write_lock
+        return saver
+
+    async def async_checkpointer(self):
+        """
+        AsyncSqliteSaver on its own aiosqlite connection, for graphs driven with
+        ainvoke/astream. It must be created on the event loop that will use it.
+        Its writes are not under `write_lock`; in WAL mode they wait on
+        busy_timeout for the sync writer instead. Close it with `await saver.conn.close()`.
+        """
+        conn = await aiosqlite.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        await conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        return AsyncSqliteSaver(conn)
+
+    def close(self):
+        self.read_engine.dispose()
+        self.writer.close()
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+
+###############################################################################
+# Data Steps
+###############################################################################
+
+class MigrationError(Exception):
+    """Raised when existing data must be fixed by an operator before a migration can run."""
+
+def complete_past_appointments(conn):
+    marked = conn.execute(
+        "UPDATE customer_appointments SET appointment_status = 'completed' "
+        "WHERE appointment_status = 'active' AND appointment_date < strftime('%Y-%m-%dT%H:%M:%S', 'now')"
+    ).rowcount
+    print(f"Marked {marked} past appointments as completed")
+
+def require_one_active_appointment(conn):
+    """Fail with the conflicting rows when a subscription has several active appointments."""
+    rows = conn.execute(
+        "SELECT subscription_id, id, appointment_date, appointment_type FROM customer_appointments "
+        "WHERE appointment_status = 'active' AND subscription_id IN ("
+        "SELECT subscription_id FROM customer_appointments WHERE appointment_status = 'active' "
+        "GROUP BY subscription_id HAVING COUNT(*) > 1) "
+        "ORDER BY subscription_id, appointment_date"
+    ).fetchall()
+    if rows:
+        listing = "\n".join(f"  subscription {sub}: id {_id} on {date} ({kind})" for sub, _id, date, kind in rows)
+        raise MigrationError(
+            f"{len(rows)} active appointments share a subscription:\n{listing}\n"
+            "Keep one active appointment per subscription (set appointment_status to 'cancelled' "
+            "or 'completed' on the others) and restart."
+        )
+
+###############################################################################
+# Migrations
+###############################################################################
+
+# (version, name, steps). Append only; applied versions are recorded in schema_migrations.
+# A step is an SQL statement or a function of the connection.
+MIGRATIONS = [
+    (1, "covering indexes for agent access paths", [
+        # customer lookups by customer_id
+        "CREATE INDEX IF NOT EXISTS idx_customers_customer_id "
+        "ON customers (customer_id, customer_name, customer_last_name)",
+        # customer -> subscriptions, the first hop of every account query
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_customer_id "
+        "ON customer_subscriptions (customer_id, subscription_id, product_name, subscription_start_date, subscription_end_date)",
+        # subscription -> appointments, usually with an appointment_date range
+        "CREATE INDEX IF NOT EXISTS idx_appointments_subscription_date "
+        "ON customer_appointments (subscription_id, appointment_date, appointment_type)",
+        # subscription -> payments, usually ordered by payment_date
+        "CREATE INDEX IF NOT EXISTS idx_payments_subscription_date "
+        "ON subscription_payments (subscription_id, payment_date, amount_paid)",
+        # table statistics for the planner and the query guard
+        "ANALYZE",
+    ]),
+    (2, "appointment status", [
+        "ALTER TABLE customer_appointments ADD COLUMN appointment_status TEXT NOT NULL DEFAULT 'active'",
+        # Past appointments are no longer active
+        complete_past_appointments,
+        "CREATE INDEX IF NOT EXISTS idx_appointments_active_slot "
+        "ON customer_appointments (appointment_type, appointment_date) WHERE appointment_status = 'active'",
+    ]),
+    (3, "one active appointment per subscription", [
+        # Conflicting bookings are left to an operator; the migration fails until they are resolved
+        require_one_active_appointment,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_one_active "
+        "ON customer_appointments (subscription_id) WHERE appointment_status = 'active'",
+    ]),
+]
+
+# Indexes that must exist, as {index name: (table, leading columns)}
+EXPECTED_INDEXES = {
+    "idx_customers_customer_id": ("customers", ["customer_id"]),
+    "idx_subscriptions_customer_id": ("customer_subscriptions", ["customer_id", "subscription_id"]),
+    "idx_appointments_subscription_date": ("customer_appointments", ["subscription_id", "appointment_date"]),
+    "idx_payments_subscription_date": ("subscription_payments", ["subscription_id", "payment_date"]),
+    "idx_appointments_one_active": ("customer_appointments", ["subscription_id"]),
+    "idx_appointments_active_slot": ("customer_appointments", ["appointment_type", "appointment_date"]),
+}
+
+def applied_versions(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+    return {version for (version,) in conn.execute("SELECT version FROM schema_migrations")}
+
+def apply_migrations(connections, migrations=MIGRATIONS):
+    """Apply pending migrations, each in its own write transaction. Returns the versions applied."""
+    applied = []
+    for version, name, steps in migrations:
+        def migrate(conn):
+            if version in applied_versions(conn):
+                return False
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_migrations VALUES (?, ?, ?)",
+                (version, name, datetime.now(tz=timezone.utc).isoformat()),
+            )
+            return True
+
+        if connections.run_write(migrate):
+            print(f"Applied migration {version}: {name}")
+            applied.append(version)
+    return applied
+
+def verify_indexes(conn, expected=EXPECTED_INDEXES):
+    """Names of expected indexes that are missing or do not lead with the expected columns."""
+    problems = []
+    for index_name, (table, columns) in expected.items():
+        index_columns = [row[2] for row in conn.execute(f"PRAGMA index_info({index_name})")]
+        owner = conn.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)).fetchone()
+        if owner is None or owner[0] != table or index_columns[:len(columns)] != columns:
+            problems.append(index_name)
+    return problems
@@ -1,5 +1,4 @@
 import os
-import sqlite3
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 from langchain_community.utilities.sql_database import SQLDatabase
@@ -8,11 +7,14 @@ from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 from langchain_core.messages import AnyMessage
+from config.connections import ConnectionManager
+from config.migrations import apply_migrations, verify_indexes
 
 # Define Graph State Class
 class GraphState(MessagesState):
     thread_id: str
     customer_id: str
+    customer_profile: str
 
 # Load environment variables from .env
 load_dotenv()
@@ -33,10 +35,17 @@ db_path = parsed_uri.path.lstrip('/')
 LANGCHAIN_TRACING_V2=True
 LANGCHAIN_ENDPOINT="https://api.smith.langchain.com"
  
-# Initialize db
-db_conn = sqlite3.connect(db_path, check_same_thread=False)
-db = SQLDatabase.from_uri(
-    DATABASE_URI, 
+# Initialize db: WAL mode, pooled read-only connections for the agents and one writer for checkpoints and bookings
+connections = ConnectionManager(db_path)
+db_conn = connections.writer
+
+# Create the indexes the agents' access paths depend on
+apply_migrations(connections)
+missing_indexes = verify_indexes(connections.writer)
+if missing_indexes:
+    print(f"Warning: missing or unexpected indexes: {', '.join(missing_indexes)}")
+db = SQLDatabase(
+    connections.read_engine,
     include_tables=[
         'customers',
         'customer_subscriptions',
@@ -83,7 +92,8 @@ db = SQLDatabase.from_uri(
                 "subscription_id (Unique identifier for subscription), "
                 "appointment_created_date (Date when the appointment was created), "
                 "appointment_date (Scheduled date of the appointment), "
-                "appointment_type (Type of appointment, e.g., general physician, specialist)."
+                "appointment_type (Type of appointment, e.g., general physician, specialist), "
+                "appointment_status (active/cancelled/completed; only active appointments are current bookings, filter on it for upcoming appointments)."
             )
         }
     )
\ No newline at end of file
@@ -0,0 +1,213 @@
+import os
+import json
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, RemoveMessage
+from models.embedding_cache import estimate_tokens
+
+# Define conversation memory settings from environment variables
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000"))
+CONVERSATION_KEEP_TOKENS = int(os.getenv("CONVERSATION_KEEP_TOKENS", "800"))
+CONVERSATION_HARD_LIMIT_TOKENS = int(os.getenv("CONVERSATION_HARD_LIMIT_TOKENS", "6000"))
+CONVERSATION_SUMMARY_WORKERS = int(os.getenv("CONVERSATION_SUMMARY_WORKERS", "2"))
+
+SUMMARY_ID = "summary"
+# Messages that are never folded into the summary
+PINNED_IDS = {"customer_id"}
+# Graph node that post-turn summary updates are attributed to
+MEMORY_NODE = "memory"
+
+FOLD_PROMPT = """You maintain a running summary of a customer service conversation.
+Keep every fact that later turns may need: customer and subscription ids, requests, decisions, bookings, amounts and open questions.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{transcript}
+
+Return only the updated summary."""
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def message_tokens(message):
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = json.dumps(getattr(message, "tool_calls", None) or [])
+    # A few tokens of per-message overhead (role, separators)
+    return estimate_tokens(content) + (estimate_tokens(tool_calls) if tool_calls != "[]" else 0) + 4
+
+def conversation_tokens(messages):
+    return sum(message_tokens(message) for message in messages)
+
+def render_transcript(messages):
+    """Plain-text transcript; tool calls and results are flattened so any slice can be sent to the model."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"{message.name or 'Tool'} returned: {message.content}")
+        elif isinstance(message, AIMessage):
+            if message.content:
+                lines.append(f"Assistant: {message.content}")
+            for call in message.tool_calls:
+                lines.append(f"Assistant called {call['name']} with {json.dumps(call['args'])}")
+    return "\n".join(lines)
+
+def split_aged(messages, keep_tokens=CONVERSATION_KEEP_TOKENS):
+    """
+    (summary message, aged messages) for a conversation. The recent window
+    kept verbatim starts at a user message, so a tool call is never
+    separated from its result, and always includes the latest user message.
+    """
+    summary = next((m for m in messages if m.id == SUMMARY_ID), None)
+    body = [m for m in messages if m.id != SUMMARY_ID and m.id not in PINNED_IDS]
+    starts = [index for index, message in enumerate(body) if isinstance(message, HumanMessage)]
+    if not starts:
+        return summary, []
+
+    cut = starts[-1]
+    for index in starts:
+        if conversation_tokens(body[index:]) <= keep_tokens:
+            cut = index
+            break
+    return summary, body[:cut]
+
+###############################################################################
+# Rolling Summarizer
+###############################################################################
+
+class RollingSummarizer:
+    """
+    Keeps a conversation under a token budget by folding aged-out messages
+    into the `summary` message and removing them from the state.
+
+    Only messages older than the recent window are sent to the model,
+    together with the current summary, so each update costs a bounded
+    prompt. Updates normally run after the response is delivered
+    (`schedule`/`aschedule`); the graph only summarizes inline when a
+    thread exceeds `hard_limit` tokens.
+    """
+
+    def __init__(self, llm, budget=CONVERSATION_TOKEN_BUDGET, keep_tokens=CONVERSATION_KEEP_TOKENS,
+                 hard_limit=CONVERSATION_HARD_LIMIT_TOKENS, max_workers=CONVERSATION_SUMMARY_WORKERS):
+        self.llm = llm
+        self.budget = budget
+        self.keep_tokens = keep_tokens
+        self.hard_limit = hard_limit
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def over_budget(self, messages):
+        return conversation_tokens(messages) > self.budget
+
+    def over_hard_limit(self, messages):
+        return conversation_tokens(messages) > self.hard_limit
+
+    def _prompt(self, messages):
+        summary, aged = split_aged(messages, self.keep_tokens)
+        if not aged:
+            return None, aged
+        prompt = FOLD_PROMPT.format(
+            summary=summary.content if summary else "(none yet)",
+            transcript=render_transcript(aged),
+        )
+        return [SystemMessage(content=prompt)], aged
+
+    def _update(self, response, aged, messages):
+        summary = AIMessage(content=response.content, id=SUMMARY_ID)
+        removed = [RemoveMessage(id=m.id) for m in aged]
+        if any(m.id == SUMMARY_ID for m in messages):
+            # An existing summary is replaced in place, ahead of the recent window
+            return {"messages": [summary] + removed}
+        # add_messages appends new ids, so the first summary would land after the latest user message;
+        # the recent window is re-added behind it under fresh ids instead
+        aged_ids = {m.id for m in aged}
+        retained = [m for m in messages if m.id not in aged_ids and m.id not in PINNED_IDS]
+        return {"messages": removed + [RemoveMessage(id=m.id) for m in retained] + [summary] + [
+            m.model_copy(update={"id": str(uuid.uuid4())}) for m in retained
+        ]}
+
+    def summarize(self, messages):
+        """State update folding the aged messages into the summary, or None when nothing has aged out."""
+        prompt, aged = self._prompt(messages)
+        if prompt is None:
+            return None
+        return self._update(self.llm.invoke(prompt), aged, messages)
+
+    async def asummarize(self, messages):
+        prompt, aged = self._prompt(messages)
+        if prompt is None:
+            return None
+        return self._update(await self.llm.ainvoke(prompt), aged, messages)
+
+    # Post-turn updates ------------------------------------------------------
+
+    @staticmethod
+    def _thread_id(config):
+        return str(config.get("configurable", {}).get("thread_id"))
+
+    def _run(self, graph, config):
+        try:
+            messages = graph.get_state(config).values.get("messages", [])
+            if self.over_budget(messages):
+                update = self.summarize(messages)
+                if update:
+                    graph.update_state(config, update, as_node=MEMORY_NODE)
+        except Exception as e:
+            print(f"Conversation summary failed for thread {self._thread_id(config)}: {e}")
+
+    async def _arun(self, graph, config):
+        try:
+            messages = (await graph.aget_state(config)).values.get("messages", [])
+            if self.over_budget(messages):
+                update = await self.asummarize(messages)
+                if update:
+                    await graph.aupdate_state(config, update, as_node=MEMORY_NODE)
+        except Exception as e:
+            print(f"Conversation summary failed for thread {self._thread_id(config)}: {e}")
+
+    def schedule(self, graph, config):
+        """Summarize the thread in the background once the turn is done; one update per thread at a time."""
+        thread_id = self._thread_id(config)
+        with self._lock:
+            pending = self._pending.get(thread_id)
+            if pending is not None and not pending.done():
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="summary")
+            pending = self._pending[thread_id] = self._executor.submit(self._run, graph, config)
+        # Outside the lock: the callback runs right away if the update already finished
+        pending.add_done_callback(lambda done: self._forget(thread_id, done))
+
+    def aschedule(self, graph, config):
+        """Async counterpart of schedule; must be called on the event loop that runs the graph."""
+        thread_id = self._thread_id(config)
+        pending = self._pending.get(thread_id)
+        if pending is not None and not pending.done():
+            return
+        pending = self._pending[thread_id] = asyncio.get_running_loop().create_task(self._arun(graph, config))
+        pending.add_done_callback(lambda done: self._forget(thread_id, done))
+
+    def _forget(self, thread_id, pending):
+        # Finished updates are dropped, so abandoned threads do not keep entries for the life of the process
+        with self._lock:
+            if self._pending.get(thread_id) is pending:
+                del self._pending[thread_id]
+
+    def wait(self, config):
+        """Block until the thread's pending update is written, so the next turn reads the folded state."""
+        pending = self._pending.pop(self._thread_id(config), None)
+        if pending is not None:
+            pending.result()
+
+    async def await_pending(self, config):
+        pending = self._pending.pop(self._thread_id(config), None)
+        if pending is not None:
+            await pending
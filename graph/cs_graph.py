@@ -1,18 +1,43 @@
-from langgraph.graph import START, StateGraph
+import asyncio
+import uuid
+from langgraph.graph import START, END, StateGraph
 from langgraph.prebuilt import tools_condition
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langchain.tools import Tool
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, RemoveMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
 from config.settings import GraphState
-from config.settings import db_conn
-from models.llm import llm
+from config.settings import connections, db
+from models.llm import llm, embeddings
+from models.semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED
+from models.vector_store import MANIFEST_PATH
 from agents.sql_agent import create_sql_agent
 from agents.rag_agent import create_rag_agent
 from agents.booking_agent import create_appointment_agent
+from agents.customer_profile import profile_cache
+from graph.conversation_memory import RollingSummarizer, SUMMARY_ID, MEMORY_NODE
+from graph.router import ROUTER_ENABLED, load_router
 
-# Initialize the checkpointer
-checkpointer = SqliteSaver(db_conn)
+# Initialize the checkpointer on the dedicated writer connection
+checkpointer = connections.checkpointer()
+
+# Answers of the RAG agent, shared across threads and invalidated when the knowledge base changes
+rag_answer_cache = SemanticCache(embeddings, MANIFEST_PATH)
+
+# Folds aged-out messages into the conversation summary, normally after the turn (see graph/streaming.py)
+conversation_summarizer = RollingSummarizer(llm)
+
+# Local intent classifier that dispatches clear-cut requests without the first reasoner hop
+intent_router = load_router() if ROUTER_ENABLED else None
+
+# Sub-agents whose routed queries need the customer_id
+CUSTOMER_TOOLS = {"SQLAgentTool", "BookingAgentTool"}
+
+# Prefix of the error results returned by the sub-agents' tools
+TOOL_ERROR_PREFIX = "An error occurred"
+
+class FailedResponse(str):
+    """Sub-agent answer given after one of its tools failed; passed to the reasoner but never cached."""
 
 def initialize_cs_graph(checkpointer):
     
@@ -34,13 +59,60 @@ def initialize_cs_graph(checkpointer):
         # Concatenate the contents into a single string
         return " ".join(ai_contents) if ai_contents else "The Agent did not return any meaningful content."
 
+    def query_position(messages, query):
+        # The agent's thread also holds earlier calls; this call starts at its own prompt message
+        return max((i for i, m in enumerate(messages) if isinstance(m, AIMessage) and m.content == query), default=-1)
+
+    def agent_failed(agent_response, query):
+        # Sub-agent tools report failures as "An error occurred: ..." results rather than raising
+        messages = agent_response.get("messages", [])
+        return any(
+            isinstance(message, ToolMessage) and (message.status == "error" or str(message.content).startswith(TOOL_ERROR_PREFIX))
+            for message in messages[query_position(messages, query) + 1:]
+        )
+
+    def rag_response(agent_response, query):
+        # Only the final answer is returned and cached, never the prompt or earlier calls of the thread
+        messages = agent_response.get("messages", [])
+        if not messages:
+            return "No response received from agent."
+        answer = next(
+            (m.content for m in reversed(messages[query_position(messages, query) + 1:]) if isinstance(m, AIMessage) and m.content),
+            "The Agent did not return any meaningful content.",
+        )
+        return FailedResponse(answer) if agent_failed(agent_response, query) else answer
+
+    def is_meaningful_response(response):
+        # Answers written around a transient failure must not be served to other threads
+        if isinstance(response, FailedResponse) or response.startswith(TOOL_ERROR_PREFIX):
+            return False
+        return response not in ("No response received from agent.", "The Agent did not return any meaningful content.")
+
+    def ask_rag_agent(query):
+        return rag_response(rag_agent.invoke({"messages": [AIMessage(content=query)]}), query)
+
+    async def aask_rag_agent(query):
+        return rag_response(await rag_agent.ainvoke({"messages": [AIMessage(content=query)]}), query)
+
+    if SEMANTIC_CACHE_ENABLED:
+        ask_rag_agent = rag_answer_cache.cached(ask_rag_agent, cacheable=is_meaningful_response)
+        aask_rag_agent = rag_answer_cache.acached(aask_rag_agent, cacheable=is_meaningful_response)
+
+    # Async counterparts used by ainvoke/astream: the tool node gathers parallel tool calls on one event loop
+    async def aask_sql_agent(query):
+        return extract_relevant_response(await sql_agent.ainvoke({"messages": [AIMessage(content=query)]}))
+
+    async def aask_booking_agent(query):
+        return extract_relevant_response(await booking_agent.ainvoke({"messages": [AIMessage(content=query)]}))
+
     # Wrap the agents as callable tools
     sql_agent_tool = Tool(
         name="SQLAgentTool",
         description="Fetches customer information based on SQL queries using the customer_id.",
         func=
         #lambda query: sql_agent.invoke({"messages": [HumanMessage(content=query),],}),
-        lambda query: extract_relevant_response(sql_agent.invoke({"messages": [AIMessage(content=query)]}))
+        lambda query: extract_relevant_response(sql_agent.invoke({"messages": [AIMessage(content=query)]})),
+        coroutine=aask_sql_agent,
         )
 
     rag_agent_tool = Tool(
@@ -48,7 +120,8 @@ def initialize_cs_graph(checkpointer):
         description="Fetches company related information based on RAG search.",
         func=
         #lambda query: extract_relevant_response(rag_agent.invoke({"messages": [AIMessage(content=query)]}))
-        lambda query: extract_relevant_response(rag_agent.invoke({"messages": [AIMessage(content=query)]}))
+        ask_rag_agent,
+        coroutine=aask_rag_agent,
         )
 
     booking_agent_tool = Tool(
@@ -56,7 +129,8 @@ def initialize_cs_graph(checkpointer):
         description="Creates, cancels or updates appointments based on the user's request.",
         func=
         #lambda query: extract_relevant_response(booking_agent.invoke({"messages": [AIMessage(content=query)]}))
-        lambda query: extract_relevant_response(booking_agent.invoke({"messages": [AIMessage(content=query)]}))
+        lambda query: extract_relevant_response(booking_agent.invoke({"messages": [AIMessage(content=query)]})),
+        coroutine=aask_booking_agent,
         )
 
     # Consolidate tools
@@ -67,7 +141,8 @@ def initialize_cs_graph(checkpointer):
     initial_instructions = '''
     You are Addae, a customer service agent responsible for directly interacting with the customer.
     - Receive customer queries and respond to them politely and professionally.
-    - If the query relates to customer specific information, use the sql_agent to retrieve customer specific information and the other two tools to complete the request if needed.
+    - A customer profile (subscriptions, recent payments, upcoming appointments) is provided below when available. Answer account questions it covers directly from the profile, without calling any tool.
+    - If the query relates to customer specific information not covered by the profile, use the sql_agent to retrieve customer specific information and the other two tools to complete the request if needed.
     - Dr consultations or appointment booking requests must be managed with booking_agent_tool.
     - Appointment creation and modification should be associated to a specific subscription. If a customer has multiple subscriptions make sure user selects 1 before proceeding.
     - If you require information about the company, products or services use the rag_agent to search for information for solving.
@@ -78,61 +153,104 @@ def initialize_cs_graph(checkpointer):
     '''
     sys_msg = SystemMessage(content=initial_instructions)
 
+    # Load the customer profile once per turn (served from cache unless a booking changed it)
+    def load_profile(state: GraphState, config):
+        customer_id = state.get("customer_id") or config.get("configurable", {}).get("customer_id")
+        if not customer_id:
+            return {}
+        try:
+            return {"customer_id": customer_id, "customer_profile": profile_cache.get(customer_id, db)}
+        except Exception as e:
+            print(f"Could not load customer profile for {customer_id}: {e}")
+            return {}
+
+    async def aload_profile(state: GraphState, config):
+        # SQLite has no async driver here; the profile queries run on the default executor
+        return await asyncio.to_thread(load_profile, state, config)
+
     # Function to decide whether to summarize
     def should_summarize(state: GraphState):
         """Determine the next node to transition to."""
-        messages = state["messages"]
-        if len(messages) > 6:
+        # Summaries normally run after the turn; only a thread past the hard limit is summarized inline
+        if conversation_summarizer.over_hard_limit(state["messages"]):
             return "summary"
-        return "reasoner"
+        return "router"
 
     # Summary function
     def summary(state: GraphState):
-        # Get the latest human message
-        latest_message_id = next((m.id for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), None)
-        
-        # Summarize information
-        summary_instruction = "Create a summary of all the above messages:"
-        messages = state["messages"] + [SystemMessage(content=summary_instruction)]
-        response = llm.invoke(messages)
-
-        # Check if a summary message already exists
-        existing_summary_message = next((m for m in state["messages"] if m.id == "summary"), None)
-        if existing_summary_message:
-            # If it exists, replace its content
-            existing_summary_message.content = f"{response.content}"
-        else:
-            # If it doesn't exist, create a new summary message
-            state["messages"].append(AIMessage(content=f"{response.content}", id="summary"))
-
-        # Remove all messages from the state except forr customer_id, summary and latest human message
-        delete_messages = [
-            RemoveMessage(id=m.id)
-            for m in state["messages"]
-            if m.id not in ["customer_id", "summary", latest_message_id]
-            ]
-        
-        return {"messages": delete_messages}
-   
+        return conversation_summarizer.summarize(state["messages"]) or {}
+
+    async def asummary(state: GraphState):
+        return await conversation_summarizer.asummarize(state["messages"]) or {}
+
+    # Router: call the sub-agent directly when the intent is clear; the reasoner then only phrases the answer
+    def route(state: GraphState, config):
+        last_message = state["messages"][-1]
+        if intent_router is None or not isinstance(last_message, HumanMessage):
+            return {}
+        # Follow-ups to a question of the assistant ("Monday at 10:30 for SUB10011") are left to the reasoner
+        previous_reply = next(
+            (m.content for m in reversed(state["messages"][:-1])
+             if isinstance(m, AIMessage) and m.content and not m.tool_calls and m.id != SUMMARY_ID),
+            None,
+        )
+        tool_name = intent_router.route(last_message.content, previous_reply=str(previous_reply) if previous_reply else None)
+        if tool_name is None:
+            return {}
+        customer_id = state.get("customer_id") or config.get("configurable", {}).get("customer_id")
+        # RAG questions go bare: the query keys the semantic cache shared by all customers
+        query = last_message.content
+        if customer_id and tool_name in CUSTOMER_TOOLS:
+            query = f"{query} (customer_id: {customer_id})"
+        tool_call = {"name": tool_name, "args": {"__arg1": query}, "id": f"router_{uuid.uuid4().hex}"}
+        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+    def after_route(state: GraphState):
+        last_message = state["messages"][-1]
+        return "tools" if isinstance(last_message, AIMessage) and last_message.tool_calls else "reasoner"
+
+    def reasoner_messages(state: GraphState):
+        profile = state.get("customer_profile")
+        profile_msg = [SystemMessage(content=f"Customer profile:\n{profile}")] if profile else []
+        # The summary message stands in for the folded-away start of the conversation
+        summary = next((m for m in state["messages"] if m.id == SUMMARY_ID), None)
+        summary_msg = [SystemMessage(content=f"Summary of the earlier conversation:\n{summary.content}")] if summary else []
+        messages = [m for m in state["messages"] if m.id != SUMMARY_ID]
+        return [sys_msg] + profile_msg + summary_msg + messages
+
     def reasoner(state: GraphState):
-        return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+        return {"messages": [llm_with_tools.invoke(reasoner_messages(state))]}
+
+    async def areasoner(state: GraphState):
+        return {"messages": [await llm_with_tools.ainvoke(reasoner_messages(state))]}
 
     # Graph
     builder = StateGraph(GraphState)
 
-    # Add nodes
-    builder.add_node("summary", summary)
-    builder.add_node("reasoner", reasoner)
+    # Add nodes (sync functions serve invoke/stream, async ones ainvoke/astream)
+    builder.add_node("profile", RunnableLambda(load_profile, afunc=aload_profile))
+    builder.add_node("summary", RunnableLambda(summary, afunc=asummary))
+    builder.add_node("router", route)
+    builder.add_node("reasoner", RunnableLambda(reasoner, afunc=areasoner))
     builder.add_node("tools", ToolNode(tools))
+    # Target of post-turn summary updates (update_state as_node); never scheduled within a turn
+    builder.add_node(MEMORY_NODE, lambda state: {})
 
     # Add edges
-    builder.add_conditional_edges(START, should_summarize, {"summary": "summary", "reasoner": "reasoner"})
-    builder.add_edge("summary", "reasoner")
+    builder.add_edge(START, "profile")
+    builder.add_conditional_edges("profile", should_summarize, {"summary": "summary", "router": "router"})
+    builder.add_edge("summary", "router")
+    builder.add_conditional_edges("router", after_route, {"tools": "tools", "reasoner": "reasoner"})
     builder.add_conditional_edges("reasoner",tools_condition)
     builder.add_edge("tools", "reasoner")
+    builder.add_edge(MEMORY_NODE, END)
     
     return builder.compile(checkpointer=checkpointer)
 
+async def initialize_async_cs_graph():
+    """Graph for ainvoke/astream, checkpointed through an AsyncSqliteSaver; call it on the serving event loop."""
+    return initialize_cs_graph(await connections.async_checkpointer())
+
 ######################
 '''
 cs_graph = initialize_cs_graph(checkpointer)
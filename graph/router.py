@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import zlib
+from pathlib import Path
+import numpy as np
+
+# This module is imported by the router evaluation, so it must stay free of import-time side effects
+
+# Define router settings from environment variables
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+# Default chosen by cross-validation on the training examples (benchmarks/router_eval.py)
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.85"))
+ROUTER_EXAMPLES_PATH = Path(os.getenv("ROUTER_EXAMPLES_PATH", Path(__file__).with_name("router_examples.jsonl")))
+ROUTER_FEATURES = 2 ** 14
+
+# Label for turns the router leaves to the reasoner (greetings, multi-intent, answers from the profile)
+REASONER_LABEL = "reasoner"
+
+WORD = re.compile(r"[a-z0-9]+")
+
+###############################################################################
+# Features
+###############################################################################
+
+def feature_ids(text, n_features=ROUTER_FEATURES):
+    """Hashed word unigrams, bigrams and character trigrams of a text."""
+    words = WORD.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return [zlib.crc32(feature.encode("utf-8")) % n_features for feature in features]
+
+def featurize(texts, n_features=ROUTER_FEATURES):
+    """L2-normalized hashed term counts, one row per text."""
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.add.at(matrix[row], feature_ids(text, n_features), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def load_examples(path=ROUTER_EXAMPLES_PATH):
+    """(texts, labels) from a JSON-lines file of {"text": ..., "label": ...} records."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record["text"])
+                labels.append(record["label"])
+    return texts, labels
+
+def awaiting_answer(previous_reply):
+    """True when the assistant's previous reply asked the customer something."""
+    return bool(previous_reply) and "?" in previous_reply
+
+###############################################################################
+# Intent Router
+###############################################################################
+
+class IntentRouter:
+    """
+    Multinomial logistic regression over hashed text features, trained with
+    full-batch gradient descent on a few hundred labelled utterances.
+
+    Training takes milliseconds and routing a message is a sparse dot
+    product, so the router can run in front of every turn. `route` returns
+    the predicted label only when its probability clears `threshold`.
+    """
+
+    def __init__(self, threshold=ROUTER_THRESHOLD, n_features=ROUTER_FEATURES):
+        self.threshold = threshold
+        self.n_features = n_features
+        self.labels = []
+        self.weights = None
+        self.bias = None
+
+    def fit(self, texts, labels, epochs=300, learning_rate=2.0, l2=1e-4):
+        self.labels = sorted(set(labels))
+        index = {label: i for i, label in enumerate(self.labels)}
+        features = featurize(texts, self.n_features)
+        targets = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        targets[np.arange(len(texts)), [index[label] for label in labels]] = 1.0
+
+        # Train on the hashed columns that occur; the others keep zero weight
+        used = np.flatnonzero(features.any(axis=0))
+        features = features[:, used]
+        weights = np.zeros((len(used), len(self.labels)), dtype=np.float32)
+        bias = np.zeros(len(self.labels), dtype=np.float32)
+        for _ in range(epochs):
+            gradient = (softmax(features @ weights + bias) - targets) / len(texts)
+            weights -= learning_rate * (features.T @ gradient + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+
+        self.weights = np.zeros((self.n_features, len(self.labels)), dtype=np.float32)
+        self.weights[used] = weights
+        self.bias = bias
+        return self
+
+    def predict_proba(self, texts):
+        logits = np.tile(self.bias, (len(texts), 1))
+        for row, text in enumerate(texts):
+            ids, counts = np.unique(feature_ids(text, self.n_features), return_counts=True)
+            if len(ids):
+                # Same values as the featurize row, restricted to its non-zero columns
+                logits[row] += (counts / np.linalg.norm(counts)) @ self.weights[ids]
+        return softmax(logits)
+
+    def predict(self, texts):
+        """(label, probability) per text, regardless of the threshold."""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def route(self, text, previous_reply=None):
+        """
+        The tool to dispatch to, or None when the reasoner should decide.
+
+        `previous_reply` is the assistant's last answer in the conversation.
+        A message answering a question in it only makes sense with that
+        context, which the classifier does not see.
+        """
+        if awaiting_answer(previous_reply):
+            return None
+        label, probability = self.predict([text])[0]
+        if label == REASONER_LABEL or probability < self.threshold:
+            return None
+        return label
+
+def load_router(path=ROUTER_EXAMPLES_PATH, threshold=ROUTER_THRESHOLD):
+    """Router trained on the labelled examples at `path`."""
+    texts, labels = load_examples(path)
+    return IntentRouter(threshold=threshold).fit(texts, labels)
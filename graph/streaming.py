@@ -0,0 +1,96 @@
+import time
+from langchain_core.messages import AIMessage, ToolMessage
+
+# Node whose tokens are the customer-facing answer; sub-agent LLM calls run under their own node names
+ANSWER_NODE = "reasoner"
+STREAM_MODES = ["messages", "updates"]
+
+###############################################################################
+# Turn Streaming
+###############################################################################
+
+class TurnStream:
+    """
+    Turns LangGraph `messages` + `updates` stream chunks into front-end events:
+
+      {"type": "token", "content": str}                       answer tokens of the reasoner
+      {"type": "node", "name": str}                           a graph node finished
+      {"type": "tool_start", "name": str, "input": str}       the reasoner called a tool / sub-agent
+      {"type": "tool_end", "name": str, "elapsed": float}     the tool / sub-agent returned
+      {"type": "done", "answer": str, "ttft": float | None, "latency": float}
+
+    `ttft` is the time to the first answer token and `latency` the time to
+    the end of the turn, both in seconds from the start of the turn.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.answer = ""
+        self._streamed = False
+        self._tool_started = {}
+
+    def _elapsed(self, since=None):
+        return time.perf_counter() - (self.started if since is None else since)
+
+    def handle(self, mode, chunk):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == ANSWER_NODE and isinstance(message.content, str) and message.content:
+                if self.first_token_at is None:
+                    self.first_token_at = self._elapsed()
+                self._streamed = True
+                yield {"type": "token", "content": message.content}
+            return
+
+        for node, update in (chunk or {}).items():
+            messages = (update or {}).get("messages", []) if isinstance(update, dict) else []
+            for message in messages:
+                # Tool calls come from the reasoner or, for clear-cut requests, the router
+                if isinstance(message, AIMessage) and message.tool_calls:
+                    for call in message.tool_calls:
+                        self._tool_started[call["id"]] = time.perf_counter()
+                        yield {"type": "tool_start", "name": call["name"], "input": str(next(iter(call["args"].values()), ""))}
+                if isinstance(message, AIMessage) and node == ANSWER_NODE:
+                    if not message.tool_calls:
+                        # Models that do not stream still produce the answer once
+                        if not self._streamed and message.content:
+                            if self.first_token_at is None:
+                                self.first_token_at = self._elapsed()
+                            yield {"type": "token", "content": message.content}
+                        self.answer = message.content
+                    self._streamed = False
+                elif isinstance(message, ToolMessage):
+                    started = self._tool_started.pop(message.tool_call_id, None)
+                    yield {"type": "tool_end", "name": message.name, "elapsed": self._elapsed(started) if started else 0.0}
+            yield {"type": "node", "name": node}
+
+    def done(self):
+        return {"type": "done", "answer": self.answer, "ttft": self.first_token_at, "latency": self._elapsed()}
+
+def stream_turn(graph, inputs, config, summarizer=None):
+    """
+    Run one turn with graph.stream and yield front-end events (see TurnStream).
+    With a RollingSummarizer, the thread's previous summary update is awaited
+    first and a new one is scheduled once the answer has been streamed.
+    """
+    if summarizer is not None:
+        summarizer.wait(config)
+    turn = TurnStream()
+    for mode, chunk in graph.stream(inputs, config=config, stream_mode=STREAM_MODES):
+        yield from turn.handle(mode, chunk)
+    if summarizer is not None:
+        summarizer.schedule(graph, config)
+    yield turn.done()
+
+async def astream_turn(graph, inputs, config, summarizer=None):
+    """Async counterpart of stream_turn, for graphs driven on an event loop."""
+    if summarizer is not None:
+        await summarizer.await_pending(config)
+    turn = TurnStream()
+    async for mode, chunk in graph.astream(inputs, config=config, stream_mode=STREAM_MODES):
+        for event in turn.handle(mode, chunk):
+            yield event
+    if summarizer is not None:
+        summarizer.aschedule(graph, config)
+    yield turn.done()
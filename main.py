@@ -1,4 +1,6 @@
-from graph.graph_setup import build_graph
+from langchain_core.messages import HumanMessage
+from graph.cs_graph import initialize_cs_graph, checkpointer, conversation_summarizer
+from graph.streaming import stream_turn
 
 # Simulate an authentication system
 def authenticate_user():
@@ -12,7 +14,7 @@ def main():
     customer_id, thread_id = authenticate_user()
 
     # Build the graph
-    graph = build_graph()
+    graph = initialize_cs_graph(checkpointer)
 
     print("Authentication successful. Chat service is ready! Type 'exit' to quit.\n")
 
@@ -23,13 +25,26 @@ def main():
             print("Goodbye!")
             break
 
-        # Pass customer_id and thread_id as metadata
-        response = graph.run(
-            user_input,
-            config={"configurable": {"customer_id": customer_id, "thread_id": thread_id}}
-        )
-        print(f"Assistant: {response}")
+        # Pass customer_id and thread_id as metadata, printing answer tokens as they arrive
+        config = {"configurable": {"customer_id": customer_id, "thread_id": thread_id}}
+        at_line_start = True
+        for event in stream_turn(graph, {"messages": [HumanMessage(content=user_input)]}, config, conversation_summarizer):
+            if event["type"] == "token":
+                if at_line_start:
+                    print("Assistant: ", end="", flush=True)
+                    at_line_start = False
+                print(event["content"], end="", flush=True)
+            elif event["type"] in ("tool_start", "tool_end", "done"):
+                if not at_line_start:
+                    print()
+                    at_line_start = True
+                if event["type"] == "tool_start":
+                    print(f"  [{event['name']} started]", flush=True)
+                elif event["type"] == "tool_end":
+                    print(f"  [{event['name']} finished in {event['elapsed']:.1f}s]", flush=True)
+                else:
+                    ttft = f"{event['ttft']:.2f}s" if event["ttft"] is not None else "n/a"
+                    print(f"  (first token {ttft}, total {event['latency']:.2f}s)\n")
 
 if __name__ == "__main__":
     main()
-
@@ -1,11 +1,12 @@
 import streamlit as st
 from langgraph.graph import MessagesState
 from langchain_core.messages import HumanMessage
-from graph.cs_graph import initialize_cs_graph  # Adjusted module import
+from graph.cs_graph import initialize_cs_graph, checkpointer, conversation_summarizer  # Adjusted module import
+from graph.streaming import stream_turn
 
 # Initialize session state
 if 'cs_graph' not in st.session_state:
-    st.session_state.cs_graph = initialize_cs_graph()
+    st.session_state.cs_graph = initialize_cs_graph(checkpointer)
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'user_input' not in st.session_state:
@@ -16,6 +17,8 @@ if 'config' not in st.session_state:
     st.session_state.config = None
 if 'initialized' not in st.session_state:
     st.session_state.initialized = False
+if 'pending_query' not in st.session_state:
+    st.session_state.pending_query = None
 
 # Initialize state and config
 def initialize_state_and_config(customer_id, thread_id):
@@ -31,37 +34,63 @@ def initialize_state_and_config(customer_id, thread_id):
 def process_input():
     input_query = st.session_state.user_input.strip()  # Retrieve user input
     if input_query and st.session_state.config:  # Ensure there's input and config is initialized
-        # Save user query to the chat history
+        # Save user query to the chat history; the answer is streamed below the history on this rerun
         st.session_state.messages.append(("User", input_query))
-        
-        with st.spinner("Processing your query..."):  # Show a loading spinner
-            try:
-                # Recreate MessagesState with the initial customer_id message and the current user input
-                customer_id = st.session_state.config["configurable"]["customer_id"]
-                st.session_state.state = MessagesState(
-                    messages=[
-                        HumanMessage(content=f"customer_id:{customer_id}"),  # Always include the initial message
-                        HumanMessage(content=input_query),  # Append the user input as a new message
-                    ]
-                )
+        st.session_state.pending_query = input_query
 
-                # Invoke the graph using the updated state and the existing config
-                response = st.session_state.cs_graph.invoke(
-                    st.session_state.state, 
-                    config=st.session_state.config
-                )
+        # Clear the input box for the next message
+        st.session_state.user_input = ""
 
-                # Extract the assistant's response
-                assistant_response = response["messages"][-1].content
+def render_message(role, content, target=st):
+    if role == "User":
+        target.markdown(
+            f"""<div style='text-align: right; color: white; background: #156082; padding: 8px; margin: 5px; border-radius: 8px;'>
+            <strong>{role}:</strong> {content}</div>""", unsafe_allow_html=True
+        )
+    else:
+        target.markdown(
+            f"""<div style='text-align: left; color: black; background: #EDEDED; padding: 8px; margin: 5px; border-radius: 8px;'>
+            <strong>{role}:</strong> {content}</div>""", unsafe_allow_html=True
+        )
 
-                # Save the assistant's response to the chat history
-                st.session_state.messages.append(("Assistant", assistant_response))
-            except Exception as e:
-                # Handle any errors during graph invocation
-                st.session_state.messages.append(("Assistant", f"Error: {str(e)}"))
+# Stream the assistant's answer for the pending query
+def stream_response(input_query):
+    # Recreate MessagesState with the initial customer_id message and the current user input
+    customer_id = st.session_state.config["configurable"]["customer_id"]
+    st.session_state.state = MessagesState(
+        messages=[
+            HumanMessage(content=f"customer_id:{customer_id}"),  # Always include the initial message
+            HumanMessage(content=input_query),  # Append the user input as a new message
+        ]
+    )
 
-        # Clear the input box for the next message
-        st.session_state.user_input = ""
+    status = st.status("Processing your query...")
+    answer_placeholder = st.empty()
+    assistant_response = ""
+    try:
+        # Render tokens as they arrive and tool/sub-agent progress in the status box
+        for event in stream_turn(
+            st.session_state.cs_graph, st.session_state.state, st.session_state.config, conversation_summarizer
+        ):
+            if event["type"] == "token":
+                assistant_response += event["content"]
+                render_message("Assistant", assistant_response, answer_placeholder)
+            elif event["type"] == "tool_start":
+                status.write(f"{event['name']} started")
+            elif event["type"] == "tool_end":
+                status.write(f"{event['name']} finished in {event['elapsed']:.1f}s")
+            elif event["type"] == "done":
+                assistant_response = event["answer"] or assistant_response
+                ttft = f"{event['ttft']:.1f}s" if event["ttft"] is not None else "n/a"
+                status.update(label=f"First token {ttft}, total {event['latency']:.1f}s", state="complete")
+    except Exception as e:
+        # Handle any errors during graph invocation
+        assistant_response = f"Error: {str(e)}"
+        status.update(label="Error", state="error")
+
+    # Save the assistant's response to the chat history
+    st.session_state.messages.append(("Assistant", assistant_response))
+    render_message("Assistant", assistant_response, answer_placeholder)
 
 # Streamlit Interface
 st.title("Customer Service Assistant (CS Graph)")
@@ -82,16 +111,11 @@ else:
     # Display chat history
     with st.container():
         for role, content in st.session_state.messages:
-            if role == "User":
-                st.markdown(
-                    f"""<div style='text-align: right; color: white; background: #156082; padding: 8px; margin: 5px; border-radius: 8px;'>
-                    <strong>{role}:</strong> {content}</div>""", unsafe_allow_html=True
-                )
-            else:
-                st.markdown(
-                    f"""<div style='text-align: left; color: black; background: #EDEDED; padding: 8px; margin: 5px; border-radius: 8px;'>
-                    <strong>{role}:</strong> {content}</div>""", unsafe_allow_html=True
-                )
+            render_message(role, content)
+
+    if st.session_state.pending_query:
+        input_query, st.session_state.pending_query = st.session_state.pending_query, None
+        stream_response(input_query)
 
     # Auto-scroll to the bottom
     st.markdown("<div id='scroll-to-bottom'></div>", unsafe_allow_html=True)
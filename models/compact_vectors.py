@@ -0,0 +1,63 @@
+import os
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Define compact vector settings from environment variables
+# 0 keeps the full embedding; text-embedding-3 models support Matryoshka truncation, e.g. 256 or 1024
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+
+###############################################################################
+# Matryoshka Truncation
+###############################################################################
+
+def truncate_vectors(vectors, dimension):
+    """Keep the leading `dimension` components of each vector and re-normalize to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dimension or dimension >= vectors.shape[-1]:
+        return vectors
+    truncated = vectors[..., :dimension]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Serves truncated embeddings computed from a full-size embeddings model.
+
+    The wrapped model (and its cache) keeps the full-precision vectors, which
+    are used to re-rank candidates found in the truncated index.
+    """
+
+    def __init__(self, embeddings, dimension):
+        self.embeddings = embeddings
+        self.truncate_to = dimension
+
+    @property
+    def dimension(self):
+        full = getattr(self.embeddings, "dimension", None)
+        return min(self.truncate_to, full) if full else self.truncate_to
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return truncate_vectors(self.embeddings.embed_documents(texts), self.truncate_to).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return truncate_vectors(self.embeddings.embed_query(text), self.truncate_to).tolist()
+
+###############################################################################
+# Full-precision Re-ranking
+###############################################################################
+
+def rerank(query_vector, candidate_vectors, k):
+    """
+    Order candidates by exact squared L2 distance to the query.
+
+    Returns (positions, distances) of the best `k` candidates.
+    """
+    candidate_vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    if not len(candidate_vectors):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    distances = ((candidate_vectors - query_vector) ** 2).sum(axis=1)
+    order = np.argsort(distances, kind="stable")[:k]
+    return order, distances[order]
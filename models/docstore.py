@@ -0,0 +1,133 @@
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+###############################################################################
+# SQLite Docstore
+###############################################################################
+
+# Row `position` is the faiss id of the chunk, so it doubles as the index-to-docstore mapping
+SCHEMA = """
+CREATE TABLE chunks (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+)
+"""
+
+class _ReadOnlyConnections:
+    """One read-only connection per thread, opened lazily."""
+
+    def __init__(self, path):
+        self.uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore over a SQLite file.
+
+    Chunk text and metadata are fetched by primary key only for the ids that
+    are asked for, so nothing is loaded up front.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._connections = _ReadOnlyConnections(path)
+
+    def search(self, search):
+        row = self._connections.get().execute(
+            "SELECT id, page_content, metadata FROM chunks WHERE id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return _to_document(row)
+
+    def mget(self, ids):
+        """Fetch several documents in one query. Returns {id: Document} for the ids found."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" for _ in ids)
+        rows = self._connections.get().execute(
+            f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({placeholders})", ids
+        ).fetchall()
+        return {row[0]: _to_document(row) for row in rows}
+
+class SQLiteIndexMap(Mapping):
+    """Read-only faiss position -> docstore id mapping backed by the same SQLite file."""
+
+    def __init__(self, path):
+        self._connections = _ReadOnlyConnections(path)
+
+    def __getitem__(self, position):
+        row = self._connections.get().execute(
+            "SELECT id FROM chunks WHERE position = ?", (int(position),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self):
+        return self._connections.get().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __iter__(self):
+        for (position,) in self._connections.get().execute("SELECT position FROM chunks ORDER BY position"):
+            yield position
+
+def _to_document(row):
+    _id, page_content, metadata = row
+    return Document(id=_id, page_content=page_content, metadata=json.loads(metadata))
+
+###############################################################################
+# Read / Write
+###############################################################################
+
+def write_docstore(path, docstore, index_to_docstore_id):
+    """Write all chunks to a new SQLite file and atomically swap it in."""
+    path = Path(path)
+    tmp_path = path.with_suffix(".sqlite.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(SCHEMA)
+        rows = (
+            (int(position), _id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+            for position, _id in index_to_docstore_id.items()
+            for doc in [docstore.search(_id)]
+        )
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    # A crash mid-write leaves only the tmp file; the index and docstore are swapped in together by the caller
+    os.replace(tmp_path, path)
+
+def read_docstore(path):
+    """Materialize a SQLite docstore as (docs by id, position -> id) for an ingestion run."""
+    conn = sqlite3.connect(path)
+    try:
+        docs, index_to_docstore_id = {}, {}
+        for position, _id, page_content, metadata in conn.execute(
+            "SELECT position, id, page_content, metadata FROM chunks ORDER BY position"
+        ):
+            docs[_id] = Document(id=_id, page_content=page_content, metadata=json.loads(metadata))
+            index_to_docstore_id[position] = _id
+        return docs, index_to_docstore_id
+    finally:
+        conn.close()
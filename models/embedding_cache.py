@@ -0,0 +1,304 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+# Define cache settings from environment variables
+EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "250000"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def text_key(text):
+    """Returns the cache key of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def make_batches(texts, max_batch_size=EMBEDDING_BATCH_SIZE, max_batch_tokens=EMBEDDING_BATCH_TOKENS):
+    """Split texts into batches bounded by count and by estimated tokens."""
+    batches = []
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_batch_size or batch_tokens + tokens > max_batch_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+###############################################################################
+# Disk-backed Vector Cache
+###############################################################################
+
+class EmbeddingCache:
+    """
+    Append-only on-disk store of embeddings for one model.
+
+    Vectors live in `vectors.f32` as raw float32 rows, `keys.txt` holds the
+    text hash of each row (line i describes row i) and `meta.json` records the
+    model name and dimension. Appends take an exclusive lock on `lock`, so
+    several processes can share one cache; rows appended by other processes
+    are picked up on the next lookup that misses.
+    """
+
+    def __init__(self, model, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model = model
+        self.path = Path(cache_dir) / model.replace("/", "_")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.path / "vectors.f32"
+        self.keys_path = self.path / "keys.txt"
+        self.meta_path = self.path / "meta.json"
+        self.lock_path = self.path / "lock"
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._n_rows = 0
+        self._keys_offset = 0
+        self._vectors = None
+        self.dimension = None
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across processes (a no-op where fcntl is unavailable)."""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        if self.dimension is None and self.meta_path.is_file():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dimension = json.load(f).get("dimension")
+
+    def _load(self):
+        # Under the file lock, so a repair cannot cut off another process's append in progress
+        with self._file_lock():
+            self._read_meta()
+            if not self.dimension or not self.keys_path.is_file() or not self.vectors_path.is_file():
+                return
+
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().splitlines()
+
+            # A crash between the two appends can leave one file longer than the other
+            row_count = min(len(keys), self.vectors_path.stat().st_size // (4 * self.dimension))
+            if row_count != len(keys) or self.vectors_path.stat().st_size != row_count * 4 * self.dimension:
+                self._truncate(row_count)
+            self._rows = {key: row for row, key in enumerate(keys[:row_count])}
+            self._n_rows = row_count
+            self._keys_offset = self.keys_path.stat().st_size
+
+    def _truncate(self, row_count):
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(row_count * 4 * self.dimension)
+        with open(self.keys_path, "r", encoding="utf-8") as f:
+            keys = f.read().splitlines()[:row_count]
+        with open(self.keys_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+
+    def _refresh(self):
+        """Pick up rows other processes appended since the last read; keys are written after their vectors."""
+        self._read_meta()
+        if not self.dimension or not self.keys_path.is_file():
+            return
+        size = self.keys_path.stat().st_size
+        if size <= self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(size - self._keys_offset)
+        # Only complete lines; a line still being written is read next time
+        end = data.rfind(b"\n") + 1
+        for offset, key in enumerate(data[:end].decode("utf-8").splitlines()):
+            self._rows.setdefault(key, self._n_rows + offset)
+        self._n_rows += data[:end].count(b"\n")
+        self._keys_offset += end
+
+    def _write_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dimension": self.dimension}, f)
+
+    def _matrix(self):
+        # Re-map only when rows were appended since the last read
+        if self._vectors is None or len(self._vectors) != self._n_rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(self._n_rows, self.dimension)
+            ) if self._n_rows else np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return self._vectors
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys present in the cache."""
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._refresh()
+            rows = {key: self._rows[key] for key in keys if key in self._rows}
+            if not rows:
+                return {}
+            matrix = self._matrix()
+            return {key: np.array(matrix[row]) for key, row in rows.items()}
+
+    def put_many(self, items):
+        """Append (key, vector) pairs that are not cached yet."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            items = [(key, vector) for key, vector in items if key not in self._rows]
+            if not items:
+                return
+            if self.dimension is None:
+                self.dimension = len(items[0][1])
+                self._write_meta()
+            # The row numbers follow the vectors on disk, not what this process has seen
+            row_bytes = 4 * self.dimension
+            start = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.is_file() else 0
+            if start != self._n_rows:
+                # An append that crashed between its vectors and its keys
+                start = min(start, self._n_rows)
+                self._truncate(start)
+                self._rows = {key: row for key, row in self._rows.items() if row < start}
+                self._n_rows = start
+                self._keys_offset = self.keys_path.stat().st_size
+            matrix = np.asarray([vector for _, vector in items], dtype=np.float32)
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            keys = "".join(f"{key}\n" for key, _ in items).encode("utf-8")
+            with open(self.keys_path, "ab") as f:
+                f.write(keys)
+            for offset, (key, _) in enumerate(items):
+                self._rows[key] = start + offset
+            self._n_rows = start + len(items)
+            self._keys_offset += len(keys)
+
+###############################################################################
+# Cached Embeddings
+###############################################################################
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a persistent cache keyed by (model, text hash).
+
+    Cache misses are de-duplicated, split into size-bounded batches and sent to
+    the underlying model over a bounded thread pool.
+    """
+
+    def __init__(self, embeddings, model, cache_dir=EMBEDDING_CACHE_DIR,
+                 max_batch_size=EMBEDDING_BATCH_SIZE, max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+                 max_workers=EMBEDDING_MAX_WORKERS):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = EmbeddingCache(model, cache_dir)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+
+    @property
+    def dimension(self):
+        """Embedding dimension, read from the cache metadata when available."""
+        if self.cache.dimension is None:
+            self.embed_query("Sample text to determine dimension")
+        return self.cache.dimension
+
+    def _embed_misses(self, texts):
+        batches = make_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        if len(batches) == 1 or self.max_workers <= 1:
+            results = [self.embeddings.embed_documents(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                results = list(executor.map(self.embeddings.embed_documents, batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _aembed_misses(self, texts):
+        batches = make_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        semaphore = asyncio.Semaphore(max(1, self.max_workers))
+
+        async def embed(batch):
+            async with semaphore:
+                return await self.embeddings.aembed_documents(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in misses:
+                misses[key] = text
+
+        if misses:
+            vectors = self._embed_misses(list(misses.values()))
+            self.cache.put_many(zip(misses, vectors))
+            cached.update({key: np.asarray(vector, dtype=np.float32) for key, vector in zip(misses, vectors)})
+
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key].tolist()
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many([(key, vector)])
+        return list(vector)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in misses:
+                misses[key] = text
+
+        if misses:
+            vectors = await self._aembed_misses(list(misses.values()))
+            self.cache.put_many(zip(misses, vectors))
+            cached.update({key: np.asarray(vector, dtype=np.float32) for key, vector in zip(misses, vectors)})
+
+        return [cached[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = text_key(text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key].tolist()
+        vector = await self.embeddings.aembed_query(text)
+        self.cache.put_many([(key, vector)])
+        return list(vector)
+
+def embedding_dimension(embeddings):
+    """Returns the dimension of an embeddings model, avoiding an API call when cached."""
+    dimension = getattr(embeddings, "dimension", None)
+    if dimension:
+        return dimension
+    return len(embeddings.embed_query("Sample text to determine dimension"))
@@ -0,0 +1,119 @@
+import os
+from collections import Counter
+
+# Define hybrid retrieval settings from environment variables
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+LEXICAL_MIN_SCORE = float(os.getenv("LEXICAL_MIN_SCORE", "3.0"))
+LEXICAL_MARGIN = float(os.getenv("LEXICAL_MARGIN", "1.5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_FETCH_FACTOR = int(os.getenv("HYBRID_FETCH_FACTOR", "3"))
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, _id in enumerate(ranking, start=1):
+            scores[_id] += 1.0 / (k + rank)
+    return [_id for _id, _ in scores.most_common()]
+
+def chunk_id_of(doc):
+    return doc.metadata.get("chunk_id") or doc.id
+
+def dedupe_groups(groups):
+    """
+    Keep each document only in the group where it ranks highest
+    (ties go to the earlier group), preserving order within groups.
+    """
+    best = {}
+    for group_index, docs in enumerate(groups):
+        for rank, doc in enumerate(docs):
+            _id = chunk_id_of(doc)
+            if _id not in best or rank < best[_id][1]:
+                best[_id] = (group_index, rank)
+    return [
+        [doc for rank, doc in enumerate(docs) if best[chunk_id_of(doc)] == (group_index, rank)]
+        for group_index, docs in enumerate(groups)
+    ]
+
+###############################################################################
+# Hybrid Retriever
+###############################################################################
+
+class HybridRetriever:
+    """
+    Combines BM25 and dense retrieval with reciprocal-rank fusion.
+
+    When the lexical hit is unambiguous (every query term matched, a high
+    score and a clear margin over the runner-up), the lexical results are
+    returned directly and the query embedding round trip is skipped.
+    """
+
+    def __init__(self, vector_store, lexical_index, fast_path=LEXICAL_FAST_PATH,
+                 min_score=LEXICAL_MIN_SCORE, margin=LEXICAL_MARGIN, fetch_factor=HYBRID_FETCH_FACTOR):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.fast_path = fast_path
+        self.min_score = min_score
+        self.margin = margin
+        self.fetch_factor = fetch_factor
+
+    def is_confident(self, hits, n_terms):
+        """True when the top lexical hit can be trusted without a dense search."""
+        if not hits:
+            return False
+        _, top_score, matched = hits[0]
+        if matched < n_terms or top_score < self.min_score:
+            return False
+        return len(hits) == 1 or top_score >= self.margin * hits[1][1]
+
+    def documents(self, ids):
+        """Fetch documents by chunk id, preserving order."""
+        docstore = self.vector_store.docstore
+        if hasattr(docstore, "mget"):
+            found = docstore.mget(ids)
+            return [found[_id] for _id in ids if _id in found]
+        return [doc for doc in (docstore.search(_id) for _id in ids) if not isinstance(doc, str)]
+
+    def lexical_search(self, query, k):
+        """BM25 hits and whether they are confident enough to use on their own."""
+        hits, n_terms = self.lexical_index.search(query, k=k * self.fetch_factor)
+        return hits, self.fast_path and self.is_confident(hits, n_terms)
+
+    def fuse(self, lexical_hits, dense_docs, k):
+        """Fuse lexical hits with dense results into the top k documents."""
+        dense_ids = [chunk_id_of(doc) for doc in dense_docs]
+        fused_ids = reciprocal_rank_fusion([[_id for _id, _, _ in lexical_hits], dense_ids])[:k]
+        known = {chunk_id_of(doc): doc for doc in dense_docs}
+        missing = [_id for _id in fused_ids if _id not in known]
+        known.update({chunk_id_of(doc): doc for doc in self.documents(missing)})
+        return [known[_id] for _id in fused_ids if _id in known]
+
+    def search(self, query, k=3):
+        """
+        Returns (docs, mode), where mode is "lexical" when the fast path
+        answered the query and "hybrid" otherwise.
+        """
+        lexical_hits, confident = self.lexical_search(query, k)
+        if confident:
+            return self.documents([_id for _id, _, _ in lexical_hits[:k]]), "lexical"
+
+        dense_docs = self.vector_store.similarity_search(query, k=k * self.fetch_factor)
+        return self.fuse(lexical_hits, dense_docs, k), "hybrid"
+
+    def search_many(self, queries, k=3):
+        """
+        Search several queries together. Queries not answered by the lexical
+        fast path share one batched dense search. Returns one document list
+        per query, with chunks that match several queries kept only once.
+        """
+        lexical = [self.lexical_search(query, k) for query in queries]
+        dense_queries = [query for query, (_, confident) in zip(queries, lexical) if not confident]
+        dense_results = iter(self.vector_store.batch_similarity_search_with_score(dense_queries, k=k * self.fetch_factor))
+
+        groups = []
+        for hits, confident in lexical:
+            if confident:
+                groups.append(self.documents([_id for _id, _, _ in hits[:k]]))
+            else:
+                groups.append(self.fuse(hits, [doc for doc, _ in next(dense_results)], k))
+        return dedupe_groups(groups)
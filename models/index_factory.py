@@ -0,0 +1,207 @@
+import os
+import numpy as np
+import faiss
+
+# Define index settings from environment variables
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "64"))
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGE_TYPES = ("float32", "float16", "int8", "pq")
+
+# Faiss warns below 39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+###############################################################################
+# Index Construction
+###############################################################################
+
+def ivf_nlist(nlist, n_vectors):
+    """Shrink nlist so every centroid gets enough training points."""
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+def _pq_m(m, dimension):
+    """Largest sub-quantizer count <= m that divides the dimension."""
+    m = min(m, dimension)
+    while dimension % m:
+        m -= 1
+    return m
+
+_SQ_TYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+def _effective_storage(index_type, storage):
+    return "pq" if index_type == "ivf_pq" else storage
+
+def _effective_type(index_type, storage):
+    return "ivf_pq" if index_type == "ivf_flat" and storage == "pq" else index_type
+
+def min_training_vectors(index_type, nbits=PQ_NBITS, storage=VECTOR_STORAGE):
+    """Number of vectors needed before an index of this type and storage can be trained."""
+    storage = _effective_storage(index_type, storage)
+    required = MIN_POINTS_PER_CENTROID if index_type in ("ivf_flat", "ivf_pq") else 0
+    if storage == "pq":
+        required = max(required, 2 ** nbits)
+    elif storage == "int8":
+        required = max(required, 1)
+    return required
+
+def _build_flat(dimension, storage, pq_m, pq_nbits):
+    if storage == "float32":
+        return faiss.IndexFlatL2(dimension)
+    if storage == "pq":
+        return faiss.IndexPQ(dimension, _pq_m(pq_m, dimension), pq_nbits)
+    return faiss.IndexScalarQuantizer(dimension, _SQ_TYPES[storage])
+
+def _build_hnsw(dimension, storage, pq_m, pq_nbits, hnsw_m):
+    if storage == "float32":
+        return faiss.IndexHNSWFlat(dimension, hnsw_m)
+    if storage == "pq":
+        return faiss.IndexHNSWPQ(dimension, _pq_m(pq_m, dimension), hnsw_m, pq_nbits)
+    return faiss.IndexHNSWSQ(dimension, _SQ_TYPES[storage], hnsw_m)
+
+def _build_ivf(dimension, storage, nlist, pq_m, pq_nbits):
+    quantizer = faiss.IndexFlatL2(dimension)
+    if storage == "float32":
+        return faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    if storage == "pq":
+        return faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_m(pq_m, dimension), pq_nbits)
+    return faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, _SQ_TYPES[storage])
+
+def build_index(index_type, dimension, training_vectors=None, storage=VECTOR_STORAGE, nlist=IVF_NLIST,
+                pq_m=PQ_M, pq_nbits=PQ_NBITS, hnsw_m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION):
+    """
+    Build an empty faiss index of the given type, trained on `training_vectors` when required.
+
+    `storage` selects how vectors are kept in the index: float32, float16 or
+    int8 scalar quantization, or product quantization (ivf_pq always uses PQ).
+    Configurations that need training fall back to a flat float32 index when
+    there are too few training vectors; check `index_type_of(index)` and
+    `storage_of(index)` for the effective configuration.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown vector storage '{storage}'. Expected one of {STORAGE_TYPES}.")
+    storage = _effective_storage(index_type, storage)
+
+    n_vectors = 0 if training_vectors is None else len(training_vectors)
+    if n_vectors < min_training_vectors(index_type, pq_nbits, storage):
+        print(f"Not enough vectors to train a {index_type}/{storage} index ({n_vectors}). Using a flat index.")
+        index_type, storage = "flat", "float32"
+
+    if index_type == "flat":
+        index = _build_flat(dimension, storage, pq_m, pq_nbits)
+    elif index_type == "hnsw":
+        index = _build_hnsw(dimension, storage, pq_m, pq_nbits, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        nlist = ivf_nlist(nlist, n_vectors)
+        index = _build_ivf(dimension, storage, nlist, pq_m, pq_nbits)
+        index.nprobe = min(IVF_NPROBE, nlist)
+
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+    return index
+
+def storage_of(index):
+    """Returns the STORAGE_TYPES name of a faiss index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = index.sq.qtype
+        return next((name for name, value in _SQ_TYPES.items() if value == qtype), "int8")
+    return "float32"
+
+def index_type_of(index):
+    """Returns the INDEX_TYPES name of a faiss index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+###############################################################################
+# Search Parameters
+###############################################################################
+
+def configure_search(index, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH):
+    """Set the default search parameters of an index, e.g. after loading it from disk."""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+def search_parameters(index, nprobe=None, ef_search=None):
+    """
+    Per-query search parameters for `index.search(x, k, params=...)`.
+
+    Returns None when the index type has no tunable parameters or none were given.
+    """
+    if isinstance(index, faiss.IndexIVF) and nprobe is not None:
+        return faiss.SearchParametersIVF(nprobe=min(nprobe, index.nlist))
+    if isinstance(index, faiss.IndexHNSW) and ef_search is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
+
+def needs_rebuild(index, index_type, n_vectors, dimension=None, storage=VECTOR_STORAGE, nlist=IVF_NLIST):
+    """
+    True when an index no longer suits the configured type, storage, dimension
+    or corpus size, e.g. a flat fallback that now has enough vectors to train
+    an IVF index.
+    """
+    if dimension is not None and index.d != dimension:
+        return True
+    current_type = index_type_of(index)
+    storage = _effective_storage(index_type, storage)
+    if (current_type, storage_of(index)) != (_effective_type(index_type, storage), storage):
+        return n_vectors >= min_training_vectors(index_type, storage=storage)
+    # IVF trained on a much smaller corpus has too few lists to stay fast
+    if current_type in ("ivf_flat", "ivf_pq"):
+        return index.nlist * 4 <= ivf_nlist(nlist, n_vectors)
+    return False
+
+def supports_remove(index):
+    """HNSW graphs cannot delete vectors in place and have to be rebuilt instead."""
+    return not isinstance(index, faiss.IndexHNSW)
+
+###############################################################################
+# Persistence
+###############################################################################
+
+def write_index(index, path):
+    """Write an index next to its final path and rename it into place."""
+    tmp_path = f"{path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+def read_index(path, mmap=True):
+    """
+    Read an index, memory-mapped and read-only when `mmap` is set.
+
+    Flat, scalar-quantized, PQ and HNSW storage is mapped straight from the
+    file, so processes on one host share the page cache. IVF inverted lists
+    cannot be mapped from a regular index file and are read into memory.
+    """
+    if not mmap:
+        return faiss.read_index(str(path))
+    read_only = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(str(path), read_only | faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        return faiss.read_index(str(path), read_only)
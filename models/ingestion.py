@@ -0,0 +1,208 @@
+import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+import jsonlines
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# This module is imported by worker processes, so it must stay free of import-time side effects
+
+# Define ingestion settings from environment variables
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_RECORD_BATCH = int(os.getenv("INGEST_RECORD_BATCH", "64"))
+JSON_READ_SIZE = 1 << 16
+
+# Initialize text splitter
+splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=100,
+    separators=["\n\n", "\n", " ", ""]
+)
+
+# Helper function to flatten nested dictionaries
+def flatten_dict(data):
+    """Recursively flattens a dictionary."""
+    flat_items = []
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat_items.extend(flatten_dict(value).items())
+        else:
+            flat_items.append((key, value))
+    return dict(flat_items)
+
+def chunk_id(source, content):
+    """Returns a stable id for a chunk, derived from its source file and content."""
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+###############################################################################
+# Incremental JSON Parsing
+###############################################################################
+
+def iter_json_records(path, read_size=JSON_READ_SIZE):
+    """
+    Yield the records of a JSON file without loading it whole.
+
+    Elements of a top-level array are decoded one at a time from a sliding
+    buffer; a top-level object is yielded as a single record.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill(buffer, pos):
+            # Drop consumed text and read at least as much as is buffered, so a huge record is parsed in O(n)
+            more = f.read(max(read_size, len(buffer) - pos))
+            return buffer[pos:] + more, 0, not more
+
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos, eof = fill(buffer, pos)
+
+        if pos == len(buffer):
+            return
+        if buffer[pos] != "[":
+            yield json.loads(buffer[pos:] + f.read())
+            return
+        pos += 1
+
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"Unterminated JSON array in {path}")
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A number at the very end of the buffer may continue in the next read
+                if end == len(buffer) and not eof:
+                    raise json.JSONDecodeError("Value may be truncated", buffer, end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+            yield value
+            pos = end
+
+###############################################################################
+# Flatten and Split (runs in worker processes)
+###############################################################################
+
+def record_to_chunks(record):
+    """Flatten one record and split it into chunk texts."""
+    if not isinstance(record, dict):
+        return []
+    flattened = flatten_dict(record)
+    content = "\n".join([f"{k}: {v}" for k, v in flattened.items() if v])
+    return splitter.split_text(content)
+
+def chunk_records(records):
+    """Worker entry point: chunk texts of a batch of records."""
+    return [chunk for record in records for chunk in record_to_chunks(record)]
+
+###############################################################################
+# Pipeline
+###############################################################################
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _ordered_map(executor, tasks, max_in_flight):
+    """
+    Run ("batch", file, records) tasks on the executor and yield (file, chunks)
+    in submission order, keeping at most `max_in_flight` batches pending.
+    ("end", file) markers pass through as (file, None).
+    """
+    pending = deque()
+    for kind, json_file, *records in tasks:
+        if kind == "end":
+            future = Future()
+            future.set_result(None)
+        elif executor is None:
+            future = Future()
+            future.set_result(chunk_records(records[0]))
+        else:
+            future = executor.submit(chunk_records, records[0])
+        pending.append((json_file, future))
+        if len(pending) >= max_in_flight:
+            json_file, future = pending.popleft()
+            yield json_file, future.result()
+    while pending:
+        json_file, future = pending.popleft()
+        yield json_file, future.result()
+
+def _tasks(json_files, record_batch):
+    for json_file in json_files:
+        try:
+            for records in _batched(iter_json_records(json_file), record_batch):
+                yield "batch", json_file, records
+        except ValueError as e:
+            print(f"Unsupported structure in file: {json_file} ({e})")
+        yield "end", json_file
+
+def iter_processed_chunks(json_files, processed_dir, workers=INGEST_WORKERS, record_batch=INGEST_RECORD_BATCH):
+    """
+    Stream chunk entries for each source file: source -> flatten -> split.
+
+    Records are fanned out in batches across a process pool with a bounded
+    number of batches in flight, so memory does not grow with the corpus.
+    Yields (json_file, entry) per unique chunk and (json_file, None) once a
+    file is complete. Entries are also appended to
+    `<processed_dir>/<stem>_processed.jsonl`.
+    """
+    processed_dir = Path(processed_dir)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    writers, seen = {}, {}
+    try:
+        for json_file, chunks in _ordered_map(executor, _tasks(json_files, record_batch), max(2, 2 * workers)):
+            if json_file not in writers:
+                tmp_path = processed_dir / f"{json_file.stem}_processed.jsonl.tmp"
+                writers[json_file] = (jsonlines.open(tmp_path, mode="w"), tmp_path)
+                seen[json_file] = set()
+
+            writer, tmp_path = writers[json_file]
+            if chunks is None:
+                writer.close()
+                output_file = processed_dir / f"{json_file.stem}_processed.jsonl"
+                os.replace(tmp_path, output_file)
+                print(f"Processed and saved {output_file}")
+                del writers[json_file], seen[json_file]
+                yield json_file, None
+                continue
+
+            # Identical chunks within a file share an id, so keep the first occurrence only
+            for chunk in chunks:
+                _id = chunk_id(json_file.name, chunk)
+                if _id in seen[json_file]:
+                    continue
+                seen[json_file].add(_id)
+                entry = {"page_content": chunk, "metadata": {"source": json_file.name, "chunk_id": _id}}
+                writer.write(entry)
+                yield json_file, entry
+    finally:
+        for writer, _ in writers.values():
+            writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def iter_processed_files(processed_dir):
+    """Stream entries back from the processed JSONL files."""
+    for jsonl_file in sorted(Path(processed_dir).glob("*_processed.jsonl")):
+        with jsonlines.open(jsonl_file) as reader:
+            yield from reader
@@ -0,0 +1,162 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Define BM25 settings from environment variables
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i in is it me my of on or our
+please tell that the this to what when where which who why will with you your
+""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_chunk_id ON postings (chunk_id);
+CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), n_docs INTEGER NOT NULL, total_length INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats VALUES (0, 0, 0);
+"""
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+###############################################################################
+# BM25 Inverted Index
+###############################################################################
+
+def copy_index(source, target):
+    """Consistent copy of a BM25 index file, taken through SQLite's backup API."""
+    source_conn = sqlite3.connect(f"{Path(source).resolve().as_uri()}?mode=ro", uri=True)
+    target_conn = sqlite3.connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        target_conn.close()
+        source_conn.close()
+
+class BM25Index:
+    """
+    BM25 inverted index over chunk texts, stored in SQLite next to the faiss index.
+
+    Postings are keyed by (term, chunk_id), so a query reads only the posting
+    lists of its own terms. The ingestion process opens it `writable` and
+    commits once the vector store is saved; readers open it read-only.
+    """
+
+    def __init__(self, path, writable=False, k1=BM25_K1, b=BM25_B):
+        self.path = Path(path)
+        self.writable = writable
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+        if writable:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def _connection(self):
+        if self.writable:
+            return self._conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        if not self.path.is_file():
+            return 0
+        return self._connection().execute("SELECT n_docs FROM stats").fetchone()[0]
+
+    # Writes ------------------------------------------------------------------
+
+    def add(self, docs):
+        """Index (chunk_id, text) pairs."""
+        conn = self._connection()
+        n_docs, total_length = 0, 0
+        for _id, text in docs:
+            tokens = tokenize(text)
+            cursor = conn.execute("INSERT OR IGNORE INTO docs VALUES (?, ?)", (_id, len(tokens)))
+            if not cursor.rowcount:
+                continue
+            conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                [(term, _id, tf) for term, tf in Counter(tokens).items()],
+            )
+            n_docs += 1
+            total_length += len(tokens)
+        conn.execute(
+            "UPDATE stats SET n_docs = n_docs + ?, total_length = total_length + ?", (n_docs, total_length)
+        )
+
+    def remove(self, ids):
+        """Remove chunks from the index."""
+        conn = self._connection()
+        for _id in ids:
+            row = conn.execute("SELECT length FROM docs WHERE chunk_id = ?", (_id,)).fetchone()
+            if row is None:
+                continue
+            conn.execute("DELETE FROM postings WHERE chunk_id = ?", (_id,))
+            conn.execute("DELETE FROM docs WHERE chunk_id = ?", (_id,))
+            conn.execute("UPDATE stats SET n_docs = n_docs - 1, total_length = total_length - ?", (row[0],))
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM postings")
+        conn.execute("DELETE FROM docs")
+        conn.execute("UPDATE stats SET n_docs = 0, total_length = 0")
+
+    def commit(self):
+        self._connection().commit()
+
+    def close(self):
+        if self.writable:
+            self._conn.close()
+
+    # Reads -------------------------------------------------------------------
+
+    def search(self, query, k=10):
+        """
+        Returns up to k (chunk_id, score, matched_terms) tuples, best first,
+        together with the number of distinct query terms.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.path.is_file():
+            return [], len(terms)
+
+        conn = self._connection()
+        n_docs, total_length = conn.execute("SELECT n_docs, total_length FROM stats").fetchone()
+        if not n_docs:
+            return [], len(terms)
+        avg_length = total_length / n_docs
+
+        scores, matched = Counter(), Counter()
+        for term in terms:
+            postings = conn.execute(
+                "SELECT p.chunk_id, p.tf, d.length FROM postings p JOIN docs d USING (chunk_id) WHERE p.term = ?",
+                (term,),
+            ).fetchall()
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for _id, tf, length in postings:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[_id] += 1
+
+        return [(_id, score, matched[_id]) for _id, score in scores.most_common(k)], len(terms)
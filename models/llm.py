@@ -1,7 +1,22 @@
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from models.embedding_cache import CachedEmbeddings
+from models.llm_cache import LLM_CACHE_ENABLED, SQLiteLLMCache
+from models.llm_client import create_http_clients
 import random
 
 load_dotenv()
-llm = ChatOpenAI(model="gpt-4o-mini")
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
\ No newline at end of file
+# Shared connection pool with per-model rate limits, adaptive concurrency, retries and
+# request coalescing (models/llm_client.py); the SDK's own retries are turned off
+http_client, http_async_client = create_http_clients()
+
+# Exact-match response cache (opt out per call with models.llm_cache.no_llm_cache)
+llm_cache = SQLiteLLMCache() if LLM_CACHE_ENABLED else None
+llm = ChatOpenAI(model="gpt-4o-mini", cache=llm_cache, http_client=http_client, http_async_client=http_async_client, max_retries=0)
+
+# Embeddings are served from a persistent cache; only misses reach the API
+EMBEDDING_MODEL = "text-embedding-3-large"
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=http_client, http_async_client=http_async_client, max_retries=0),
+    model=EMBEDDING_MODEL,
+)
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+
+# Define LLM cache settings from environment variables
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+# Serialized message fields that differ between otherwise identical calls
+VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+_cache_disabled = ContextVar("llm_cache_disabled", default=False)
+
+@contextmanager
+def no_llm_cache():
+    """Bypass the LLM cache for calls made inside this block (reads and writes)."""
+    token = _cache_disabled.set(True)
+    try:
+        yield
+    finally:
+        _cache_disabled.reset(token)
+
+###############################################################################
+# Prompt Normalization
+###############################################################################
+
+def _tool_call_ids(node, found):
+    if isinstance(node, dict):
+        if isinstance(node.get("tool_call_id"), str):
+            found.setdefault(node["tool_call_id"], f"call_{len(found)}")
+        for call in node.get("tool_calls") or []:
+            if isinstance(call, dict) and isinstance(call.get("id"), str):
+                found.setdefault(call["id"], f"call_{len(found)}")
+        for value in node.values():
+            _tool_call_ids(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _tool_call_ids(value, found)
+    return found
+
+def _normalize(node, call_ids):
+    if isinstance(node, dict):
+        normalized = {}
+        for key, value in node.items():
+            # Constructor arguments of a serialized message
+            if key == "kwargs" and node.get("lc") == 1 and isinstance(value, dict):
+                value = {k: v for k, v in value.items() if k not in VOLATILE_FIELDS}
+            normalized[key] = _normalize(value, call_ids)
+        return normalized
+    if isinstance(node, list):
+        return [_normalize(value, call_ids) for value in node]
+    if isinstance(node, str):
+        return call_ids.get(node, node)
+    return node
+
+def normalize_prompt(prompt):
+    """
+    Serialized messages without message ids or response metadata, with
+    tool-call ids renumbered by first appearance, so identical conversations
+    replayed in a new thread produce the same key.
+    """
+    try:
+        messages = json.loads(prompt)
+    except (TypeError, ValueError):
+        return prompt
+    return json.dumps(_normalize(messages, _tool_call_ids(messages, {})), sort_keys=True, separators=(",", ":"))
+
+def cache_key(prompt, llm_string):
+    """Hash of the normalized messages and the model string (model, parameters and bound tool schemas)."""
+    return hashlib.sha256(f"{normalize_prompt(prompt)}\x00{llm_string}".encode("utf-8")).hexdigest()
+
+def _cacheable(generations):
+    # Cached messages get fresh ids when they are added to a graph state, instead of
+    # replacing the earlier message that carried the same id
+    prepared = []
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        if message is not None:
+            update = {"id": None}
+            # LangChain adds "total_cost" to the usage of cache hits; without the token counts the
+            # message fails validation when it is read back from a checkpoint
+            if isinstance(message, AIMessage) and message.usage_metadata is None:
+                update["usage_metadata"] = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+            generation = generation.model_copy(update={"message": message.model_copy(update=update)})
+        prepared.append(generation)
+    return prepared
+
+###############################################################################
+# SQLite LLM Cache
+###############################################################################
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Exact-match LangChain cache of LLM generations in a local SQLite file.
+
+    Entries are keyed by `cache_key` and evicted least-recently-used once
+    the table holds more than `max_entries` rows. `no_llm_cache()` opts
+    individual calls out.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, generations TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def lookup(self, prompt, llm_string):
+        if _cache_disabled.get():
+            return None
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT generations FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt, llm_string, return_val):
+        if _cache_disabled.get():
+            return
+        key = cache_key(prompt, llm_string)
+        value = dumps(_cacheable(return_val))
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)", (key, llm_string, value, time.time()))
+            self._size += not exists
+            if self._size > self.max_entries:
+                # Evict a tenth of the table at once so inserts do not delete one row each
+                n_evict = self._size - self.max_entries + max(1, self.max_entries // 10)
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                    (n_evict,),
+                )
+                self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._size,
+        }
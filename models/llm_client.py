@@ -0,0 +1,468 @@
+import os
+import json
+import time
+import email.utils
+import random
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import Future
+import httpx
+from models.embedding_cache import estimate_tokens
+
+# This module is imported by the burst benchmark, so it must stay free of import-time side effects
+
+# Define LLM client settings from environment variables
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+# Per-model overrides, e.g. {"text-embedding-3-large": {"rpm": 3000, "tpm": 1000000}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "2"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "64"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Endpoints whose identical in-flight requests share one upstream call
+COALESCED_PATHS = ("/embeddings", "/chat/completions")
+
+###############################################################################
+# Rate Limits
+###############################################################################
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units per second up to `capacity`.
+    `reserve` always succeeds and returns how long the caller must wait,
+    so concurrent callers queue behind each other instead of polling.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        # Ten seconds of budget by default, so a burst cannot spend the whole minute at once
+        self.capacity = capacity or max(1.0, per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Larger requests than the bucket holds wait for a full bucket instead of forever
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit shared by sync and async callers: +1 slot per
+    window of successful requests, halved on a throttling response (at most
+    once per `cooldown` seconds, so one burst of 429s counts once).
+    """
+
+    def __init__(self, max_limit=LLM_MAX_CONCURRENCY, min_limit=LLM_MIN_CONCURRENCY, cooldown=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(max_limit)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._waiters = deque()
+
+    def _has_slot(self):
+        return self.in_flight < int(self.limit)
+
+    def acquire(self):
+        with self._cond:
+            while not self._has_slot():
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._has_slot():
+                self.in_flight += 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._cond:
+                if (loop, waiter) in self._waiters:
+                    self._waiters.remove((loop, waiter))
+            # Granted before the task resumed: the slot is ours, so give it back. A slot granted
+            # after the waiter was cancelled is given back by _grant
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, waiter):
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    def _wake(self):
+        # Hand free slots to async waiters first; sync waiters re-check on notify
+        while self._waiters and self._has_slot():
+            loop, waiter = self._waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self._grant, waiter)
+        self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+
+class ModelLimits:
+    """Request and token buckets, a shared pause set by Retry-After, and the concurrency limit of one model."""
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.paused_until = 0.0
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "coalesced": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def reserve(self, n_tokens):
+        """Seconds to wait before sending a request of `n_tokens` estimated tokens."""
+        with self._lock:
+            now = time.monotonic()
+            self.counters["requests"] += 1
+            return max(self.requests.reserve(1, now), self.tokens.reserve(n_tokens, now), self.paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every request to this model, e.g. for the Retry-After of a 429."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+class RateLimitRegistry:
+    """ModelLimits per model name, created on first use from LLM_RPM/LLM_TPM and LLM_RATE_LIMITS."""
+
+    def __init__(self, overrides=None):
+        self.overrides = LLM_RATE_LIMITS if overrides is None else overrides
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, model):
+        with self._lock:
+            if model not in self._models:
+                override = self.overrides.get(model, {})
+                self._models[model] = ModelLimits(
+                    rpm=override.get("rpm", LLM_RPM),
+                    tpm=override.get("tpm", LLM_TPM),
+                    max_concurrency=override.get("max_concurrency", LLM_MAX_CONCURRENCY),
+                )
+            return self._models[model]
+
+    def stats(self):
+        with self._lock:
+            models = dict(self._models)
+        return {
+            model: dict(limits.counters, concurrency=int(limits.concurrency.limit), in_flight=limits.concurrency.in_flight)
+            for model, limits in models.items()
+        }
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def request_body(request):
+    try:
+        return json.loads(request.content or b"{}")
+    except (TypeError, ValueError):
+        return {}
+
+def request_tokens(body):
+    """Estimated tokens a request counts against the TPM limit (prompt plus requested completion)."""
+    prompt = body.get("messages", body.get("input", ""))
+    prompt = prompt if isinstance(prompt, str) else json.dumps(prompt)
+    return estimate_tokens(prompt) + int(body.get("max_completion_tokens") or body.get("max_tokens") or 0)
+
+def coalesce_key(request, body):
+    """Key shared by identical in-flight requests, or None when the request must go out on its own."""
+    if request.method != "POST" or body.get("stream") or not request.url.path.endswith(COALESCED_PATHS):
+        return None
+    return hashlib.sha256(str(request.url).encode("utf-8") + b"\x00" + request.content).hexdigest()
+
+def retry_after(response):
+    """Seconds from the retry-after-ms / Retry-After headers, or None."""
+    if "retry-after-ms" in response.headers:
+        try:
+            return float(response.headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+def backoff(attempt, response=None):
+    """Server-requested delay when given, otherwise full-jitter exponential backoff."""
+    delay = retry_after(response) if response is not None else None
+    if delay is not None:
+        # A little jitter so callers told the same Retry-After do not return in lockstep
+        return min(LLM_BACKOFF_MAX, delay) + random.uniform(0, LLM_BACKOFF_BASE)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+def retry_delay(limits, response, attempt):
+    """Record a retryable response and return the delay before the next attempt."""
+    limits.count("retries")
+    delay = backoff(attempt, response)
+    if response.status_code == 429:
+        limits.count("throttled")
+        limits.concurrency.on_throttle()
+        # Everyone else waits out the same window instead of adding to the storm
+        limits.pause(delay)
+    return delay
+
+def buffered(response, content):
+    """A standalone copy of a fully read response that any number of callers can consume."""
+    headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+    return httpx.Response(response.status_code, headers=headers, content=content, extensions=response.extensions)
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+###############################################################################
+# Resilient Transports
+###############################################################################
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    httpx transport in front of a pooled HTTPTransport. Every request waits
+    for its model's RPM/TPM buckets and a concurrency slot, is retried with
+    jittered backoff on 429/5xx/connection errors (honoring Retry-After),
+    and identical non-streaming requests in flight at the same time share
+    one upstream call.
+
+    Streaming responses keep their concurrency slot until the stream is closed.
+    """
+
+    def __init__(self, transport=None, registry=None, max_retries=LLM_MAX_RETRIES):
+        self.transport = transport or httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=LLM_POOL_CONNECTIONS, max_keepalive_connections=LLM_POOL_CONNECTIONS),
+        )
+        self.registry = registry or RateLimitRegistry()
+        self.max_retries = max_retries
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request):
+        request.read()
+        body = request_body(request)
+        limits = self.registry.get(body.get("model", "default"))
+        key = coalesce_key(request, body)
+        if key is None:
+            return self._send(request, body, limits)
+
+        with self._lock:
+            shared = self._in_flight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._in_flight[key] = Future()
+        if not leader:
+            limits.count("coalesced")
+            status, headers, content, extensions = shared.result()
+            return httpx.Response(status, headers=headers, content=content, extensions=extensions)
+
+        try:
+            response = self._send(request, body, limits)
+            try:
+                response.read()
+            finally:
+                response.close()
+            copy = buffered(response, response.content)
+            shared.set_result((copy.status_code, copy.headers.multi_items(), copy.content, copy.extensions))
+            return copy
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _send(self, request, body, limits):
+        n_tokens = request_tokens(body)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(limits.reserve(n_tokens))
+            limits.concurrency.acquire()
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                limits.concurrency.release()
+                limits.count("errors")
+                if attempt == self.max_retries:
+                    raise
+                limits.count("retries")
+                time.sleep(backoff(attempt))
+                continue
+            except BaseException:
+                limits.concurrency.release()
+                raise
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                response.read()
+                response.close()
+                limits.concurrency.release()
+                time.sleep(retry_delay(limits, response, attempt))
+                continue
+
+            if response.status_code < 400:
+                limits.concurrency.on_success()
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_ReleasingStream(response.stream, limits.concurrency.release),
+                extensions=response.extensions,
+            )
+
+    def close(self):
+        self.transport.close()
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ResilientTransport; coalesced requests run as one shielded task."""
+
+    def __init__(self, transport=None, registry=None, max_retries=LLM_MAX_RETRIES):
+        self.transport = transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=LLM_POOL_CONNECTIONS, max_keepalive_connections=LLM_POOL_CONNECTIONS),
+        )
+        self.registry = registry or RateLimitRegistry()
+        self.max_retries = max_retries
+        self._in_flight = {}
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        body = request_body(request)
+        limits = self.registry.get(body.get("model", "default"))
+        key = coalesce_key(request, body)
+        if key is None:
+            return await self._send(request, body, limits)
+
+        shared = self._in_flight.get(key)
+        if shared is None:
+            shared = self._in_flight[key] = asyncio.ensure_future(self._send_buffered(request, body, limits))
+            shared.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            limits.count("coalesced")
+        # The leader being cancelled must not cancel the call the followers wait on
+        status, headers, content, extensions = await asyncio.shield(shared)
+        return httpx.Response(status, headers=headers, content=content, extensions=extensions)
+
+    async def _send_buffered(self, request, body, limits):
+        response = await self._send(request, body, limits)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        copy = buffered(response, response.content)
+        return copy.status_code, copy.headers.multi_items(), copy.content, copy.extensions
+
+    async def _send(self, request, body, limits):
+        n_tokens = request_tokens(body)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(limits.reserve(n_tokens))
+            await limits.concurrency.aacquire()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                limits.concurrency.release()
+                limits.count("errors")
+                if attempt == self.max_retries:
+                    raise
+                limits.count("retries")
+                await asyncio.sleep(backoff(attempt))
+                continue
+            except BaseException:
+                limits.concurrency.release()
+                raise
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await response.aread()
+                await response.aclose()
+                limits.concurrency.release()
+                await asyncio.sleep(retry_delay(limits, response, attempt))
+                continue
+
+            if response.status_code < 400:
+                limits.concurrency.on_success()
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_AsyncReleasingStream(response.stream, limits.concurrency.release),
+                extensions=response.extensions,
+            )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+###############################################################################
+# Shared Clients
+###############################################################################
+
+def create_http_clients(registry=None, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT):
+    """
+    (httpx.Client, httpx.AsyncClient) pair sharing one RateLimitRegistry, for
+    the http_client / http_async_client arguments of the OpenAI clients.
+    Pass max_retries=0 to the OpenAI clients so retries happen only here.
+    """
+    registry = registry or RateLimitRegistry()
+    return (
+        httpx.Client(transport=ResilientTransport(registry=registry, max_retries=max_retries), timeout=timeout),
+        httpx.AsyncClient(transport=AsyncResilientTransport(registry=registry, max_retries=max_retries), timeout=timeout),
+    )
@@ -0,0 +1,146 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+import numpy as np
+import faiss
+
+# Define semantic cache settings from environment variables
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+
+def file_fingerprint(path):
+    """sha256 of a file's bytes, or None when it does not exist."""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+###############################################################################
+# Semantic Answer Cache
+###############################################################################
+
+class SemanticCache:
+    """
+    Answers keyed by query meaning rather than query text.
+
+    Query embeddings are L2-normalized and kept in an inner-product faiss
+    index, so a lookup is a single cosine-similarity search. A stored answer
+    is returned when the closest query scores at least `threshold`. The whole
+    cache is dropped when the knowledge-base manifest changes, since cached
+    answers may then be stale. The oldest entries are evicted beyond `max_size`.
+    """
+
+    def __init__(self, embeddings, manifest_path, threshold=SEMANTIC_CACHE_THRESHOLD, max_size=SEMANTIC_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.manifest_path = Path(manifest_path)
+        self.threshold = threshold
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._index = None
+        self._answers = {}
+        self._next_id = 0
+        self._manifest_mtime = None
+        self._fingerprint = None
+        self._check_manifest()
+
+    def _normalize(self, embedding):
+        vector = np.asarray([embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _embed(self, query):
+        return self._normalize(self.embeddings.embed_query(query))
+
+    async def _aembed(self, query):
+        return self._normalize(await self.embeddings.aembed_query(query))
+
+    def _check_manifest(self):
+        # stat is cheap; the manifest is only hashed again when its mtime moves
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        self._manifest_mtime = mtime
+        fingerprint = file_fingerprint(self.manifest_path)
+        if fingerprint != self._fingerprint:
+            if self._answers:
+                print("Knowledge base changed; clearing the semantic cache.")
+            self._fingerprint = fingerprint
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._answers = {}
+
+    def lookup(self, query, vector=None):
+        """Cached answer for a semantically equivalent query, or None."""
+        vector = self._embed(query) if vector is None else vector
+        with self._lock:
+            self._check_manifest()
+            if self._index is not None and self._index.ntotal:
+                scores, ids = self._index.search(vector, 1)
+                if ids[0][0] >= 0 and scores[0][0] >= self.threshold:
+                    self.hits += 1
+                    return self._answers[int(ids[0][0])][1]
+            self.misses += 1
+            return None
+
+    def store(self, query, answer, vector=None):
+        vector = self._embed(query) if vector is None else vector
+        with self._lock:
+            self._check_manifest()
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            _id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.asarray([_id], dtype=np.int64))
+            self._answers[_id] = (query, answer)
+
+            if len(self._answers) > self.max_size:
+                # dicts keep insertion order, so the first key is the oldest entry
+                oldest = next(iter(self._answers))
+                self._index.remove_ids(np.asarray([oldest], dtype=np.int64))
+                del self._answers[oldest]
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._answers),
+        }
+
+    def cached(self, func, cacheable=lambda answer: True):
+        """Wrap a query -> answer function with this cache."""
+        def wrapper(query):
+            vector = self._embed(query)
+            answer = self.lookup(query, vector)
+            if answer is not None:
+                return answer
+            answer = func(query)
+            if cacheable(answer):
+                self.store(query, answer, vector)
+            return answer
+        return wrapper
+
+    def acached(self, func, cacheable=lambda answer: True):
+        """Wrap an async query -> answer function with this cache; only the embedding call is awaited."""
+        async def wrapper(query):
+            vector = await self._aembed(query)
+            answer = self.lookup(query, vector)
+            if answer is not None:
+                return answer
+            answer = await func(query)
+            if cacheable(answer):
+                self.store(query, answer, vector)
+            return answer
+        return wrapper
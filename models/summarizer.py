@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from models.embedding_cache import estimate_tokens
+from models.hybrid_retriever import chunk_id_of
+
+# Define summarization settings from environment variables
+SUMMARY_STUFF_TOKENS = int(os.getenv("SUMMARY_STUFF_TOKENS", "6000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+
+# Same wording as the default prompts of load_summarize_chain
+SUMMARY_PROMPT = 'Write a concise summary of the following:\n\n\n"{text}"\n\n\nCONCISE SUMMARY:'
+
+def summary_key(docs):
+    """Cache key of a set of chunks: their sorted chunk ids."""
+    return tuple(sorted(chunk_id_of(doc) for doc in docs))
+
+###############################################################################
+# Chunk Summarizer
+###############################################################################
+
+class ChunkSummarizer:
+    """
+    Summarizes retrieved chunks with as few sequential LLM round trips as possible.
+
+    Chunks that fit `stuff_tokens` are summarized in a single call. Larger
+    sets are summarized per chunk with concurrent calls and the partial
+    summaries are combined in one final call. Summaries are cached (LRU) by
+    the sorted chunk ids, so the same retrieval result is only summarized once.
+    """
+
+    def __init__(self, llm, stuff_tokens=SUMMARY_STUFF_TOKENS, max_concurrency=SUMMARY_MAX_CONCURRENCY,
+                 cache_size=SUMMARY_CACHE_SIZE):
+        self.llm = llm
+        self.stuff_tokens = stuff_tokens
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+            return summary
+
+    def _store(self, key, summary):
+        with self._lock:
+            self._cache[key] = summary
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _stuff(self, texts):
+        return self.llm.invoke(SUMMARY_PROMPT.format(text="\n\n".join(texts))).content
+
+    def _map(self, texts):
+        prompts = [SUMMARY_PROMPT.format(text=text) for text in texts]
+        responses = self.llm.batch(prompts, config={"max_concurrency": self.max_concurrency})
+        return [response.content for response in responses]
+
+    def summarize(self, docs):
+        """Summary of the documents' content."""
+        if len(docs) == 1:
+            return docs[0].page_content
+
+        key = summary_key(docs)
+        summary = self._cached(key)
+        if summary is not None:
+            return summary
+
+        texts = [doc.page_content for doc in docs]
+        if sum(estimate_tokens(text) for text in texts) > self.stuff_tokens:
+            texts = self._map(texts)
+        summary = self._stuff(texts)
+
+        self._store(key, summary)
+        return summary
+
+    def summarize_many(self, groups):
+        """Summaries of several document groups, computed concurrently."""
+        if len(groups) <= 1:
+            return [self.summarize(docs) for docs in groups]
+        with ThreadPoolExecutor(max_workers=min(len(groups), self.max_concurrency)) as executor:
+            return list(executor.map(self.summarize, groups))
@@ -1,10 +1,23 @@
 import os
 import json
+import hashlib
+import shutil
+import time
+import uuid
 from pathlib import Path
 from langchain.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from models.llm import embeddings
+from models.embedding_cache import embedding_dimension
+from models.index_factory import (
+    VECTOR_INDEX_TYPE, VECTOR_STORAGE, build_index, configure_search, index_type_of, needs_rebuild,
+    read_index, storage_of, supports_remove, write_index
+)
+from models.docstore import SQLiteDocstore, SQLiteIndexMap, read_docstore, write_docstore
+from models.compact_vectors import EMBEDDING_DIMENSIONS, RERANK_FACTOR, TruncatedEmbeddings, rerank
+from models.ingestion import flatten_dict, chunk_id, iter_processed_chunks, iter_processed_files
+from models.lexical_index import BM25Index, copy_index
+import numpy as np
 import faiss
 from typing import Dict
 from langchain.docstore.in_memory import InMemoryDocstore
@@ -13,90 +26,174 @@ from langchain.docstore.in_memory import InMemoryDocstore
 JSON_DIR = Path(os.getenv("JSON_DIR", "data/source"))
 PROCESSED_DIR = Path(os.getenv("PROCESSED_DIR", "data/processed"))
 VECTOR_STORE_PATH = Path(os.getenv("VECTOR_STORE_PATH", "data/vector_store/faiss_index"))
+GENERATIONS_DIR = VECTOR_STORE_PATH / "generations"
+CURRENT_PATH = VECTOR_STORE_PATH / "CURRENT"
+INDEX_NAME = "index.faiss"
+DOCSTORE_NAME = "docstore.sqlite"
+LEXICAL_NAME = "lexical.sqlite"
+# Layout before generations: index, docstore and BM25 index directly under VECTOR_STORE_PATH
+INDEX_PATH = VECTOR_STORE_PATH / INDEX_NAME
+DOCSTORE_PATH = VECTOR_STORE_PATH / DOCSTORE_NAME
+LEXICAL_INDEX_PATH = VECTOR_STORE_PATH / LEXICAL_NAME
+LEGACY_LEXICAL_JOURNALS = [VECTOR_STORE_PATH / f"{LEXICAL_NAME}-wal", VECTOR_STORE_PATH / f"{LEXICAL_NAME}-shm"]
+MANIFEST_PATH = VECTOR_STORE_PATH / "manifest.json"
+MANIFEST_VERSION = 1
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1024"))
+INDEX_TRAIN_SIZE = int(os.getenv("INDEX_TRAIN_SIZE", "20000"))
+# Superseded generations kept on disk for processes still reading them
+KEEP_GENERATIONS = int(os.getenv("VECTOR_STORE_KEEP_GENERATIONS", "2"))
+
+# Vectors stored in the index; full-precision vectors stay in the embedding cache for re-ranking
+index_embeddings = TruncatedEmbeddings(embeddings, EMBEDDING_DIMENSIONS) if EMBEDDING_DIMENSIONS else embeddings
 
 # Ensure directories exist
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 VECTOR_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-# Initialize text splitter
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=100,
-    separators=["\n\n", "\n", " ", ""]
-)
+###############################################################################
+# Content Hashing and Manifest
+###############################################################################
+
+def hash_file(path):
+    """Returns the sha256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest():
+    """Load the manifest of indexed source files and their chunk ids."""
+    if not MANIFEST_PATH.is_file():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
 
-# Helper function to flatten nested dictionaries
-def flatten_dict(data):
-    """Recursively flattens a dictionary."""
-    flat_items = []
-    for key, value in data.items():
-        if isinstance(value, dict):
-            flat_items.extend(flatten_dict(value).items())
-        else:
-            flat_items.append((key, value))
-    return dict(flat_items)
+def save_manifest(manifest):
+    """Atomically write the manifest next to the saved index."""
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+###############################################################################
+# Document Processing
+###############################################################################
 
 # Process JSON files
 def process_json_files():
-    for json_file in JSON_DIR.glob("*.json"):
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        processed_entries = []
-
-        # Handle different data structures
-        if isinstance(data, list):
-            for entry in data:
-                flattened_entry = flatten_dict(entry)
-                content = "\n".join([f"{k}: {v}" for k, v in flattened_entry.items() if v])
-                split_docs = splitter.split_text(content)
-                processed_entries.extend([{"page_content": doc, "metadata": {}} for doc in split_docs])
-
-        elif isinstance(data, dict):
-            flattened_data = flatten_dict(data)
-            content = "\n".join([f"{k}: {v}" for k, v in flattened_data.items() if v])
-            split_docs = splitter.split_text(content)
-            processed_entries.extend([{"page_content": doc, "metadata": {}} for doc in split_docs])
-
-        else:
-            print(f"Unsupported structure in file: {json_file}")
-            continue
-
-        # Save processed documents
-        output_file = PROCESSED_DIR / f"{json_file.stem}_processed.json"
-        with open(output_file, "w", encoding="utf-8") as out_f:
-            json.dump(processed_entries, out_f, ensure_ascii=False, indent=4)
-            print(f"Processed and saved {output_file}")
+    """Run the streaming flatten/split pipeline over every source file."""
+    for _ in iter_processed_chunks(sorted(JSON_DIR.glob("*.json")), PROCESSED_DIR):
+        pass
 
 # Load processed files
 def load_processed_files():
-    docs = []
-
+    """Stream Documents from the processed JSONL files."""
     # Check if there are files in the processed directory
-    if not any(PROCESSED_DIR.glob("*.json")):
+    if not any(PROCESSED_DIR.glob("*_processed.jsonl")):
         print("No processed files found. Running process_json_files...")
         process_json_files()
 
-    # Load processed files
-    for json_file in PROCESSED_DIR.glob("*.json"):
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            docs.extend([Document(page_content=entry["page_content"], metadata=entry.get("metadata", {})) for entry in data])
+    for entry in iter_processed_files(PROCESSED_DIR):
+        yield Document(page_content=entry["page_content"], metadata=entry.get("metadata", {}))
+
+###############################################################################
+# Vector Store
+###############################################################################
+
+class RerankingFAISS(FAISS):
+    """
+    FAISS store that searches compact (truncated or quantized) vectors and
+    re-ranks the top `k * rerank_factor` candidates against full-precision
+    vectors from the embedding cache.
+    """
+    rerank_embeddings = None
+    rerank_factor = RERANK_FACTOR
+
+    def similarity_search_with_score(self, query, k=4, filter=None, fetch_k=20, **kwargs):
+        if self.rerank_embeddings is None:
+            return super().similarity_search_with_score(query, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+
+        n_candidates = k * self.rerank_factor
+        candidates = super().similarity_search_with_score(
+            query, k=n_candidates, filter=filter, fetch_k=max(fetch_k, n_candidates), **kwargs
+        )
+        return self.rerank_candidates(self.rerank_embeddings.embed_query(query), candidates, k)
+
+    def rerank_candidates(self, query_vector, candidates, k):
+        """Re-order (doc, score) candidates by full-precision distance to `query_vector`."""
+        docs = [doc for doc, _ in candidates]
+        if not docs:
+            return []
+        full_vectors = self.rerank_embeddings.embed_documents([doc.page_content for doc in docs])
+        positions, distances = rerank(query_vector, full_vectors, k)
+        return [(docs[position], float(distance)) for position, distance in zip(positions, distances)]
+
+    def get_documents(self, ids):
+        """Fetch documents by docstore id in one round trip when the docstore supports it."""
+        if hasattr(self.docstore, "mget"):
+            return self.docstore.mget(ids)
+        return {_id: doc for _id in ids for doc in [self.docstore.search(_id)] if isinstance(doc, Document)}
+
+    def batch_similarity_search_with_score(self, queries, k=4):
+        """
+        Search several queries at once: one embedding request, one matrix
+        index search and one docstore fetch for the union of the hits.
+        Returns one [(doc, score)] list per query, in query order.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        vectors = np.asarray(self._embed_documents(queries), dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
 
-    print(f"Loaded {len(docs)} documents.")
-    return docs
+        n_candidates = k if self.rerank_embeddings is None else k * self.rerank_factor
+        scores, positions = self.index.search(vectors, n_candidates)
+        hits = [
+            [(self.index_to_docstore_id[position], float(score)) for position, score in zip(row, row_scores) if position != -1]
+            for row, row_scores in zip(positions, scores)
+        ]
+        docs = self.get_documents(list(dict.fromkeys(_id for row in hits for _id, _ in row)))
+        results = [[(docs[_id], score) for _id, score in row if _id in docs] for row in hits]
+        if self.rerank_embeddings is None:
+            return results
+
+        # Full-precision vectors for the queries and for every distinct candidate, embedded once
+        query_vectors = self.rerank_embeddings.embed_documents(queries)
+        texts = list(dict.fromkeys(doc.page_content for doc in docs.values()))
+        full_vectors = dict(zip(texts, self.rerank_embeddings.embed_documents(texts)))
+        reranked = []
+        for query_vector, candidates in zip(query_vectors, results):
+            candidate_docs = [doc for doc, _ in candidates]
+            order, distances = rerank(query_vector, [full_vectors[doc.page_content] for doc in candidate_docs], k)
+            reranked.append([(candidate_docs[i], float(distance)) for i, distance in zip(order, distances)])
+        return reranked
+
+def configure_vector_store(vector_store):
+    """Restore search parameters and enable re-ranking when the index holds compact vectors."""
+    # nprobe/efSearch are not serialized with the index
+    configure_search(vector_store.index)
+    is_compact = index_embeddings is not embeddings or storage_of(vector_store.index) != "float32"
+    vector_store.rerank_embeddings = embeddings if is_compact else None
+    return vector_store
 
 # Create a new FAISS vector store
-def create_vector_store(embeddings):
+def create_vector_store(embeddings, training_vectors=None, index_type=VECTOR_INDEX_TYPE, storage=VECTOR_STORAGE):
     """
     Create a FAISS vector store with the specified embeddings.
+
+    Index types that need training (IVF, int8, PQ) are trained on `training_vectors`.
     """
-    # Dynamically determine the embedding dimension
-    sample_embedding = embeddings.embed_query("Sample text to determine dimension")
-    dimension = len(sample_embedding)
+    # Determine the embedding dimension (recorded in the cache metadata after the first call)
+    dimension = embedding_dimension(embeddings)
 
-    # Initialize a FAISS index
-    index = faiss.IndexFlatL2(dimension)
+    # Initialize a FAISS index of the configured type and storage
+    index = build_index(index_type, dimension, training_vectors=training_vectors, storage=storage)
 
     # Create an in-memory docstore
     docstore = InMemoryDocstore({})
@@ -105,57 +202,301 @@ def create_vector_store(embeddings):
     index_to_docstore_id = {}
 
     # Initialize the FAISS vector store
-    return FAISS(
+    return configure_vector_store(RerankingFAISS(
         index=index,
         docstore=docstore,
         index_to_docstore_id=index_to_docstore_id,
-        embedding_function=embeddings.embed_query  # Pass the embedding function here
+        embedding_function=embeddings  # Pass the embeddings so documents are embedded in batches
+    ))
+
+class IndexWriter:
+    """
+    Streams documents into a vector store (and the BM25 index) in
+    embedding-sized batches.
+
+    Without an existing store, the first INDEX_TRAIN_SIZE documents are
+    buffered so the new index can be trained on them; after that only one
+    batch of documents and vectors is held in memory at a time.
+    """
+
+    def __init__(self, vector_store=None, lexical_index=None, batch_size=INGEST_BATCH_SIZE,
+                 train_size=INDEX_TRAIN_SIZE):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.batch_size = batch_size
+        self.train_size = train_size
+        self.buffer = []
+        self.added = 0
+
+    def add(self, doc):
+        self.buffer.append(doc)
+        limit = self.train_size if self.vector_store is None else self.batch_size
+        if len(self.buffer) >= limit:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        texts = [doc.page_content for doc in self.buffer]
+        vectors = np.asarray(index_embeddings.embed_documents(texts), dtype=np.float32)
+        if self.vector_store is None:
+            self.vector_store = create_vector_store(index_embeddings, training_vectors=vectors)
+        self.vector_store.add_embeddings(
+            zip(texts, vectors.tolist()),
+            metadatas=[doc.metadata for doc in self.buffer],
+            ids=[doc.metadata["chunk_id"] for doc in self.buffer],
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add((doc.metadata["chunk_id"], doc.page_content) for doc in self.buffer)
+        self.added += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        """Flush the remaining documents and return the vector store."""
+        self.flush()
+        if self.vector_store is None:
+            self.vector_store = create_vector_store(index_embeddings)
+        return self.vector_store
+
+###############################################################################
+# Store Generations
+###############################################################################
+
+def current_generation_dir():
+    """
+    Directory holding the index and docstore of the current generation.
+
+    Falls back to the pre-generation layout when no generation was saved yet.
+    """
+    if CURRENT_PATH.is_file():
+        return GENERATIONS_DIR / CURRENT_PATH.read_text(encoding="utf-8").strip()
+    return VECTOR_STORE_PATH
+
+def _vector_store_exists():
+    generation_dir = current_generation_dir()
+    return (generation_dir / INDEX_NAME).is_file() and (generation_dir / DOCSTORE_NAME).is_file()
+
+def new_generation_dir():
+    """Empty directory for the next generation; it only goes live when save_vector_store points CURRENT at it."""
+    generation_dir = GENERATIONS_DIR / f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    generation_dir.mkdir(parents=True)
+    return generation_dir
+
+def _prune_generations(current):
+    """Delete generations older than the last KEEP_GENERATIONS, and the pre-generation files."""
+    old = sorted(path for path in GENERATIONS_DIR.iterdir() if path.is_dir() and path.name != current)
+    for path in old[:max(len(old) - KEEP_GENERATIONS, 0)]:
+        shutil.rmtree(path, ignore_errors=True)
+    for path in (INDEX_PATH, DOCSTORE_PATH, LEXICAL_INDEX_PATH, *LEGACY_LEXICAL_JOURNALS):
+        path.unlink(missing_ok=True)
+
+def _needs_rebuild(vector_store, n_docs):
+    return needs_rebuild(
+        vector_store.index, VECTOR_INDEX_TYPE, n_docs,
+        dimension=embedding_dimension(index_embeddings), storage=VECTOR_STORAGE,
+    )
+
+def _migrate_pickled_store():
+    """Convert an index saved by FAISS.save_local (index.faiss + index.pkl) to the SQLite format."""
+    if not INDEX_PATH.is_file() or DOCSTORE_PATH.is_file() or not (VECTOR_STORE_PATH / "index.pkl").is_file():
+        return
+    print(f"Migrating pickled vector store at {VECTOR_STORE_PATH} to the SQLite docstore format...")
+    vector_store = RerankingFAISS.load_local(
+        str(VECTOR_STORE_PATH),
+        index_embeddings,
+        allow_dangerous_deserialization=True  # Only our own legacy file is unpickled, once
     )
+    save_vector_store(vector_store)
+    (VECTOR_STORE_PATH / "index.pkl").unlink()
 
 # Embed documents and save the vector store
 def embed_and_store_documents():
-    if VECTOR_STORE_PATH.exists() and (VECTOR_STORE_PATH / "index.faiss").is_file():
-        print(f"Vector store already exists at {VECTOR_STORE_PATH}. Skipping embedding.")
+    """
+    Bring the saved vector store in line with JSON_DIR.
+
+    Only chunks whose content hash is not in the manifest are embedded, chunks
+    whose source changed or disappeared are deleted, and unchanged files are
+    skipped without being re-split. The index is rebuilt from the embedding
+    cache when the configured index type changes or the corpus outgrows it.
+    """
+    _migrate_pickled_store()
+    manifest = load_manifest()
+    vector_store = None
+    if _vector_store_exists() and manifest is not None:
+        vector_store = load_vector_store(writable=True)
+    else:
+        if _vector_store_exists():
+            print(f"Vector store at {VECTOR_STORE_PATH} has no manifest. Rebuilding it.")
+        manifest = {"version": MANIFEST_VERSION, "files": {}}
+
+    indexed_files = manifest["files"]
+    source_files = {json_file.name: json_file for json_file in sorted(JSON_DIR.glob("*.json"))}
+
+    # Sources that were removed since the last run
+    removed_files = set(indexed_files) - set(source_files)
+    stale_ids = set()
+    for name in removed_files:
+        stale_ids.update(indexed_files[name]["chunk_ids"])
+        (PROCESSED_DIR / f"{Path(name).stem}_processed.jsonl").unlink(missing_ok=True)
+        print(f"Source removed: {name}")
+
+    # New and changed sources
+    file_hashes = {name: hash_file(json_file) for name, json_file in source_files.items()}
+    changed_files = [
+        json_file for name, json_file in source_files.items()
+        if name not in indexed_files or indexed_files[name]["file_hash"] != file_hashes[name]
+    ]
+
+    # HNSW cannot delete in place, so any change that may drop chunks rebuilds it.
+    # The chunks of changed files are only counted as they stream in, so the size is checked again after ingest.
+    n_docs = len(vector_store.index_to_docstore_id) if vector_store else 0
+    rebuild = (
+        vector_store is None
+        or _needs_rebuild(vector_store, n_docs)
+        or ((removed_files or changed_files) and not supports_remove(vector_store.index))
+    )
+
+    VECTOR_STORE_PATH.mkdir(parents=True, exist_ok=True)
+    current_lexical_path = current_generation_dir() / LEXICAL_NAME
+
+    if not removed_files and not changed_files and not rebuild:
+        # Stores built before the BM25 index existed get it from the docstore, in a new generation
+        if len(BM25Index(current_lexical_path)) != n_docs:
+            print(f"Rebuilding the BM25 index from {n_docs} stored chunks...")
+            generation_dir = new_generation_dir()
+            lexical_index = BM25Index(generation_dir / LEXICAL_NAME, writable=True)
+            lexical_index.add(
+                (_id, vector_store.docstore.search(_id).page_content)
+                for _id in vector_store.index_to_docstore_id.values()
+            )
+            lexical_index.commit()
+            lexical_index.close()
+            save_vector_store(vector_store, generation_dir)
+        print(f"Vector store at {VECTOR_STORE_PATH} is up to date.")
         return
 
-    # Process and load documents
-    process_json_files()
-    docs = load_processed_files()
+    # The BM25 index is updated on a copy in the new generation; the live one is never written to
+    generation_dir = new_generation_dir()
+    if not rebuild and current_lexical_path.is_file():
+        copy_index(current_lexical_path, generation_dir / LEXICAL_NAME)
+    lexical_index = BM25Index(generation_dir / LEXICAL_NAME, writable=True)
+    writer = IndexWriter(None if rebuild else vector_store, lexical_index)
 
-    # Create FAISS vector store
-    vector_store = create_vector_store(embeddings)
+    # A rebuild re-adds the chunks of unchanged files; their vectors come from the embedding cache
+    if rebuild and vector_store is not None:
+        changed_names = {json_file.name for json_file in changed_files}
+        for name, indexed in indexed_files.items():
+            if name in source_files and name not in changed_names:
+                for _id in indexed["chunk_ids"]:
+                    writer.add(vector_store.docstore.search(_id))
 
-    # Index documents
-    vector_store.add_documents(docs)
+    updated_files = {}
+    current_ids = {}
+    previous_ids = {}
+    for json_file, entry in iter_processed_chunks(changed_files, PROCESSED_DIR):
+        name = json_file.name
+        if name not in previous_ids:
+            previous_ids[name] = set(indexed_files[name]["chunk_ids"]) if name in indexed_files else set()
+        if entry is None:
+            ids = current_ids.pop(name, [])
+            stale_ids.update(previous_ids.pop(name) - set(ids))
+            updated_files[name] = {"file_hash": file_hashes[name], "chunk_ids": ids}
+            continue
 
-    # Save the FAISS vector store to disk
-    vector_store.save_local(str(VECTOR_STORE_PATH))
-    print(f"Vector store saved at {VECTOR_STORE_PATH}.")
+        _id = entry["metadata"]["chunk_id"]
+        current_ids.setdefault(name, []).append(_id)
+        if rebuild or _id not in previous_ids[name]:
+            writer.add(Document(page_content=entry["page_content"], metadata=entry["metadata"]))
+
+    if not rebuild and stale_ids:
+        vector_store.delete(list(stale_ids))
+        lexical_index.remove(stale_ids)
+    vector_store = writer.close()
+    added = writer.added
+    if not rebuild and _needs_rebuild(vector_store, vector_store.index.ntotal):
+        print(f"{vector_store.index.ntotal} chunks outgrew the {index_type_of(vector_store.index)} index. Rebuilding it...")
+        lexical_index.clear()
+        writer = IndexWriter(None, lexical_index)
+        for _id in vector_store.index_to_docstore_id.values():
+            writer.add(vector_store.docstore.search(_id))
+        vector_store = writer.close()
+        rebuild = True
+    if rebuild:
+        print(
+            f"Built a {index_type_of(vector_store.index)}/{storage_of(vector_store.index)} index "
+            f"with {vector_store.index.ntotal} vectors of dimension {vector_store.index.d}."
+        )
+
+    # Save the FAISS vector store next to the BM25 index, swap the generation in, then save the manifest
+    lexical_index.commit()
+    lexical_index.close()
+    save_vector_store(vector_store, generation_dir)
+    for name in removed_files:
+        del indexed_files[name]
+    indexed_files.update(updated_files)
+    save_manifest(manifest)
+    print(f"Vector store saved at {VECTOR_STORE_PATH}: {added} chunks added, {len(stale_ids)} removed.")
+
+# Save the vector store: a faiss index file plus a SQLite docstore (no pickles)
+def save_vector_store(vector_store, generation_dir=None):
+    """
+    Save the index and docstore into a new generation directory, then point
+    CURRENT at it with a single os.replace, so a reader always opens the
+    index together with the position -> id map and BM25 index written
+    alongside it. `generation_dir` may already hold the BM25 index.
+    """
+    generation_dir = generation_dir or new_generation_dir()
+    generation = generation_dir.name
+    write_index(vector_store.index, generation_dir / INDEX_NAME)
+    write_docstore(generation_dir / DOCSTORE_NAME, vector_store.docstore, vector_store.index_to_docstore_id)
+
+    tmp_path = CURRENT_PATH.with_suffix(".tmp")
+    tmp_path.write_text(generation, encoding="utf-8")
+    os.replace(tmp_path, CURRENT_PATH)
+    _prune_generations(generation)
 
 # Load an existing FAISS vector store
-def load_vector_store():
-    return FAISS.load_local(str(VECTOR_STORE_PATH), embeddings)
+def load_vector_store(writable=False):
+    """
+    Load the saved vector store.
+
+    By default the index is memory-mapped read-only and chunks are fetched
+    from SQLite only for the search hits, so start-up does not depend on the
+    corpus size. `writable=True` loads everything into memory for ingestion.
+    Both files come from the generation CURRENT named when loading started.
+    """
+    generation_dir = current_generation_dir()
+    docstore_path = generation_dir / DOCSTORE_NAME
+    if writable:
+        docs, index_to_docstore_id = read_docstore(docstore_path)
+        docstore = InMemoryDocstore(docs)
+    else:
+        docstore = SQLiteDocstore(docstore_path)
+        index_to_docstore_id = SQLiteIndexMap(docstore_path)
+
+    vector_store = RerankingFAISS(
+        index=read_index(generation_dir / INDEX_NAME, mmap=not writable),
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        embedding_function=index_embeddings,
+    )
+    vector_store.generation_dir = generation_dir
+    return configure_vector_store(vector_store)
+
+# Load the BM25 index built next to the vector store
+def load_lexical_index(generation_dir=None):
+    """BM25 index of `generation_dir`, by default the current generation; pass the vector store's to keep them paired."""
+    return BM25Index((generation_dir or current_generation_dir()) / LEXICAL_NAME)
 
 # Initialize the vector store
 def initialize_vector_store():
     """
-    Initialize the FAISS vector store by loading or creating it.
+    Initialize the FAISS vector store, refreshing it from the source files first.
     """
-    if VECTOR_STORE_PATH.exists() and (VECTOR_STORE_PATH / "index.faiss").is_file():
-        print("Loading existing vector store...")
-        return FAISS.load_local(
-            str(VECTOR_STORE_PATH), 
-            #embeddings.embed_query, 
-            embeddings,
-            allow_dangerous_deserialization=True  # Enable safe deserialization
-        )
-    else:
+    if not _vector_store_exists():
         print("Vector store not found. Creating a new one...")
-        embed_and_store_documents()
-        return FAISS.load_local(
-            str(VECTOR_STORE_PATH), 
-            embeddings.embed_query, 
-            allow_dangerous_deserialization=True  # Enable safe deserialization
-        )
+    embed_and_store_documents()
+    print("Loading existing vector store...")
+    return load_vector_store()
 
 initialize_vector_store()